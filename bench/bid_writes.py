@@ -0,0 +1,139 @@
+"""
+Smoke test of every bid write endpoint against a real database.
+
+Usage:
+    python bench/bid_writes.py
+
+Starts a throwaway cluster (see `bench/cluster.py`) and `bench/server.py`,
+creates a tender, then calls each bid write endpoint once: create, bulk
+create, status change, edit with `If-Match`, edit with an `If-Match` made
+before revisions, edit with an `If-Match` taken before a status went
+A -> B -> A, rollback, feedback and decisions up to quorum, followed
+by the bid list endpoints. Prints the status code of every call and exits
+with code 1 if any of them answers 5xx or differs from the expected code.
+"""
+from typing import Any, Dict, List, Tuple
+import asyncio
+import os
+import sys
+
+import httpx
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.cluster import throwaway_cluster  # noqa: E402
+from bench.suite import server  # noqa: E402
+from model.create import create_engine  # noqa: E402
+from model.migrations import migrate  # noqa: E402
+from settings import Settings  # noqa: E402
+
+ORG_ID = "00000000-0000-4000-8000-000000000001"
+USERS = [f"bid_writer{number}" for number in range(3)]
+
+SEED = [
+    f"INSERT INTO organization (id, name, type) VALUES ('{ORG_ID}', 'bench', 'LLC')",
+    "INSERT INTO employee (id, username) "
+    "SELECT gen_random_uuid(), username FROM unnest(CAST(:users AS text[])) username",
+    "INSERT INTO organization_responsible (id, organization_id, user_id) "
+    f"SELECT gen_random_uuid(), '{ORG_ID}', id FROM employee",
+]
+
+
+async def seed(dsn: str) -> None:
+    engine = create_engine(Settings(postgres_url=dsn))
+    try:
+        await migrate(engine)
+        async with engine.begin() as conn:
+            for statement in SEED:
+                await conn.execute(text(statement), {"users": USERS})
+
+    finally:
+        await engine.dispose()
+
+
+async def run(base_url: str) -> List[Tuple[str, int, int]]:
+    calls: List[Tuple[str, int, int]] = []
+    user = {"username": USERS[0]}
+
+    async def call(name: str, expected: int, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        response = await client.request(method, path, **kwargs)
+        calls.append((name, expected, response.status_code))
+        return response
+
+    def new_bid(name: str, tender_id: str) -> Dict[str, str]:
+        return {"name": name, "description": "smoke", "status": "Created",
+                "tenderId": tender_id, "organizationId": ORG_ID, "creatorUsername": USERS[0]}
+
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        tender = await call("create tender", 200, "POST", "/api/tenders/new",
+                            json={"name": "tender", "description": "smoke",
+                                  "serviceType": "Construction", "organizationId": ORG_ID,
+                                  "creatorUsername": USERS[0], "status": "Published"})
+        tender.raise_for_status()
+        tender_id = tender.json()["id"]
+
+        bid = await call("create bid", 200, "POST", "/api/bids/new",
+                         json=new_bid("bid", tender_id))
+        bid.raise_for_status()
+        bid_id = bid.json()["id"]
+        bulk = await call("bulk create bids", 200, "POST", "/api/bids/bulk",
+                          json=[new_bid("bulk bid", tender_id)])
+        bulk.raise_for_status()
+        other_bid_id = bulk.json()[0]["bid"]["id"]
+
+        status = await call("change status", 200, "PUT", f"/api/bids/{bid_id}/status",
+                            params={**user, "status": "Published"})
+        await call("edit with If-Match", 200, "PATCH", f"/api/bids/{bid_id}/edit",
+                   params=user, json={"name": "edited"},
+                   headers={"If-Match": status.headers["ETag"]})
+        await call("edit with a status in If-Match", 409, "PATCH",
+                   f"/api/bids/{bid_id}/edit", params=user, json={"name": "edited again"},
+                   headers={"If-Match": f'"{bid_id}.3.Foo"'})
+        before = await call("status before A -> B -> A", 200, "GET",
+                            f"/api/bids/{bid_id}/status", params=user)
+        for status in ("Canceled", "Published"):
+            await call(f"change status to {status}", 200, "PUT", f"/api/bids/{bid_id}/status",
+                       params={**user, "status": status})
+        await call("edit with If-Match from before A -> B -> A", 409, "PATCH",
+                   f"/api/bids/{bid_id}/edit", params=user, json={"name": "edited again"},
+                   headers={"If-Match": before.headers["ETag"]})
+        await call("rollback", 200, "PUT", f"/api/bids/{bid_id}/rollback/1", params=user)
+        await call("feedback", 200, "PUT", f"/api/bids/{bid_id}/feedback",
+                   params={**user, "bidFeedback": "smoke"})
+        await call("list bids of tender", 200, "GET", f"/api/bids/{tender_id}/list", params=user)
+        # The approval closes (deletes) the tender
+        for username in USERS:
+            await call(f"decision of {username}", 200, "PUT",
+                       f"/api/bids/{bid_id}/submit_decision",
+                       params={"username": username, "decision": "Approved"})
+        await call("decision on an approved bid", 400, "PUT",
+                   f"/api/bids/{bid_id}/submit_decision",
+                   params={"username": USERS[0], "decision": "Rejected"})
+        await call("decision on a bid of a closed tender", 409, "PUT",
+                   f"/api/bids/{other_bid_id}/submit_decision",
+                   params={"username": USERS[0], "decision": "Approved"})
+        await call("my bids", 200, "GET", "/api/bids/my", params=user)
+        await call("my bids as NDJSON", 200, "GET", "/api/bids/my",
+                   params={**user, "stream": "ndjson"})
+
+    return calls
+
+
+async def main() -> int:
+    with throwaway_cluster() as dsn:
+        await seed(dsn)
+        async with server(dsn, workers=1) as base_url:
+            calls = await run(base_url)
+
+    failed = False
+    for name, expected, status in calls:
+        failed = failed or status != expected
+        verdict = "ok" if status == expected else f"expected {expected}"
+        print(f"{status:>4} {verdict:<14} {name}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,57 @@
+"""
+Compares creating tenders one by one with `POST /api/tenders/new`
+against `POST /api/tenders/bulk` on a running API instance.
+
+Usage:
+    python bench/bulk.py http://localhost:8080 --username user1 \
+        --organization 550e8400-e29b-41d4-a716-446655440000 --count 1000
+
+The user must be responsible for the organization.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def make_tender(args: argparse.Namespace, number: int) -> dict:
+    return {"name": f"bench {number}",
+            "description": "bench",
+            "serviceType": "Delivery",
+            "status": "Created",
+            "organizationId": args.organization,
+            "creatorUsername": args.username}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base_url")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--organization", required=True)
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        started = time.perf_counter()
+        for number in range(args.count):
+            response = await client.post("/api/tenders/new",
+                                         json=make_tender(args, number))
+            response.raise_for_status()
+        single = args.count / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for first in range(0, args.count, args.batch):
+            batch = [make_tender(args, number)
+                     for number in range(first, min(first + args.batch, args.count))]
+            response = await client.post("/api/tenders/bulk", json=batch)
+            response.raise_for_status()
+        bulk = args.count / (time.perf_counter() - started)
+
+    print(f"single: {single:.0f} tenders/s")
+    print(f"bulk:   {bulk:.0f} tenders/s ({bulk / single:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
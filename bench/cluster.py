@@ -0,0 +1,99 @@
+"""
+Throwaway local Postgres cluster for benchmarks, without docker.
+
+`initdb` and `pg_ctl` of a local Postgres installation must be on PATH
+(or in `PG_BIN`). The cluster lives in a temporary directory, listens on
+a unix socket and a free localhost port, and is removed on exit.
+"""
+from typing import Iterator
+from urllib.parse import urlsplit
+import contextlib
+import getpass
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+
+
+def _binary(name: str) -> str:
+    path = os.path.join(os.environ["PG_BIN"], name) if "PG_BIN" in os.environ else shutil.which(name)
+    if not path or not os.path.exists(path):
+        raise RuntimeError(f"{name} not found, add Postgres binaries to PATH or set PG_BIN")
+
+    return path
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def throwaway_cluster() -> Iterator[str]:
+    """
+    Creates and starts a temporary Postgres cluster.
+
+    Yields:
+        `postgresql://` DSN of its `postgres` database.
+    """
+
+    directory = tempfile.mkdtemp(prefix="bench-pg-")
+    data = os.path.join(directory, "data")
+    port = _free_port()
+    user = getpass.getuser()
+
+    subprocess.run([_binary("initdb"), "-D", data, "-U", user, "-A", "trust",
+                    "--no-sync", "-E", "UTF8"],
+                   check=True, stdout=subprocess.DEVNULL)
+    subprocess.run([_binary("pg_ctl"), "-D", data, "-l", os.path.join(directory, "log"),
+                    "-o", f"-p {port} -k {directory} -c fsync=off "
+                          "-c synchronous_commit=off -c max_connections=300",
+                    "-w", "start"],
+                   check=True, stdout=subprocess.DEVNULL)
+    try:
+        yield f"postgresql://{user}@127.0.0.1:{port}/postgres"
+
+    finally:
+        subprocess.run([_binary("pg_ctl"), "-D", data, "-m", "immediate", "stop"],
+                       stdout=subprocess.DEVNULL)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def throwaway_replica(primary: str, apply_delay_ms: int = 0) -> Iterator[str]:
+    """
+    Creates and starts a streaming replica of a `throwaway_cluster`
+    with `pg_basebackup`, which must be on PATH too.
+
+    Args:
+        primary:
+            DSN yielded by `throwaway_cluster`.
+        apply_delay_ms:
+            `recovery_min_apply_delay` of the replica, to simulate replication lag.
+
+    Yields:
+        `postgresql://` DSN of its `postgres` database.
+    """
+
+    directory = tempfile.mkdtemp(prefix="bench-pg-replica-")
+    data = os.path.join(directory, "data")
+    port = _free_port()
+    user = urlsplit(primary).username
+
+    subprocess.run([_binary("pg_basebackup"), "-d", primary, "-D", data,
+                    "-R", "-X", "stream", "--no-sync"],
+                   check=True, stdout=subprocess.DEVNULL)
+    subprocess.run([_binary("pg_ctl"), "-D", data, "-l", os.path.join(directory, "log"),
+                    "-o", f"-p {port} -k {directory} -c fsync=off -c max_connections=300 "
+                          f"-c recovery_min_apply_delay={apply_delay_ms}ms",
+                    "-w", "start"],
+                   check=True, stdout=subprocess.DEVNULL)
+    try:
+        yield f"postgresql://{user}@127.0.0.1:{port}/postgres"
+
+    finally:
+        subprocess.run([_binary("pg_ctl"), "-D", data, "-m", "immediate", "stop"],
+                       stdout=subprocess.DEVNULL)
+        shutil.rmtree(directory, ignore_errors=True)
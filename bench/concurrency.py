@@ -0,0 +1,121 @@
+"""
+Stress test of optimistic concurrency on `PATCH /api/tenders/{id}/edit`.
+
+Creates a tender, then runs parallel editors against it for a while.
+Every editor reads the tender ETag, sends an edit with `If-Match`
+and, on `409`, retries from the ETag of the conflict response.
+At the end the tender version must equal 1 + number of accepted edits,
+i.e. no update was lost, and there must be no 5xx responses.
+
+Usage:
+    python bench/concurrency.py http://localhost:8080 \
+        --username user1 --organization-id <uuid> --editors 32 --duration 10
+
+With `--blind` the editors send no precondition, which shows the raw
+throughput of serialized writes to a single row.
+"""
+from typing import Dict, Optional
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+
+
+async def editor(client: httpx.AsyncClient,
+                 number: int,
+                 tender_id: str,
+                 params: Dict[str, str],
+                 deadline: float,
+                 blind: bool,
+                 counters: Dict[str, int]) -> None:
+    tag: Optional[str] = None
+    edit = 0
+
+    while time.perf_counter() < deadline:
+        if tag is None and not blind:
+            response = await client.get(f"/api/tenders/{tender_id}/status", params=params)
+            tag = response.headers["ETag"]
+
+        edit += 1
+        headers = {} if blind else {"If-Match": tag}
+        response = await client.patch(f"/api/tenders/{tender_id}/edit",
+                                      params=params,
+                                      headers=headers,
+                                      json={"description": f"editor {number}, edit {edit}"})
+
+        if response.status_code == 200:
+            counters["accepted"] += 1
+        elif response.status_code == 409:
+            counters["conflicts"] += 1
+        elif response.status_code >= 500:
+            counters["errors"] += 1
+        else:
+            response.raise_for_status()
+
+        tag = response.headers.get("ETag")
+
+
+async def run(url: str,
+              username: str,
+              organization_id: str,
+              editors: int,
+              duration: float,
+              blind: bool) -> bool:
+    params = {"username": username}
+    counters = {"accepted": 0, "conflicts": 0, "errors": 0}
+
+    limits = httpx.Limits(max_connections=editors)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        response = await client.post("/api/tenders/new",
+                                     json={"name": "Concurrency bench",
+                                           "description": "initial",
+                                           "serviceType": "Delivery",
+                                           "status": "Created",
+                                           "organizationId": organization_id,
+                                           "creatorUsername": username})
+        response.raise_for_status()
+        tender_id = response.json()["id"]
+
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(editor(client, number, tender_id, params,
+                                      deadline, blind, counters)
+                               for number in range(editors)))
+        elapsed = time.perf_counter() - started
+
+        response = await client.get(f"/api/tenders/{tender_id}/status", params=params)
+        version = int(response.headers["ETag"].strip('"').split(".")[1])
+
+    lost = 1 + counters["accepted"] - version
+
+    print(f"editors:     {editors}")
+    print(f"accepted:    {counters['accepted']}")
+    print(f"conflicts:   {counters['conflicts']}")
+    print(f"errors:      {counters['errors']}")
+    print(f"edits/s:     {counters['accepted'] / elapsed:.1f}")
+    print(f"version:     {version}")
+    print(f"lost:        {lost}")
+
+    return lost == 0 and counters["errors"] == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--organization-id", required=True)
+    parser.add_argument("--editors", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--blind", action="store_true")
+    args = parser.parse_args()
+
+    ok = asyncio.run(run(url=args.url,
+                         username=args.username,
+                         organization_id=args.organization_id,
+                         editors=args.editors,
+                         duration=args.duration,
+                         blind=args.blind))
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,309 @@
+"""
+Checks that statements issued by the application use indexes.
+
+Usage:
+    python bench/plans.py --tenders 50000
+
+Starts a throwaway cluster (see `bench/cluster.py`), builds the schema with
+`model.migrations.migrate`, seeds it with synthetic rows and analyzes it.
+Then the app built by `main.create_app` is driven in process through
+a scripted run of the read and write endpoints, including `If-Match`
+conflicts, rollbacks, reviews and a decision vote. Every statement the app
+sends is captured by a `before_cursor_execute` hook and planned with
+`EXPLAIN (FORMAT JSON)` on the same connection, with its real parameters,
+right before it runs. Statements are aggregated by normalized SQL, so the
+check follows the queries of `funcs` and the getters and checkers
+as they change.
+
+The script exits with code 1 if any plan contains a sequential scan over
+a seeded table, or if a scripted call answers with an unexpected code
+(its statements would be missing from the check).
+"""
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.cluster import throwaway_cluster  # noqa: E402
+from main import create_app  # noqa: E402
+from model import create as database  # noqa: E402
+from model.create import create_engine  # noqa: E402
+from model.migrations import migrate  # noqa: E402
+from settings import Settings  # noqa: E402
+from src.backend.misc.funcs import metrics  # noqa: E402
+from src.backend.misc.funcs.slow_queries import normalize  # noqa: E402
+
+LARGE_TABLES = {"employee", "organization", "organization_responsible",
+                "tender", "tender_version", "bid", "bid_version", "bidReview"}
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+SEED = [
+    "INSERT INTO employee (id, username) "
+    "SELECT gen_random_uuid(), 'user' || g FROM generate_series(1, :orgs) g",
+    "INSERT INTO organization (id, name, type) "
+    "SELECT gen_random_uuid(), 'org' || g, 'LLC' FROM generate_series(1, :orgs) g",
+    "INSERT INTO organization_responsible (id, organization_id, user_id) "
+    "SELECT gen_random_uuid(), o.id, e.id "
+    "FROM (SELECT id, row_number() OVER () AS n FROM organization) o "
+    "JOIN (SELECT id, row_number() OVER () AS n FROM employee) e USING (n)",
+    'INSERT INTO tender (id, name, description, "serviceType", status, '
+    '"organizationId", version, "createdAt") '
+    "SELECT gen_random_uuid()::text, 'tender ' || g, 'description', "
+    "(ARRAY['Construction', 'Delivery', 'Manufacture'])[1 + g % 3]::\"tenderServiceType\", "
+    "'Published', orgs.ids[1 + g % :orgs], 3, '2024-09-13T10:00:00Z' "
+    "FROM generate_series(1, :tenders) g, "
+    "(SELECT array_agg(id) AS ids FROM organization) orgs",
+    'INSERT INTO tender_version (tender_id, version, name, description, '
+    '"serviceType", status, "organizationId", "createdAt") '
+    'SELECT t.id, v, t.name, t.description, t."serviceType", t.status, '
+    't."organizationId", t."createdAt" FROM tender t, generate_series(1, 3) v',
+    'INSERT INTO bid (id, name, description, status, "tenderId", '
+    '"authorType", "authorId", version, "createdAt") '
+    "SELECT gen_random_uuid()::text, 'bid ' || g, 'description', 'Created', "
+    "tenders.ids[1 + g % :tenders], 'Organization', orgs.ids[1 + g % :orgs], "
+    "2, '2024-09-13T10:00:00Z' "
+    "FROM generate_series(1, 2 * :tenders) g, "
+    "(SELECT array_agg(id) AS ids FROM tender) tenders, "
+    "(SELECT array_agg(id) AS ids FROM organization) orgs",
+    'INSERT INTO bid_version (bid_id, version, name, description, status, '
+    '"tenderId", "authorType", "authorId", "createdAt") '
+    'SELECT b.id, v, b.name, b.description, b.status, b."tenderId", '
+    'b."authorType", b."authorId", b."createdAt" '
+    "FROM bid b, generate_series(1, 2) v",
+    'INSERT INTO "bidReview" (id, bid_id, bid_version, tender_id, description, "createdAt") '
+    "SELECT gen_random_uuid()::text, bid_id, version, \"tenderId\", 'review', "
+    "'2024-09-13T10:00:00Z' FROM bid_version "
+    "WHERE abs(hashtext(bid_id)) % 4 = 0",
+]
+
+# A responsible employee, a tender of their organization and a bid on it
+SAMPLE = ('SELECT e.username, r.organization_id::text AS org_id, t.id AS tender_id '
+          "FROM employee e "
+          "JOIN organization_responsible r ON r.user_id = e.id "
+          'JOIN tender t ON t."organizationId" = r.organization_id '
+          'WHERE EXISTS (SELECT 1 FROM bid b WHERE b."tenderId" = t.id) '
+          "LIMIT 1")
+
+
+class PlanCapture:
+    """
+    Plans of the statements an engine runs, by normalized SQL,
+    with the routes that issued them.
+    """
+
+    def __init__(self) -> None:
+        self.statements: Dict[str, Dict[str, Any]] = {}
+
+    def install(self, engine: AsyncEngine) -> None:
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+            if not statement.lstrip().upper().startswith(EXPLAINABLE):
+                return
+
+            entry = self.statements.setdefault(normalize(statement),
+                                               {"routes": set(), "plan": None})
+            entry["routes"].add(metrics.current_route() or "-")
+            if entry["plan"] is None:
+                entry["plan"] = explain(conn, statement,
+                                        parameters[0] if executemany else parameters)
+
+
+def explain(conn, statement: str, parameters: Any) -> Optional[Dict[str, Any]]:
+    """
+    Plans **statement** with `EXPLAIN (FORMAT JSON)` on the DBAPI cursor
+    of the connection about to run it, inside a savepoint,
+    so a failure doesn't abort the transaction.
+    """
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT plan_check")
+        try:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            plan = cursor.fetchall()[0][0]
+
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT plan_check")
+            raise
+
+        finally:
+            cursor.execute("RELEASE SAVEPOINT plan_check")
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]
+
+    except Exception as e:
+        print(f"Could not explain {normalize(statement)[:80]}: {e}")
+        return None
+
+    finally:
+        cursor.close()
+
+
+def seq_scans(plan: Dict[str, Any]) -> Iterator[str]:
+    if plan["Node Type"] == "Seq Scan" and plan.get("Relation Name") in LARGE_TABLES:
+        yield plan["Relation Name"]
+
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child)
+
+
+def plan_nodes(plan: Dict[str, Any]) -> Iterator[str]:
+    name = plan["Node Type"]
+    if "Index Name" in plan:
+        name += f" ({plan['Index Name']})"
+    yield name
+
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+async def seed(dsn: str, tenders: int, orgs: int) -> Dict[str, str]:
+    engine = create_engine(Settings(postgres_url=dsn))
+    try:
+        await migrate(engine)
+        async with engine.begin() as conn:
+            for statement in SEED:
+                await conn.execute(text(statement), {"tenders": tenders, "orgs": orgs})
+
+        async with engine.connect() as conn:
+            await conn.execute(text("ANALYZE"))
+            return (await conn.execute(text(SAMPLE))).one()._asdict()
+
+    finally:
+        await engine.dispose()
+
+
+async def run(client: httpx.AsyncClient, sample: Dict[str, str]) -> List[Tuple[str, int, int]]:
+    """
+    Calls the read and write endpoints once each, as the sample user.
+
+    Returns:
+        (call, expected code, code) triples.
+    """
+
+    calls: List[Tuple[str, int, int]] = []
+    username, org_id, tender_id = sample["username"], sample["org_id"], sample["tender_id"]
+    user = {"username": username}
+
+    async def call(name: str, expected: int, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        response = await client.request(method, path, **kwargs)
+        calls.append((name, expected, response.status_code))
+        return response
+
+    new_tender = {"name": "plan check", "description": "plan check",
+                  "serviceType": "Delivery", "organizationId": org_id,
+                  "creatorUsername": username, "status": "Published"}
+
+    # Reads of seeded rows
+    await call("tenders", 200, "GET", "/api/tenders", params={"service_type": "Delivery"})
+    page = await call("fresh tenders, first keyset page", 200, "GET", "/api/tenders",
+                      params={"service_type": "Delivery", "only_new": "true", "cursor": ""})
+    next_cursor = page.json()["next_cursor"] if page.status_code == 200 else None
+    if next_cursor:
+        await call("fresh tenders, next keyset page", 200, "GET", "/api/tenders",
+                   params={"service_type": "Delivery", "only_new": "true",
+                           "cursor": next_cursor})
+    await call("my tenders", 200, "GET", "/api/tenders/my", params=user)
+    await call("tender status", 200, "GET", f"/api/tenders/{tender_id}/status", params=user)
+    await call("tender versions", 200, "GET", f"/api/tenders/{tender_id}/versions", params=user)
+    await call("my bids", 200, "GET", "/api/bids/my", params=user)
+    await call("my fresh bids", 200, "GET", "/api/bids/my", params={**user, "only_new": "true"})
+    await call("bids of tender", 200, "GET", f"/api/bids/{tender_id}/list", params=user)
+    await call("reviews", 200, "GET", f"/api/{tender_id}/reviews",
+               params={"authorUsername": username, "requesterUsername": username})
+
+    # Tender writes
+    tender = await call("create tender", 200, "POST", "/api/tenders/new", json=new_tender)
+    tender.raise_for_status()
+    new_id = tender.json()["id"]
+    await call("bulk create tenders", 200, "POST", "/api/tenders/bulk", json=[new_tender])
+    status = await call("change tender status", 200, "PUT", f"/api/tenders/{new_id}/status",
+                        params={**user, "status": "Published"})
+    await call("edit tender", 200, "PATCH", f"/api/tenders/{new_id}/edit",
+               params=user, json={"name": "edited"},
+               headers={"If-Match": status.headers.get("ETag", "")})
+    await call("edit tender with a stale If-Match", 409, "PATCH", f"/api/tenders/{new_id}/edit",
+               params=user, json={"name": "edited again"},
+               headers={"If-Match": status.headers.get("ETag", "")})
+    await call("roll back tender", 200, "PUT", f"/api/tenders/{new_id}/rollback/1", params=user)
+
+    # Bid writes, on the new tender
+    new_bid = {"name": "plan check", "description": "plan check", "status": "Created",
+               "tenderId": new_id, "organizationId": org_id, "creatorUsername": username}
+    bid = await call("create bid", 200, "POST", "/api/bids/new", json=new_bid)
+    bid.raise_for_status()
+    bid_id = bid.json()["id"]
+    await call("bulk create bids", 200, "POST", "/api/bids/bulk", json=[new_bid])
+    status = await call("change bid status", 200, "PUT", f"/api/bids/{bid_id}/status",
+                        params={**user, "status": "Published"})
+    await call("edit bid", 200, "PATCH", f"/api/bids/{bid_id}/edit",
+               params=user, json={"name": "edited"},
+               headers={"If-Match": status.headers.get("ETag", "")})
+    await call("edit bid with a stale If-Match", 409, "PATCH", f"/api/bids/{bid_id}/edit",
+               params=user, json={"name": "edited again"},
+               headers={"If-Match": status.headers.get("ETag", "")})
+    await call("roll back bid", 200, "PUT", f"/api/bids/{bid_id}/rollback/1", params=user)
+    await call("bid status", 200, "GET", f"/api/bids/{bid_id}/status", params=user)
+    await call("bid versions", 200, "GET", f"/api/bids/{bid_id}/versions", params=user)
+    await call("feedback", 200, "PUT", f"/api/bids/{bid_id}/feedback",
+               params={**user, "bidFeedback": "plan check"})
+    # The only responsible of the organization makes the quorum, closing the tender
+    await call("decision", 200, "PUT", f"/api/bids/{bid_id}/submit_decision",
+               params={**user, "decision": "Approved"})
+
+    return calls
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenders", type=int, default=50_000)
+    parser.add_argument("--orgs", type=int, default=2_000)
+    args = parser.parse_args()
+
+    capture = PlanCapture()
+
+    with throwaway_cluster() as dsn:
+        sample = await seed(dsn, tenders=args.tenders, orgs=args.orgs)
+
+        app = create_app(Settings(postgres_url=dsn, warmup=False))
+        async with app.router.lifespan_context(app):
+            capture.install(database.engine)
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                                         base_url="http://plans") as client:
+                calls = await run(client, sample)
+
+    failed = False
+    for name, expected, status in calls:
+        if status != expected:
+            failed = True
+            print(f"{status:>4} expected {expected:<5} {name}")
+
+    for sql, entry in capture.statements.items():
+        plan = entry["plan"]
+        routes = ", ".join(sorted(entry["routes"]))
+        if plan is None:
+            failed = True
+            print(f"{'NOT EXPLAINED':<40} [{routes}] {sql[:120]}")
+            continue
+
+        scans: Set[str] = set(seq_scans(plan))
+        failed = failed or bool(scans)
+        verdict = f"SEQ SCAN on {', '.join(sorted(scans))}" if scans else "ok"
+        print(f"{verdict:<40} [{routes}] {' > '.join(plan_nodes(plan))}\n"
+              f"{'':<40} {sql[:120]}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
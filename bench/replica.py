@@ -0,0 +1,129 @@
+"""
+Checks read-your-writes consistency of replica routing.
+
+Usage:
+    python bench/replica.py --delay-ms 500 --rounds 50
+
+Starts a throwaway primary cluster and a streaming replica of it
+(see `bench/cluster.py`) that applies WAL **delay-ms** late, then runs
+`bench/server.py` with the replica in `POSTGRES_REPLICA_URLS`. Every round
+creates a tender, changes its status and reads the status back right after
+each write, once with the `X-Consistency-Token` of the write and once
+without it. Reads with the token must see the write; reads without it
+are expected to be stale while the replica lags. The script exits
+with code 1 if any read with a token is stale.
+"""
+from typing import Dict
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.cluster import throwaway_cluster, throwaway_replica  # noqa: E402
+from bench.suite import server  # noqa: E402
+from model.create import CONSISTENCY_HEADER, create_engine  # noqa: E402
+from model.migrations import migrate  # noqa: E402
+from settings import Settings  # noqa: E402
+
+ORG_ID = "00000000-0000-4000-8000-000000000001"
+USERNAME = "replica_bench"
+
+SEED = [
+    f"INSERT INTO organization (id, name, type) VALUES ('{ORG_ID}', 'bench', 'LLC')",
+    f"INSERT INTO employee (id, username) VALUES (gen_random_uuid(), '{USERNAME}')",
+    "INSERT INTO organization_responsible (id, organization_id, user_id) "
+    f"SELECT gen_random_uuid(), '{ORG_ID}', id FROM employee WHERE username = '{USERNAME}'",
+]
+
+
+async def seed(dsn: str) -> None:
+    engine = create_engine(Settings(postgres_url=dsn))
+    try:
+        await migrate(engine)
+        async with engine.begin() as conn:
+            for statement in SEED:
+                await conn.execute(text(statement))
+
+    finally:
+        await engine.dispose()
+
+
+async def check(base_url: str, rounds: int) -> Dict[str, int]:
+    counters = {"reads": 0, "stale_with_token": 0, "stale_without_token": 0,
+                "tokenless_writes": 0}
+    params = {"username": USERNAME}
+
+    async def read_status(client: httpx.AsyncClient,
+                          tender_id: str,
+                          expected: str,
+                          token: str) -> None:
+        with_token = await client.get(f"/api/tenders/{tender_id}/status", params=params,
+                                      headers={CONSISTENCY_HEADER: token})
+        without_token = await client.get(f"/api/tenders/{tender_id}/status", params=params)
+
+        counters["reads"] += 1
+        if with_token.status_code != 200 or with_token.json() != expected:
+            counters["stale_with_token"] += 1
+        if without_token.status_code != 200 or without_token.json() != expected:
+            counters["stale_without_token"] += 1
+
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for number in range(rounds):
+            response = await client.post("/api/tenders/new",
+                                         json={"name": f"tender {number}",
+                                               "description": "replica check",
+                                               "serviceType": "Construction",
+                                               "organizationId": ORG_ID,
+                                               "creatorUsername": USERNAME,
+                                               "status": "Created"})
+            response.raise_for_status()
+            tender_id = response.json()["id"]
+            token = response.headers.get(CONSISTENCY_HEADER)
+            if token is None:
+                counters["tokenless_writes"] += 1
+                continue
+            await read_status(client, tender_id, "Created", token)
+
+            response = await client.put(f"/api/tenders/{tender_id}/status",
+                                        params={**params, "status": "Published"})
+            response.raise_for_status()
+            token = response.headers.get(CONSISTENCY_HEADER)
+            if token is None:
+                counters["tokenless_writes"] += 1
+                continue
+            await read_status(client, tender_id, "Published", token)
+
+    return counters
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delay-ms", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    with throwaway_cluster() as primary, throwaway_replica(primary, args.delay_ms) as replica:
+        await seed(primary)
+
+        async with server(primary, workers=1,
+                          env={"POSTGRES_REPLICA_URLS": replica}) as base_url:
+            started = time.perf_counter()
+            counters = await check(base_url, args.rounds)
+            elapsed = time.perf_counter() - started
+
+    for name, value in counters.items():
+        print(f"{name + ':':<24}{value}")
+    print(f"{'seconds:':<24}{elapsed:.1f}")
+
+    failed = counters["stale_with_token"] or counters["tokenless_writes"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
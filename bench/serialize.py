@@ -0,0 +1,97 @@
+"""
+Microbenchmark of list serialization: ORM objects through
+`jsonable_encoder` and `json` (old path) against column rows
+encoded with orjson (current path).
+
+Usage:
+    python bench/serialize.py --rows 10000 --repeat 20
+
+No database is needed: ORM objects are built in memory and rows are
+represented by named tuples with the labels of `tender_columns`.
+Bid rows, built with the UUID type asyncpg returns for `authorId`,
+are checked to encode as well and measured the same way.
+"""
+from collections import namedtuple
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import orjson
+from asyncpg.pgproto.pgproto import UUID as PgUUID
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("POSTGRES_CONN", "postgresql://bench@localhost/bench")
+
+from model.models import Tender  # noqa: E402
+from src.backend.misc.funcs.bid import format_bid  # noqa: E402
+from src.backend.misc.funcs.tender import format_tender  # noqa: E402
+
+TenderRow = namedtuple("TenderRow", ["id", "name", "description", "status",
+                                     "serviceType", "version", "createdAt"])
+BidRow = namedtuple("BidRow", ["id", "name", "description", "status", "tenderId",
+                               "authorType", "authorId", "version", "createdAt"])
+
+
+def orm_path(count: int) -> bytes:
+    tenders = [Tender(id=f"{number:032x}", name=f"tender {number}",
+                      description="description", status="Published",
+                      serviceType="Delivery", version=1,
+                      createdAt="2024-09-13T10:00:00Z")
+               for number in range(count)]
+
+    items = [format_tender(tender) for tender in tenders]
+    return json.dumps(jsonable_encoder(items)).encode()
+
+
+def row_path(count: int) -> bytes:
+    rows = [TenderRow(f"{number:032x}", f"tender {number}", "description",
+                      "Published", "Delivery", 1, "2024-09-13T10:00:00Z")
+            for number in range(count)]
+
+    return orjson.dumps([format_tender(row) for row in rows])
+
+
+def bid_row_path(count: int) -> bytes:
+    rows = [BidRow(f"{number:032x}", f"bid {number}", "description", "Published",
+                   f"{number:032x}", "Organization",
+                   PgUUID(f"{number:032x}"), 1, "2024-09-13T10:00:00Z")
+            for number in range(count)]
+
+    return orjson.dumps([format_bid(row) for row in rows])
+
+
+def measure(name: str, path, count: int, repeat: int) -> None:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        path(count)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    path(count)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"{name}: {count * repeat / elapsed:.0f} rows/s, "
+          f"peak {peak / 2 ** 20:.1f} MiB per {count} rows")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    assert json.loads(orm_path(10)) == json.loads(row_path(10))
+    assert json.loads(bid_row_path(10))[1]["authorId"] == str(PgUUID(f"{1:032x}"))
+
+    measure("orm + jsonable_encoder", orm_path, args.rows, args.repeat)
+    measure("rows + orjson", row_path, args.rows, args.repeat)
+    measure("bid rows + orjson", bid_row_path, args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Runs the app for `bench/suite.py`, with every response carrying
+an `X-Query-Count` header: the number of SQL statements the request
+executed before its response started.
+
+Usage:
+    POSTGRES_CONN=... SERVER_ADDRESS=127.0.0.1:8080 SERVER_WORKERS=4 python bench/server.py
+"""
+from typing import Any, Awaitable, Callable, Dict
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SERVER_ACCESS_LOG", "false")
+
+import main  # noqa: E402
+from settings import Settings  # noqa: E402
+from src.backend.misc.funcs import metrics  # noqa: E402
+
+
+class QueryCounter:
+    """
+    ASGI middleware adding the statement count of `metrics.MetricsMiddleware`
+    to response headers. The app sends the response start from within
+    that middleware, so its per-request counter is visible here.
+    """
+
+    def __init__(self, app: Callable[..., Awaitable[None]]) -> None:
+        self.app = app
+
+    async def __call__(self,
+                       scope: Dict[str, Any],
+                       receive: Callable[[], Awaitable[Dict[str, Any]]],
+                       send: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def counted_send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                count = metrics.request_statements() or 0
+                message["headers"] = [*message.get("headers", []),
+                                      (b"x-query-count", str(count).encode())]
+            await send(message)
+
+        await self.app(scope, receive, counted_send)
+
+
+def create_app() -> QueryCounter:
+    return QueryCounter(main.create_app())
+
+
+if __name__ == "__main__":
+    main.serve(Settings.from_env(), "bench.server:create_app")
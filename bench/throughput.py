@@ -0,0 +1,66 @@
+"""
+Measures throughput of a single endpoint of a running API instance.
+
+Usage:
+    python bench/throughput.py "http://localhost:8080/api/tenders?service_type=" \
+        --concurrency 64 --duration 10
+
+Run it against the same database and hardware before and after a change
+to compare requests/sec per worker.
+"""
+from typing import List
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def worker(client: httpx.AsyncClient,
+                 url: str,
+                 deadline: float,
+                 latencies: List[float],
+                 errors: List[int]) -> None:
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get(url)
+        latencies.append(time.perf_counter() - started)
+
+        if response.status_code >= 500:
+            errors.append(response.status_code)
+
+
+async def run(url: str, concurrency: int, duration: float) -> None:
+    latencies: List[float] = []
+    errors: List[int] = []
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await client.get(url)
+
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(worker(client, url, deadline, latencies, errors)
+                               for _ in range(concurrency)))
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+
+    print(f"requests:    {len(latencies)}")
+    print(f"errors:      {len(errors)}")
+    print(f"req/s:       {len(latencies) / duration:.1f}")
+    print(f"p50, ms:     {quantiles[49] * 1000:.2f}")
+    print(f"p99, ms:     {quantiles[98] * 1000:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    asyncio.run(run(url=args.url,
+                    concurrency=args.concurrency,
+                    duration=args.duration))
@@ -1,71 +1,168 @@
-from typing import List, Dict, Any
-import datetime
+from typing import List, Dict, Any, Optional
 import sys
 import logging
 from os import getenv
-import os
-from pyrfc3339 import generate
-import pytz
+from uuid import UUID
+from contextlib import asynccontextmanager
 
 import uvicorn
-from fastapi import FastAPI, status as http_status, Depends, Query, Request
+from fastapi import APIRouter, FastAPI, status as http_status, Depends, Header, Query, Request
 from fastapi.exceptions import RequestValidationError, ValidationException
-from fastapi.responses import JSONResponse
-from sqlalchemy import select, update, delete
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import DBAPIError, IntegrityError, SQLAlchemyError
 
-from model.models import Tender, Bid, BidReview
-from model.create import get_db
+from model.models import Tender, TenderVersion, Bid, BidVersion
+from model import create as database
+from model.create import get_db, gather_isolated, pool_status, probe_db
+from model.migrations import migrate
+from settings import Settings
 
 from src.backend.misc.validators import (tender as tender_model,
                               bid as bid_model)
 
 from src.backend.misc.checkers import (bid as validate_bid,
                             organisation as validate_org,
-                            tender as validate_tender,
-                            user as validate_user)
+                            tender as validate_tender)
 
 from src.backend.misc.generators import (bid as generate_bid,
-                              tender as generate_tender)
+                              tender as generate_tender,
+                              universal as generate_universal)
 
 from src.backend.misc.getters import (bid as get_bid,
-                           organisation as get_org,
                            tender as get_tender,
                            user as get_user)
+from src.backend.misc.getters.user import Principal
 
 from src.backend.misc.funcs import (bid as bid_funcs,
                          tender as tender_funcs,
-                         review as review_funcs)
+                         review as review_funcs,
+                         cache as response_cache,
+                         concurrency,
+                         consistency,
+                         etag,
+                         metrics,
+                         pagination,
+                         slow_queries,
+                         warmup)
 
 
-app = FastAPI(debug=True)
-
 log = logging.getLogger(__name__)
 
-ADDRESS = getenv("SERVER_ADDRESS")
+BULK_MAX_ITEMS = int(getenv("BULK_MAX_ITEMS", "1000"))
+
+router = APIRouter()
+
+
+@router.get("/api/ping")
+async def ping():
+    return "ok"
+
 
-if not ADDRESS:
-    log.fatal(msg="Connection parameters not provided. Need SERVER_ADDRESS env variable")
-    sys.exit(1)
+@router.get("/api/health/ready")
+async def readiness(request: Request):
+    """
+    Responds with `200` once migrations and warmup are done,
+    and with `503` while the worker is shutting down.
+    """
 
-APP_HOST = ADDRESS.split(sep=":")[0]
-APP_PORT = int(ADDRESS.split(sep=":")[1])
+    if not request.app.state.ready:
+        return JSONResponse(
+            status_code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"reason": "Not ready"})
 
-@app.get("/api/ping")
-def ping():
     return "ok"
 
 
-@app.get("/api/tenders")
-def get_tenders(service_type: List[str] = Query(...),
-                limit: int = Query(5, ge=1),
-                offset: int = Query(0, ge=0),
-                only_new: bool = Query(default=False),
-                session: Session = Depends(get_db)
-                ):
+@router.get("/api/health/db")
+async def db_health():
+    """
+    Reports connection pool state and a live `SELECT 1` round-trip latency.
+    """
+
+    try:
+        latency_ms = await probe_db()
+
+    except (OSError, SQLAlchemyError) as e:
+        log.error(msg=f"Database health probe failed. Reason:{e}")
+
+        return JSONResponse(
+            status_code=http_status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"reason": "Database is unavailable",
+                     "pool": pool_status()})
+
+    return {"pool": pool_status(),
+            "latency_ms": latency_ms}
+
+
+@router.get("/metrics")
+async def prometheus_metrics():
     """
-    Param **only_new**=True returns a list of only latest-vertion tenders 
+    Serves request, database and connection pool metrics
+    in Prometheus text format.
+    """
+
+    return Response(content=metrics.render(pool_status()),
+                    media_type=metrics.CONTENT_TYPE)
+
+
+@router.get("/api/health/cache")
+async def cache_health():
+    """
+    Reports hit/miss/eviction counters of the `GET /api/tenders` response cache.
+    """
+
+    return response_cache.tenders.stats()
+
+
+@router.get("/api/admin/slow_queries")
+async def get_slow_queries(limit: int = Query(20, ge=1, le=slow_queries.SLOW_QUERY_MAX_STATEMENTS),
+                           sort: str = Query(default="total_ms",
+                                             pattern="^(" + "|".join(slow_queries.SORT_KEYS) + ")$")):
+    """
+    Lists the **limit** slow statements of this worker with the largest
+    total time, or **sort**=max_ms|calls.\n
+    Each one has its normalized SQL, call count, total, average and maximum
+    duration, calls per route, last (redacted) parameters and the last
+    captured plan, if any.
+    """
+
+    return {"threshold_ms": slow_queries.SLOW_QUERY_MS,
+            "statements": slow_queries.slow_queries.top(limit, sort)}
+
+
+@router.delete("/api/admin/slow_queries")
+async def reset_slow_queries():
+    """
+    Forgets the slow statements recorded by this worker.
+    """
+
+    slow_queries.slow_queries.clear()
+    return "ok"
+
+
+@router.get("/api/tenders")
+async def get_tenders(service_type: List[str] = Query(...),
+                      limit: int = Query(5, ge=1, le=pagination.MAX_PAGE_SIZE),
+                      offset: int = Query(0, ge=0),
+                      only_new: bool = Query(default=False),
+                      cursor: Optional[str] = Query(default=None),
+                      stream: Optional[str] = Query(default=None, pattern="^ndjson$"),
+                      if_none_match: Optional[str] = Header(default=None),
+                      session: AsyncSession = Depends(get_db)
+                      ):
+    """
+    Pages are served from `response_cache.tenders`, invalidated by
+    every tender write. Only pages read from the primary are stored:
+    a lagging replica could store a page older than the last write
+    under the new generation, served until the TTL expires.\n
+    Param **only_new**=True returns a list of only latest-vertion tenders.\n
+    Param **cursor** switches to keyset pagination: pass an empty string
+    for the first page, then `next_cursor` of the previous page.\n
+    Param **stream**=ndjson streams every matching tender as NDJSON,
+    ignoring **limit**, **offset** and **cursor**.\n
+    Responds with `304` if **If-None-Match** matches the page `ETag`.
     """
 
     valid_types: bool = set(service_type).issubset({"Construction", "Delivery", "Manufacture"})
@@ -77,54 +174,84 @@ def get_tenders(service_type: List[str] = Query(...),
                 content={"reason": "Invalid service type"})
 
     if only_new:
-        query = select(Tender.id)
-        if service_type != [""]:
-            query = query.where(Tender.serviceType.in_(service_type))
-
-        query = query.limit(limit).offset(offset).order_by(Tender.name)
-
-        res = session.execute(query)
-        tender_ids = res.scalars().all()
-
-        stripped_tender_ids = [id[:36] for id in tender_ids]
-        unique_tender_ids = set(stripped_tender_ids)
-
-        return [tender_funcs.format_tender(
-                get_tender.get_last_version_tender(tenderId=id,
-                                                   session=session))
-                for id in unique_tender_ids]
+        model, keys, etag_columns = Tender, tender_funcs.HEAD_ORDER, tender_funcs.HEAD_ETAG
+    else:
+        model, keys, etag_columns = TenderVersion, tender_funcs.VERSION_ORDER, tender_funcs.VERSION_ETAG
 
-    query = select(Tender)
+    query = select(*tender_funcs.tender_columns(model))
     if service_type != [""]:
-        query = query.where(Tender.serviceType.in_(service_type))
+        query = query.where(model.serviceType.in_(service_type))
+
+    if stream:
+        return pagination.stream_ndjson(query=query,
+                                        keys=keys,
+                                        format_row=tender_funcs.format_tender)
+
+    cache_key = f"tenders:{sorted(service_type)}:{limit}:{offset}:{only_new}:{cursor}"
+    cached, generation = await response_cache.tenders.get(cache_key)
+    if cached is not None:
+        page_etag, body = cached.split(b"\n", 1)
+        page_etag = page_etag.decode()
+
+        if etag.matches(if_none_match, page_etag):
+            return etag.not_modified(page_etag)
+
+        return Response(content=body,
+                        media_type="application/json",
+                        headers={"ETag": page_etag})
+
+    query = pagination.paginate(query=query,
+                                keys=keys,
+                                limit=limit,
+                                offset=offset,
+                                cursor=cursor)
+    if isinstance(query, JSONResponse):
+        return query
+
+    response = await pagination.page_not_modified(session=session,
+                                                  query=query,
+                                                  etag_columns=etag_columns,
+                                                  if_none_match=if_none_match)
+    if response:
+        return response
 
-    query = query.limit(limit).offset(offset).order_by(Tender.name)
+    res = await session.execute(query)
+    tenders = res.all()
 
-    res = session.execute(query)
-    tenders = res.scalars().all()
+    response = pagination.make_page(rows=tenders,
+                                    items=[tender_funcs.format_tender(tender)
+                                           for tender in tenders],
+                                    keys=keys,
+                                    limit=limit,
+                                    cursor=cursor,
+                                    etag_columns=etag_columns)
 
-    return [tender_funcs.format_tender(tender) for tender in tenders]
+    if database.on_primary():
+        await response_cache.tenders.set(cache_key,
+                                         response.headers["ETag"].encode() + b"\n" + response.body,
+                                         generation)
+    return response
 
 
-@app.post("/api/tenders/new")
-def post_tender(new_tender: tender_model.NewTender,
-                session: Session = Depends(get_db)):
+@router.post("/api/tenders/new")
+async def post_tender(new_tender: tender_model.NewTender,
+                      session: AsyncSession = Depends(get_db)):
 
-    response = validate_user.invalid_user_name(username=new_tender.creatorUsername,
-                                                                    session=session)
+    principal = await get_user.get_principal(username=new_tender.creatorUsername,
+                                             session=session)
 
-    if response:
+    if principal is None:
         return JSONResponse(
             status_code=http_status.HTTP_401_UNAUTHORIZED,
             content={"reason": "No such user"})
 
-    response = validate_user.invalid_user_rights(username=new_tender.creatorUsername,
-                                                 session=session)
-    if response:
-        return response
+    if not principal.is_responsible:
+        return JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
 
-    response = validate_org.invalid_org_id(orgId=new_tender.organizationId,
-                                           session=session)
+    response = await validate_org.invalid_org_id(orgId=new_tender.organizationId,
+                                                 session=session)
     if response:
         return response
 
@@ -139,32 +266,25 @@ def post_tender(new_tender: tender_model.NewTender,
             content={"reason": "Indalid status"})
 
     try:
+        tender_ids = generate_tender.gen_tender_id()
 
-        tender = Tender(
-                id=next(generate_tender.gen_tender_id(session=session)),
-                name=new_tender.name,
-                description=new_tender.description,
-                serviceType=new_tender.serviceType,
-                status=new_tender.status,
-                organizationId=new_tender.organizationId,
-                version=1,
-                createdAt=generate(datetime.datetime.now(datetime.UTC)
-                                   .replace(tzinfo=pytz.utc))
-            )
-
-        session.add(tender)
-        session.commit()
-        session.refresh(tender)
+        tender = await generate_universal.execute_with_new_id(
+            session=session,
+            make_statement=lambda tender_id: tender_funcs.create_tender_statement(
+                tenderId=tender_id,
+                new_tender=new_tender),
+            gen_id=lambda: next(tender_ids))
+        await response_cache.tenders.invalidate()
 
     except ValidationException:
-        session.rollback()
+        await session.rollback()
 
         return JSONResponse(
             status_code=http_status.HTTP_400_BAD_REQUEST,
             content={"reason": "Invalid request body or parameters"})
 
     except IntegrityError as ie:
-        session.rollback()
+        await session.rollback()
         log.fatal(msg=f"Integrity error while creating tender. Reason:{ie}")
 
         return JSONResponse(
@@ -175,120 +295,178 @@ def post_tender(new_tender: tender_model.NewTender,
     return tender_funcs.format_tender(tender=tender)
 
 
-@app.get("/api/tenders/my")
-def get_my_tenders(
-                   username: str = Query(...),
-                   limit: int = Query(5, ge=1),
-                   offset: int = Query(0, ge=0),
-                   session: Session = Depends(get_db)):
+@router.post("/api/tenders/bulk")
+async def post_tenders_bulk(new_tenders: List[tender_model.NewTender],
+                            session: AsyncSession = Depends(get_db)):
+    """
+    Creates many tenders at once. Responds with per-item results,
+    see `tender_funcs.bulk_create_tenders`.
+    """
+
+    if not new_tenders or len(new_tenders) > BULK_MAX_ITEMS:
+        return JSONResponse(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            content={"reason": f"Batch must contain 1 to {BULK_MAX_ITEMS} items"})
+
+    try:
+        results = await tender_funcs.bulk_create_tenders(session=session,
+                                                         tenders=new_tenders)
+        await response_cache.tenders.invalidate()
 
-    response = validate_user.invalid_user_name(username=username,
-                                               session=session)
+        return results
+
+    except DBAPIError as e:
+        await session.rollback()
+        log.fatal(msg=f"Database error while creating tenders. Reason:{e}")
 
-    if response:
+        return JSONResponse(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"reason": f"{type(e).__name__}. See logs for info."}
+        )
+
+
+@router.get("/api/tenders/my")
+async def get_my_tenders(
+                         limit: int = Query(5, ge=1, le=pagination.MAX_PAGE_SIZE),
+                         offset: int = Query(0, ge=0),
+                         cursor: Optional[str] = Query(default=None),
+                         stream: Optional[str] = Query(default=None, pattern="^ndjson$"),
+                         if_none_match: Optional[str] = Header(default=None),
+                         principal: Principal | None = Depends(get_user.current_principal),
+                         session: AsyncSession = Depends(get_db)):
+
+    if principal is None:
         return JSONResponse(
             status_code=http_status.HTTP_401_UNAUTHORIZED,
             content={"reason": "No such user"})
 
-    response = validate_user.invalid_user_rights(username=username,
-                                                 session=session)
-    if response:
+    if not principal.is_responsible:
         return JSONResponse(
             status_code=http_status.HTTP_401_UNAUTHORIZED,
             content={"reason": "No organisation found for user"})
 
-    org_id = get_org.get_respondible_org_id(session=session, username=username)
+    org_id = principal.organization_id
+    query = (select(*tender_funcs.tender_columns(TenderVersion))
+             .where(TenderVersion.organizationId == org_id))
+
+    if stream:
+        return pagination.stream_ndjson(query=query,
+                                        keys=tender_funcs.VERSION_ORDER,
+                                        format_row=tender_funcs.format_tender)
+
+    query = pagination.paginate(query=query,
+                                keys=tender_funcs.VERSION_ORDER,
+                                limit=limit,
+                                offset=offset,
+                                cursor=cursor)
+    if isinstance(query, JSONResponse):
+        return query
+
+    response = await pagination.page_not_modified(session=session,
+                                                  query=query,
+                                                  etag_columns=tender_funcs.VERSION_ETAG,
+                                                  if_none_match=if_none_match)
+    if response:
+        return response
 
-    res = session.execute(select(Tender).where(Tender.organizationId == org_id)
-                                        .limit(limit)
-                                        .offset(offset)
-                                        .order_by(Tender.name))
+    res = await session.execute(query)
 
-    tenders_list = res.scalars().all()
+    tenders_list = res.all()
 
-    return [tender_funcs.format_tender(tender) for tender in tenders_list]
+    return pagination.make_page(rows=tenders_list,
+                                items=[tender_funcs.format_tender(tender)
+                                       for tender in tenders_list],
+                                keys=tender_funcs.VERSION_ORDER,
+                                limit=limit,
+                                cursor=cursor,
+                                etag_columns=tender_funcs.VERSION_ETAG)
 
 
-@app.get("/api/tenders/{tenderId}/status")
-def get_tender_status(
-                    tenderId: str,
-                    username: str = Query(...),
-                    session: Session = Depends(get_db)):
+@router.get("/api/tenders/{tenderId}/status")
+async def get_tender_status(
+                          tenderId: str,
+                          if_none_match: Optional[str] = Header(default=None),
+                          principal: Principal | None = Depends(get_user.current_principal),
+                          session: AsyncSession = Depends(get_db)):
 
-    response = validate_user.invalid_user_name(username=username,
-                                               session=session)
-    if response:
+    if principal is None:
         return JSONResponse(
             status_code=http_status.HTTP_401_UNAUTHORIZED,
             content={"reason": "No such user"})
 
-    response = validate_user.invalid_user_rights(username=username,
-                                                 session=session)
-    if response:
-        return response
+    if not principal.is_responsible:
+        return JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
 
-    response = validate_tender.invalid_tender_id(tenderId=tenderId,
-                                                 session=session)
+    response = await validate_tender.invalid_tender_id(tenderId=tenderId,
+                                                       session=session)
     if response:
         return JSONResponse(
             status_code=http_status.HTTP_404_NOT_FOUND,
             content={"reason": "No such tender"})
 
-    org_id = get_org.get_respondible_org_id(username=username,
-                                            session=session)
-    res = session.execute(select(Tender.status)
-                          .filter(Tender.id.match(f"{tenderId}%"))
-                          .where(Tender.organizationId == org_id))
+    res = await session.execute(select(Tender.id, Tender.version,
+                                       Tender.revision, Tender.status)
+                                .where(Tender.id == str(UUID(tenderId)),
+                                       Tender.organizationId
+                                       == principal.organization_id))
+    tender = res.first()
+    if tender is None:
+        return None
+
+    tender_etag = etag.entity_etag(tender.id, tender.version, tender.revision)
+    if etag.matches(if_none_match, tender_etag):
+        return etag.not_modified(tender_etag)
 
-    return res.scalars().first()
+    return ORJSONResponse(tender.status, headers={"ETag": tender_etag})
 
 
-@app.put("/api/tenders/{tenderId}/status")
-def change_status(
-                tenderId: str,
-                username: str = Query(...),
-                status: str = Query(...),
-                session: Session = Depends(get_db)):
+@router.put("/api/tenders/{tenderId}/status")
+async def change_status(
+                      tenderId: str,
+                      status: str = Query(...),
+                      expected_version: Optional[int] = Query(default=None),
+                      if_match: Optional[str] = Header(default=None),
+                      principal: Principal | None = Depends(get_user.current_principal),
+                      session: AsyncSession = Depends(get_db)):
 
     if status not in {"Created", "Published", "Closed"}:
         return JSONResponse(
             status_code=http_status.HTTP_400_BAD_REQUEST,
             content={"reason": "Invalid status"})
 
-    response = validate_user.invalid_user_name(username=username,
-                                               session=session)
-    if response:
+    expected = concurrency.expected_state(if_match=if_match,
+                                          expected_version=expected_version)
+    if isinstance(expected, JSONResponse):
+        return expected
+
+    if principal is None:
         return JSONResponse(
             status_code=http_status.HTTP_401_UNAUTHORIZED,
             content={"reason": "No such user"})
 
-    response = validate_user.invalid_user_rights(username=username,
-                                                 session=session)
-    if response:
-        return response
-
-    response = validate_tender.invalid_tender_id(tenderId=tenderId,
-                                                 session=session)
-    if response:
+    if not principal.is_responsible:
         return JSONResponse(
-            status_code=http_status.HTTP_404_NOT_FOUND,
-            content={"reason": "No such tender"})
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
 
     try:
-        last_tender_id = get_tender.get_last_version_tender(tenderId=tenderId,
-                                                            session=session).id
-        session.execute(update(Tender)
-                        .where(Tender.id == last_tender_id)
-                        .values(status=status))
-        session.commit()
-
-        res = session.execute(select(Tender)
-                              .where(Tender.id == last_tender_id))
-        curr_tender = res.scalars().first()
-        return tender_funcs.format_tender(curr_tender)
+        curr_tender = await tender_funcs.set_tender_status(session=session,
+                                                           tenderId=tenderId,
+                                                           status=status,
+                                                           expected=expected)
+        if curr_tender is None:
+            conflict = await concurrency.find_conflict(session, Tender, tenderId, expected)
+            return conflict or JSONResponse(
+                status_code=http_status.HTTP_404_NOT_FOUND,
+                content={"reason": "No such tender"})
+
+        await response_cache.tenders.invalidate()
+        return concurrency.tagged(curr_tender, tender_funcs.format_tender(curr_tender))
 
     except IntegrityError as ie:
-        session.rollback()
+        await session.rollback()
         log.fatal(msg=f"Integrity error while creating tender. Reason:{ie}")
 
         return JSONResponse(
@@ -297,28 +475,23 @@ def change_status(
         )
 
 
-@app.patch("/api/tenders/{tenderId}/edit")
-def edit_tender(fields: Dict[str, Any],
-                tenderId: str,
-                username: str = Query(...),
-                session: Session = Depends(get_db)):
-
-    response = validate_user.invalid_user_name(username=username,
-                                               session=session)
-    if response:
-        return response
+@router.patch("/api/tenders/{tenderId}/edit")
+async def edit_tender(fields: Dict[str, Any],
+                      tenderId: str,
+                      expected_version: Optional[int] = Query(default=None),
+                      if_match: Optional[str] = Header(default=None),
+                      principal: Principal | None = Depends(get_user.current_principal),
+                      session: AsyncSession = Depends(get_db)):
 
-    response = validate_user.invalid_user_rights(username=username,
-                                                 session=session)
-    if response:
-        return response
+    if principal is None:
+        return JSONResponse(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            content={"reason": "No such employee"})
 
-    response = validate_tender.invalid_tender_id(tenderId=tenderId,
-                                                 session=session)
-    if response:
+    if not principal.is_responsible:
         return JSONResponse(
-                status_code=http_status.HTTP_404_NOT_FOUND,
-                content={"reason": "No such tender"})
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
 
     for key in fields.keys():
 
@@ -342,28 +515,28 @@ def edit_tender(fields: Dict[str, Any],
                 status_code=http_status.HTTP_400_BAD_REQUEST,
                 content={"reason": "Invalid description"})
 
-    tender_to_change = tender_funcs.make_tender_copy(session=session,
-                                                     tenderId=tenderId)
-
-    for key, value in fields.items():
-        setattr(tender_to_change, key, value)
+    expected = concurrency.expected_state(if_match=if_match,
+                                          expected_version=expected_version)
+    if isinstance(expected, JSONResponse):
+        return expected
 
     try:
-        session.execute(update(Tender)
-                        .where(Tender.id == tender_to_change.id
-                               and Tender.version == tender_to_change.version)
-                        .values(
-                                name=tender_to_change.name,
-                                description=tender_to_change.description,
-                                serviceType=tender_to_change.serviceType))
-
-        session.commit()
-        session.refresh(tender_to_change)
+        tender_to_change = await tender_funcs.make_tender_copy(session=session,
+                                                               tenderId=tenderId,
+                                                               fields=fields,
+                                                               expected=expected)
+        if isinstance(tender_to_change, JSONResponse):
+            conflict = await concurrency.find_conflict(session, Tender, tenderId, expected)
+            return conflict or JSONResponse(
+                status_code=http_status.HTTP_404_NOT_FOUND,
+                content={"reason": "No such tender"})
 
-        return tender_funcs.format_tender(tender_to_change)
+        await response_cache.tenders.invalidate()
+        return concurrency.tagged(tender_to_change,
+                                  tender_funcs.format_tender(tender_to_change))
 
     except ValidationException as ve:
-        session.rollback()
+        await session.rollback()
         log.fatal(msg=f"Validation exception while creating tender. Reason:{ve}")
 
         return JSONResponse(
@@ -371,7 +544,7 @@ def edit_tender(fields: Dict[str, Any],
             content={"reason": "Invalid request body or parameters"})
 
     except IntegrityError as ie:
-        session.rollback()
+        await session.rollback()
         log.fatal(msg=f"Integrity error while editing tender. Reason:{ie}")
 
         return JSONResponse(
@@ -380,66 +553,66 @@ def edit_tender(fields: Dict[str, Any],
         )
 
 
-@app.put("/api/tenders/{tenderId}/rollback/{version}")
-def tender_rollback(tenderId: str,
-                    version: int,
-                    username: str = Query(...),
-                    session: Session = Depends(get_db)):
-
-    response = validate_tender.invalid_tender_id(tenderId=tenderId,
-                                                 session=session)
-    if response:
-        return JSONResponse(
-                status_code=http_status.HTTP_404_NOT_FOUND,
-                content={"reason": "No such tender"})
+@router.put("/api/tenders/{tenderId}/rollback/{version}")
+async def tender_rollback(tenderId: str,
+                          version: int,
+                          expected_version: Optional[int] = Query(default=None),
+                          if_match: Optional[str] = Header(default=None),
+                          principal: Principal | None = Depends(get_user.current_principal),
+                          session: AsyncSession = Depends(get_db)):
+
+    expected = concurrency.expected_state(if_match=if_match,
+                                          expected_version=expected_version)
+    if isinstance(expected, JSONResponse):
+        return expected
+
+    # An unknown tender is reported before the user, as it always was;
+    # the lookup only runs on the failure path
+    if principal is None or not principal.is_responsible:
+        response = await validate_tender.invalid_tender_id(tenderId=tenderId,
+                                                           session=session)
+        if response:
+            return JSONResponse(
+                    status_code=http_status.HTTP_404_NOT_FOUND,
+                    content={"reason": "No such tender"})
 
-    response = validate_user.invalid_user_name(username=username,
-                                               session=session)
-    if response:
+    if principal is None:
         return JSONResponse(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
                 content={"reason": "No such user"})
 
-    response = validate_user.invalid_user_rights(username=username,
-                                                 session=session)
-    if response:
-        return response
-
-    response = validate_tender.invalid_tender_version(ver=version,
-                                                      tenderId=tenderId,
-                                                      session=session)
-    if response:
-        return response
-
-    res = session.execute(select(Tender)
-                          .filter(Tender.id.match(f"{tenderId}%"))
-                          .where(Tender.version == version))
-    copy_from = res.scalars().first()
-
-    last_version = get_tender.get_last_version_tender(tenderId=tenderId,
-                                                      session=session).version
-
-    backed_up = Tender(
-        id=f"{copy_from.id}" + "*" * (last_version - copy_from.version + 1),
-        name=copy_from.name,
-        description=copy_from.description,
-        serviceType=copy_from.serviceType,
-        status=copy_from.status,
-        organizationId=copy_from.organizationId,
-        version=last_version + 1,
-        createdAt=generate(datetime.datetime.now(datetime.UTC)
-                                            .replace(tzinfo=pytz.utc))
-    )
+    if not principal.is_responsible:
+        return JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
 
     try:
-        session.add(backed_up)
-        session.commit()
-        session.refresh(backed_up)
+        backed_up = await tender_funcs.rollback_tender(session=session,
+                                                       tenderId=tenderId,
+                                                       version=version,
+                                                       expected=expected)
+        if isinstance(backed_up, JSONResponse):
+            conflict = await concurrency.find_conflict(session, Tender, tenderId, expected)
+            if conflict:
+                return conflict
+
+            response = await validate_tender.invalid_tender_id(tenderId=tenderId,
+                                                               session=session)
+            if response:
+                return JSONResponse(
+                        status_code=http_status.HTTP_404_NOT_FOUND,
+                        content={"reason": "No such tender"})
+
+            response = await validate_tender.invalid_tender_version(ver=version,
+                                                                    tenderId=tenderId,
+                                                                    session=session)
+            return response or backed_up
 
-        return tender_funcs.format_tender(backed_up)
+        await response_cache.tenders.invalidate()
+        return concurrency.tagged(backed_up, tender_funcs.format_tender(backed_up))
 
     except IntegrityError as ie:
-        session.rollback()
+        await session.rollback()
         log.fatal(msg=f"Integrity error while rollbacking. Reason:{ie}")
 
         return JSONResponse(
@@ -448,18 +621,51 @@ def tender_rollback(tenderId: str,
         )
 
 
-@app.post("/api/bids/new")
-def new_bid(bid: bid_model.NewBid,
-            session: Session = Depends(get_db)):
+@router.get("/api/tenders/{tenderId}/versions")
+async def get_tender_versions(tenderId: str,
+                              limit: int = Query(5, ge=1, le=pagination.MAX_PAGE_SIZE),
+                              offset: int = Query(0, ge=0),
+                              principal: Principal | None = Depends(get_user.current_principal),
+                              session: AsyncSession = Depends(get_db)):
 
-    response = validate_tender.invalid_tender_id(tenderId=bid.tenderId,
-                                                 session=session)
+    if principal is None:
+        return JSONResponse(
+                status_code=http_status.HTTP_401_UNAUTHORIZED,
+                content={"reason": "No such user"})
+
+    if not principal.is_responsible:
+        return JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
+
+    response = await validate_tender.invalid_tender_id(tenderId=tenderId,
+                                                       session=session)
     if response:
         return response
 
-    response = validate_user.invalid_user_name(username=bid.creatorUsername,
-                                               session=session)
+    versions = await get_tender.get_tender_versions(session=session,
+                                                    tenderId=tenderId,
+                                                    limit=limit,
+                                                    offset=offset)
+
+    return ORJSONResponse([tender_funcs.format_tender(version) for version in versions])
+
+
+@router.post("/api/bids/new")
+async def new_bid(bid: bid_model.NewBid,
+                  session: AsyncSession = Depends(get_db)):
+
+    response, principal, org_response = await gather_isolated(
+        lambda db: validate_tender.invalid_tender_id(tenderId=bid.tenderId,
+                                                     session=db),
+        lambda db: get_user.get_principal(username=bid.creatorUsername,
+                                          session=db),
+        lambda db: validate_org.invalid_org_id(orgId=bid.organizationId,
+                                               session=db))
     if response:
+        return response
+
+    if principal is None:
         return JSONResponse(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
                 content={"reason": "No such user"})
@@ -475,39 +681,27 @@ def new_bid(bid: bid_model.NewBid,
                             status_code=http_status.HTTP_400_BAD_REQUEST,
                             content={"reason": "Invalid status"})
 
-    response = validate_user.invalid_user_rights(session=session,
-                                                 username=bid.creatorUsername)
-    if response:
-        return response
+    if not principal.is_responsible:
+        return JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
 
-    response = validate_org.invalid_org_id(orgId=bid.organizationId,
-                                           session=session)
-    if response:
-        return response
+    if org_response:
+        return org_response
+
+    bid_ids = generate_bid.gen_bid_id()
 
-    latest_tender_id = get_tender.get_last_version_tender(tenderId=bid.tenderId,
-                                                          session=session).id
-
-    bid_to_write = Bid(
-                        id=next(generate_bid.gen_bid_id(session=session)),
-                        name=bid.name,
-                        description=bid.description,
-                        status=bid.status,
-                        tenderId=latest_tender_id,
-                        authorType="Organization",
-                        authorId=bid.organizationId,
-                        version=1,
-                        createdAt=generate(datetime.datetime.now(datetime.UTC)
-                                                            .replace(tzinfo=pytz.utc)))
     try:
-        session.add(bid_to_write)
-        session.commit()
-        session.refresh(bid_to_write)
+        bid_to_write = await generate_universal.execute_with_new_id(
+            session=session,
+            make_statement=lambda bid_id: bid_funcs.create_bid_statement(bidId=bid_id,
+                                                                         new_bid=bid),
+            gen_id=lambda: next(bid_ids))
 
         return bid_funcs.format_bid(bid_to_write)
 
     except IntegrityError as ie:
-        session.rollback()
+        await session.rollback()
         log.fatal(msg=f"Integrity error while creating bid. Reason:{ie}")
 
         return JSONResponse(
@@ -516,116 +710,202 @@ def new_bid(bid: bid_model.NewBid,
         )
 
 
-@app.get("/api/bids/my")
-def get_my_bids(username: str = Query(...),
-                only_new: bool = Query(default=False),
-                limit: int = Query(5, ge=1),
-                offset: int = Query(0, ge=0),
-                session: Session = Depends(get_db)):
+@router.post("/api/bids/bulk")
+async def new_bids_bulk(bids: List[bid_model.NewBid],
+                        session: AsyncSession = Depends(get_db)):
+    """
+    Creates many bids at once. Responds with per-item results,
+    see `bid_funcs.bulk_create_bids`.
+    """
 
-    response1 = validate_user.invalid_user_name(username=username,
-                                                session=session)
-    response2 = validate_user.invalid_user_rights(username=username,
-                                                  session=session)
-    if response1 or response2:
+    if not bids or len(bids) > BULK_MAX_ITEMS:
+        return JSONResponse(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            content={"reason": f"Batch must contain 1 to {BULK_MAX_ITEMS} items"})
+
+    try:
+        return await bid_funcs.bulk_create_bids(session=session,
+                                                bids=bids)
+
+    except DBAPIError as e:
+        await session.rollback()
+        log.fatal(msg=f"Database error while creating bids. Reason:{e}")
+
+        return JSONResponse(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"reason": f"{type(e).__name__}. See logs for info."}
+        )
+
+
+@router.get("/api/bids/my")
+async def get_my_bids(only_new: bool = Query(default=False),
+                      limit: int = Query(5, ge=1, le=pagination.MAX_PAGE_SIZE),
+                      offset: int = Query(0, ge=0),
+                      cursor: Optional[str] = Query(default=None),
+                      stream: Optional[str] = Query(default=None, pattern="^ndjson$"),
+                      if_none_match: Optional[str] = Header(default=None),
+                      principal: Principal | None = Depends(get_user.current_principal),
+                      session: AsyncSession = Depends(get_db)):
+
+    if principal is None or not principal.is_responsible:
         return JSONResponse(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
                 content={"reason": "No such user"})
 
-    author_id = get_org.get_respondible_org_id(session=session,
-                                               username=username)
+    author_id = principal.organization_id
+
+    if stream:
+        model, keys = ((Bid, bid_funcs.HEAD_ORDER) if only_new
+                       else (BidVersion, bid_funcs.VERSION_ORDER))
+
+        return pagination.stream_ndjson(query=select(*bid_funcs.bid_columns(model))
+                                        .where(model.authorId == author_id),
+                                        keys=keys,
+                                        format_row=bid_funcs.format_bid)
 
     if only_new:
         where_statement: bool = Bid.authorId == author_id
-        return bid_funcs.only_fresh(limit=limit,
-                                    offset=offset,
-                                    session=session,
-                                    where_statement=where_statement)
-
-    query = (select(Bid)
-             .where(Bid.authorId == author_id)
-             .limit(limit)
-             .offset(offset)
-             .order_by(Bid.name))
+        return await bid_funcs.only_fresh(limit=limit,
+                                          offset=offset,
+                                          session=session,
+                                          where_statement=where_statement,
+                                          cursor=cursor,
+                                          if_none_match=if_none_match)
+
+    query = pagination.paginate(query=select(*bid_funcs.bid_columns(BidVersion))
+                                .where(BidVersion.authorId == author_id),
+                                keys=bid_funcs.VERSION_ORDER,
+                                limit=limit,
+                                offset=offset,
+                                cursor=cursor)
+    if isinstance(query, JSONResponse):
+        return query
+
+    response = await pagination.page_not_modified(session=session,
+                                                  query=query,
+                                                  etag_columns=bid_funcs.VERSION_ETAG,
+                                                  if_none_match=if_none_match)
+    if response:
+        return response
 
-    res = session.execute(query)
+    res = await session.execute(query)
 
-    complete_bids = res.scalars().all()
+    complete_bids = res.all()
 
-    return [bid_funcs.format_bid(bid) for bid in complete_bids]
+    return pagination.make_page(rows=complete_bids,
+                                items=[bid_funcs.format_bid(bid)
+                                       for bid in complete_bids],
+                                keys=bid_funcs.VERSION_ORDER,
+                                limit=limit,
+                                cursor=cursor,
+                                etag_columns=bid_funcs.VERSION_ETAG)
 
 
-@app.get("/api/bids/{tenderId}/list")
-def get_bids_for_tender(tenderId: str,
-                        username: str = Query(...),
-                        limit: int = Query(5, ge=1),
-                        offset: int = Query(0, ge=0),
-                        session: Session = Depends(get_db)):
+@router.get("/api/bids/{tenderId}/list")
+async def get_bids_for_tender(tenderId: str,
+                              limit: int = Query(5, ge=1, le=pagination.MAX_PAGE_SIZE),
+                              offset: int = Query(0, ge=0),
+                              cursor: Optional[str] = Query(default=None),
+                              stream: Optional[str] = Query(default=None, pattern="^ndjson$"),
+                              if_none_match: Optional[str] = Header(default=None),
+                              principal: Principal | None = Depends(get_user.current_principal),
+                              session: AsyncSession = Depends(get_db)):
 
-    response = validate_user.invalid_user_name(username=username,
-                                               session=session)
-    if response:
+    if principal is None:
         return JSONResponse(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
                 content={"reason": "No such user"})
 
-    response = validate_user.invalid_user_rights(username=username,
-                                                 session=session)
+    if not principal.is_responsible:
+        return JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
+
+    response = await validate_tender.invalid_tender_id(tenderId=tenderId,
+                                                       session=session)
     if response:
         return response
 
-    response = validate_tender.invalid_tender_id(tenderId=tenderId,
-                                                 session=session)
+    query = (select(*bid_funcs.bid_columns(BidVersion))
+             .where(BidVersion.tenderId == str(UUID(tenderId))))
+
+    if stream:
+        return pagination.stream_ndjson(query=query,
+                                        keys=bid_funcs.VERSION_ORDER,
+                                        format_row=bid_funcs.format_bid)
+
+    query = pagination.paginate(query=query,
+                                keys=bid_funcs.VERSION_ORDER,
+                                limit=limit,
+                                offset=offset,
+                                cursor=cursor)
+    if isinstance(query, JSONResponse):
+        return query
+
+    response = await pagination.page_not_modified(session=session,
+                                                  query=query,
+                                                  etag_columns=bid_funcs.VERSION_ETAG,
+                                                  if_none_match=if_none_match)
     if response:
         return response
 
-    res = session.execute(select(Bid)
-                          .filter(Bid.tenderId.match(f"{tenderId}%"))
-                          .order_by(Bid.name)
-                          .limit(limit)
-                          .offset(offset))
+    res = await session.execute(query)
 
-    bid_list = res.scalars().all()
-    if len(bid_list) == 0:
+    bid_list = res.all()
+    if len(bid_list) == 0 and not cursor:
         return JSONResponse(
                 status_code=http_status.HTTP_404_NOT_FOUND,
                 content={"reason": "No bids for this tender"})
 
-    return [bid_funcs.format_bid(bid) for bid in bid_list]
+    return pagination.make_page(rows=bid_list,
+                                items=[bid_funcs.format_bid(bid)
+                                       for bid in bid_list],
+                                keys=bid_funcs.VERSION_ORDER,
+                                limit=limit,
+                                cursor=cursor,
+                                etag_columns=bid_funcs.VERSION_ETAG)
 
 
-@app.get("/api/bids/{bidId}/status")
-def get_bid_status(bidId: str,
-                   username: str = Query(...),
-                   session: Session = Depends(get_db)):
+@router.get("/api/bids/{bidId}/status")
+async def get_bid_status(bidId: str,
+                         if_none_match: Optional[str] = Header(default=None),
+                         principal: Principal | None = Depends(get_user.current_principal),
+                         session: AsyncSession = Depends(get_db)):
 
-    response = validate_user.invalid_user_name(username=username,
-                                               session=session)
-    if response:
+    if principal is None:
         return JSONResponse(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
                 content={"reason": "No such employee"})
 
-    response = validate_user.invalid_user_rights(username=username,
-                                                 session=session)
-    if response:
-        return response
+    if not principal.is_responsible:
+        return JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
 
-    response = validate_bid.invalid_bid_id(bidId=bidId, session=session)
+    response = await validate_bid.invalid_bid_id(bidId=bidId, session=session)
     if response:
         return JSONResponse(
                 status_code=http_status.HTTP_404_NOT_FOUND,
                 content={"reason": "No such bid"})
 
-    res = session.execute(select(Bid.status).filter(Bid.id.match(f"{bidId}%")))
-    return res.scalars().one()
+    res = await session.execute(select(Bid.id, Bid.version, Bid.revision, Bid.status)
+                                .where(Bid.id == str(UUID(bidId))))
+    bid = res.one()
+
+    bid_etag = etag.entity_etag(bid.id, bid.version, bid.revision)
+    if etag.matches(if_none_match, bid_etag):
+        return etag.not_modified(bid_etag)
+
+    return ORJSONResponse(bid.status, headers={"ETag": bid_etag})
 
 
-@app.put("/api/bids/{bidId}/status")
-def change_bid_status(bidId: str,
-                      status: str,
-                      username: str,
-                      session: Session = Depends(get_db)):
+@router.put("/api/bids/{bidId}/status")
+async def change_bid_status(bidId: str,
+                            status: str,
+                            expected_version: Optional[int] = Query(default=None),
+                            if_match: Optional[str] = Header(default=None),
+                            principal: Principal | None = Depends(get_user.current_principal),
+                            session: AsyncSession = Depends(get_db)):
 
     valid_status: bool = status in {"Created", "Published", "Canceled", "Approved", "Rejected"}
 
@@ -635,40 +915,42 @@ def change_bid_status(bidId: str,
                             status_code=http_status.HTTP_400_BAD_REQUEST,
                             content={"reason": "Invalid status"})
 
-    response = validate_user.invalid_user_name(username=username,
-                                               session=session)
-    if response:
+    expected = concurrency.expected_state(if_match=if_match,
+                                          expected_version=expected_version)
+    if isinstance(expected, JSONResponse):
+        return expected
+
+    if principal is None:
         return JSONResponse(
                 status_code=http_status.HTTP_401_UNAUTHORIZED,
                 content={"reason": "No such employee"})
 
-    response = validate_bid.invalid_bid_id(bidId=bidId,
-                                           session=session)
-    if response:
-        return JSONResponse(
-                status_code=http_status.HTTP_404_NOT_FOUND,
-                content={"reason": "No such bid"})
+    if not principal.is_responsible:
+        # An unknown bid is reported before the user rights, as it always was
+        response = await validate_bid.invalid_bid_id(bidId=bidId,
+                                                     session=session)
+        if response:
+            return JSONResponse(
+                    status_code=http_status.HTTP_404_NOT_FOUND,
+                    content={"reason": "No such bid"})
 
-    response = validate_user.invalid_user_rights(username=username,
-                                                 session=session)
-    if response:
-        return response
+        return JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
 
     try:
-        latest_version_id = get_bid.get_last_version_bid(session=session, bidId=bidId).id
-
-        session.execute(update(Bid)
-                        .where(Bid.id == latest_version_id)
-                        .values(status=status))
-        session.commit()
+        updated_bid = await bid_funcs.set_bid_status(session, bidId, status,
+                                                     expected=expected)
+        if updated_bid is None:
+            conflict = await concurrency.find_conflict(session, Bid, bidId, expected)
+            return conflict or JSONResponse(
+                    status_code=http_status.HTTP_404_NOT_FOUND,
+                    content={"reason": "No such bid"})
 
-        res = session.execute(select(Bid).where(Bid.id == latest_version_id))
-        updated_bid = res.scalars().one()
-
-        return bid_funcs.format_bid(updated_bid)
+        return concurrency.tagged(updated_bid, bid_funcs.format_bid(updated_bid))
 
     except IntegrityError as ie:
-        session.rollback()
+        await session.rollback()
         log.fatal(msg=f"Integrity error while changing bid status. Reason:{ie}")
 
         return JSONResponse(
@@ -677,28 +959,23 @@ def change_bid_status(bidId: str,
         )
 
 
-@app.patch("/api/bids/{bidId}/edit")
-def edit_bid(fields: Dict[str, Any],
-             bidId: str,
-             username: str = Query(...),
-             session: Session = Depends(get_db)):
-
-    response = validate_user.invalid_user_name(username=username,
-                                               session=session)
-    if response:
-        return response
+@router.patch("/api/bids/{bidId}/edit")
+async def edit_bid(fields: Dict[str, Any],
+                   bidId: str,
+                   expected_version: Optional[int] = Query(default=None),
+                   if_match: Optional[str] = Header(default=None),
+                   principal: Principal | None = Depends(get_user.current_principal),
+                   session: AsyncSession = Depends(get_db)):
 
-    response = validate_user.invalid_user_rights(username=username,
-                                                 session=session)
-    if response:
-        return response
+    if principal is None:
+        return JSONResponse(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            content={"reason": "No such employee"})
 
-    response = validate_bid.invalid_bid_id(bidId=bidId,
-                                           session=session)
-    if response:
+    if not principal.is_responsible:
         return JSONResponse(
-                status_code=http_status.HTTP_404_NOT_FOUND,
-                content={"reason": "Bid not found"})
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
 
     for key in fields.keys():
         if key not in {"name", "description"}:
@@ -716,26 +993,26 @@ def edit_bid(fields: Dict[str, Any],
                 status_code=http_status.HTTP_400_BAD_REQUEST,
                 content={"reason": "Invalid description"})
 
-    bid_to_change = bid_funcs.make_bid_copy(session=session, bidId=bidId)
-
-    for key, value in fields.items():
-        setattr(bid_to_change, key, value)
+    expected = concurrency.expected_state(if_match=if_match,
+                                          expected_version=expected_version)
+    if isinstance(expected, JSONResponse):
+        return expected
 
     try:
-        session.execute(update(Bid)
-                        .where(Bid.id == bid_to_change.id
-                               and Bid.version == bid_to_change.version)
-                        .values(
-                                name=bid_to_change.name,
-                                description=bid_to_change.description))
-
-        session.commit()
-        session.refresh(bid_to_change)
-
-        return bid_funcs.format_bid(bid_to_change)
+        bid_to_change = await bid_funcs.make_bid_copy(session=session,
+                                                      bidId=bidId,
+                                                      fields=fields,
+                                                      expected=expected)
+        if isinstance(bid_to_change, JSONResponse):
+            conflict = await concurrency.find_conflict(session, Bid, bidId, expected)
+            return conflict or JSONResponse(
+                    status_code=http_status.HTTP_404_NOT_FOUND,
+                    content={"reason": "Bid not found"})
+
+        return concurrency.tagged(bid_to_change, bid_funcs.format_bid(bid_to_change))
 
     except IntegrityError as ie:
-        session.rollback()
+        await session.rollback()
         log.fatal(msg=f"Integrity error while editing bid. Reason:{ie}")
 
         return JSONResponse(
@@ -744,235 +1021,224 @@ def edit_bid(fields: Dict[str, Any],
         )
 
 
-@app.put("/api/bids/{bidId}/submit_decision")
-def submit_decision(bidId: str,
-                    decision: str = Query(...),
-                    username: str = Query(...),
-                    session: Session = Depends(get_db)):
+@router.put("/api/bids/{bidId}/submit_decision")
+async def submit_decision(bidId: str,
+                          decision: str = Query(...),
+                          principal: Principal | None = Depends(get_user.current_principal),
+                          session: AsyncSession = Depends(get_db)):
 
     if decision not in {"Approved", "Rejected"}:
         return JSONResponse(
                             status_code=http_status.HTTP_400_BAD_REQUEST,
                             content={"reason": "Invalid decision"})
 
-    response = validate_bid.invalid_bid_id(bidId=bidId, session=session)
-    if response:
-        return JSONResponse(
-                            status_code=http_status.HTTP_404_NOT_FOUND,
-                            content={"reason": "No such bid"})
-
-    last_version_bid = get_bid.get_last_version_bid(bidId=bidId,
-                                                    session=session)
-    last_version_id = last_version_bid.id
-    if last_version_bid.status == "Rejected":
-        return JSONResponse(
-                            status_code=http_status.HTTP_400_BAD_REQUEST,
-                            content={"reason": "Invalid bid status (Already rejected)"})
+    # The bid state is reported before the user, as it always was;
+    # the lookup only runs on the failure path
+    if principal is None or not principal.is_responsible:
+        response = await validate_bid.invalid_bid_decision(bidId=bidId, session=session)
+        if response:
+            return response
 
-    response = validate_user.invalid_user_name(session=session,
-                                               username=username)
-    if response:
+    if principal is None:
         return JSONResponse(
                             status_code=http_status.HTTP_401_UNAUTHORIZED,
                             content={"reason": "No such user"})
 
-    response = validate_user.invalid_user_rights(username=username,
-                                                 session=session)
-    if response:
-        return response
-
-    if decision == "Rejected":
-        session.execute(update(Bid)
-                        .where(Bid.id == last_version_bid.id)
-                        .values(status="Rejected"))
-        session.commit()
-
-    else:
-        session.execute(update(Bid)
-                        .where(Bid.id == last_version_bid.id)
-                        .values(status="Approved"))
-        session.commit()
-
-        res = session.execute(select(Bid.tenderId)
-                              .where(Bid.id == last_version_id))
-        tenderId = res.scalars().one()
-
-        session.execute(delete(Tender).where(Tender.id == tenderId))
-        session.commit()
-
-    res = session.execute(select(Bid).where(Bid.id == last_version_bid.id))
-    bid = res.scalars().one()
+    if not principal.is_responsible:
+        return JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
+
+    bid = await bid_funcs.cast_vote(session=session,
+                                    bidId=bidId,
+                                    principal=principal,
+                                    decision=decision)
+    if bid is None:
+        response = await validate_bid.invalid_bid_decision(bidId=bidId, session=session)
+        return response or JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
+
+    if bid.status == "Approved":
+        await response_cache.tenders.invalidate()
 
     return bid_funcs.format_bid(bid)
 
 
-@app.put("/api/bids/{bidId}/feedback")
-def post_feedback(bidId: str,
-                  bidFeedback: str = Query(...),
-                  username: str = Query(...),
-                  session: Session = Depends(get_db)):
+@router.put("/api/bids/{bidId}/feedback")
+async def post_feedback(bidId: str,
+                        bidFeedback: str = Query(...),
+                        principal: Principal | None = Depends(get_user.current_principal),
+                        session: AsyncSession = Depends(get_db)):
 
-    response = validate_bid.invalid_bid_id(bidId=bidId, session=session)
-    if response:
-        return JSONResponse(
-                            status_code=http_status.HTTP_404_NOT_FOUND,
-                            content={"reason": "No such bid"})
+    # An unknown bid is reported before the other errors, as it always was;
+    # the lookup only runs on the failure path
+    if len(bidFeedback) > 1000 or principal is None or not principal.is_responsible:
+        response = await validate_bid.invalid_bid_id(bidId=bidId, session=session)
+        if response:
+            return JSONResponse(
+                                status_code=http_status.HTTP_404_NOT_FOUND,
+                                content={"reason": "No such bid"})
 
     if len(bidFeedback) > 1000:
         return JSONResponse(
                             status_code=http_status.HTTP_400_BAD_REQUEST,
                             content={"reason": "Invalid feedback"})
 
-    response = validate_user.invalid_user_name(username=username,
-                                               session=session)
-    if response:
+    if principal is None:
         return JSONResponse(
                             status_code=http_status.HTTP_401_UNAUTHORIZED,
                             content={"reason": "No such user"})
 
-    response = validate_user.invalid_user_rights(username=username,
-                                                 session=session)
-    if response:
-        return response
-
-    latest_bid: Bid = get_bid.get_last_version_bid(bidId=bidId,
-                                                   session=session)
-
-    review = BidReview(
-        id=latest_bid.id,
-        description=bidFeedback,
-        createdAt=generate(datetime.datetime.now(datetime.UTC)
-                                   .replace(tzinfo=pytz.utc)))
-
-    existing_review = session.execute(select(BidReview)
-                                      .where(BidReview.id == latest_bid.id)).scalar_one_or_none()
-
-    if existing_review:
-        session.execute(delete(BidReview)
-                        .where(BidReview.id == latest_bid.id))
+    if not principal.is_responsible:
+        return JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
 
-    session.commit()
-    session.add(review)
-    session.commit()
-    session.refresh(review)
+    latest_bid = await review_funcs.upsert_review(session=session,
+                                                  bidId=bidId,
+                                                  description=bidFeedback)
+    if latest_bid is None:
+        return JSONResponse(
+                            status_code=http_status.HTTP_404_NOT_FOUND,
+                            content={"reason": "No such bid"})
 
-    latest_bid: Bid = get_bid.get_last_version_bid(bidId=bidId,
-                                                   session=session)
     return bid_funcs.format_bid(latest_bid)
 
-@app.get("/api/{tenderId}/reviews")
-def get_bid_reviews(tenderId: str,
-                    authorUsername: str = Query(...),
-                    limit: int = Query(5, ge=1),
-                    offset: int = Query(0, ge=0),
-                    requesterUsername: str = Query(...),
-                    session: Session = Depends(get_db)):
-
-    response = validate_user.invalid_user_name(username=requesterUsername,
-                                               session=session)
-    if response:
-        return response
-
-    response = validate_user.invalid_user_name(username=authorUsername,
-                                               session=session)
-    if response:
-        return response
+@router.get("/api/{tenderId}/reviews")
+async def get_bid_reviews(tenderId: str,
+                          authorUsername: str = Query(...),
+                          limit: int = Query(5, ge=1, le=pagination.MAX_PAGE_SIZE),
+                          offset: int = Query(0, ge=0),
+                          cursor: Optional[str] = Query(default=None),
+                          stream: Optional[str] = Query(default=None, pattern="^ndjson$"),
+                          requesterUsername: str = Query(...),
+                          if_none_match: Optional[str] = Header(default=None),
+                          session: AsyncSession = Depends(get_db)):
+
+    requester, author, response = await gather_isolated(
+        lambda db: get_user.get_principal(username=requesterUsername,
+                                          session=db),
+        lambda db: get_user.get_principal(username=authorUsername,
+                                          session=db),
+        lambda db: validate_tender.invalid_tender_id(tenderId=tenderId,
+                                                     session=db))
+
+    if requester is None or author is None:
+        return JSONResponse(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            content={"reason": "No such employee"})
 
-    response = validate_user.invalid_user_rights(username=requesterUsername,
-                                                 session=session)
-    if response:
-        return response
+    if not requester.is_responsible or not author.is_responsible:
+        return JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
 
-    response = validate_user.invalid_user_rights(username=authorUsername,
-                                                 session=session)
     if response:
         return response
 
-    response = validate_tender.invalid_tender_id(tenderId=tenderId,
-                                                 session=session)
+    query = review_funcs.tender_reviews(tenderId=str(UUID(tenderId)),
+                                        authorId=author.organization_id)
+
+    if stream:
+        return pagination.stream_ndjson(query=query,
+                                        keys=review_funcs.REVIEW_ORDER,
+                                        format_row=review_funcs.format_review)
+
+    query = pagination.paginate(query=query,
+                                keys=review_funcs.REVIEW_ORDER,
+                                limit=limit,
+                                offset=offset,
+                                cursor=cursor)
+    if isinstance(query, JSONResponse):
+        return query
+
+    response = await pagination.page_not_modified(session=session,
+                                                  query=query,
+                                                  etag_columns=review_funcs.REVIEW_ETAG,
+                                                  if_none_match=if_none_match)
     if response:
         return response
 
-    autor_id = get_org.get_respondible_org_id(username=authorUsername,
-                                              session=session)
-
-    res = session.execute(select(Bid.id)
-                          .where(Bid.authorId == autor_id))
+    res = await session.execute(query)
 
-    creator_bids_ids = res.scalars().all()
-
-    res = session.execute(select(BidReview)
-                          .where(BidReview.id.in_(creator_bids_ids))
-                          .limit(limit)
-                          .offset(offset))
-
-    reviews_list = res.scalars().all()
+    reviews_list = res.all()
     if reviews_list == [""]:
         return JSONResponse(status_code=http_status.HTTP_404_NOT_FOUND,
                             content={"reason": "Reviews not found."})
 
-    return [review_funcs.format_review(review) for review in reviews_list]
-
-
-@app.put("/api/bids/{bidId}/rollback/{version}")
-def bid_rollback(bidId: str,
-                 version: int,
-                 username: str = Query(...),
-                 session: Session = Depends(get_db)):
-
-    response = validate_bid.invalid_bid_id(bidId=bidId, session=session)
-    if response:
-        return JSONResponse(
-                            status_code=http_status.HTTP_400_BAD_REQUEST,
-                            content={"reason": "No such bid"})
+    return pagination.make_page(rows=reviews_list,
+                                items=[review_funcs.format_review(review)
+                                       for review in reviews_list],
+                                keys=review_funcs.REVIEW_ORDER,
+                                limit=limit,
+                                cursor=cursor,
+                                etag_columns=review_funcs.REVIEW_ETAG)
+
+
+@router.put("/api/bids/{bidId}/rollback/{version}")
+async def bid_rollback(bidId: str,
+                       version: int,
+                       expected_version: Optional[int] = Query(default=None),
+                       if_match: Optional[str] = Header(default=None),
+                       principal: Principal | None = Depends(get_user.current_principal),
+                       session: AsyncSession = Depends(get_db)):
+
+    expected = concurrency.expected_state(if_match=if_match,
+                                          expected_version=expected_version)
+    if isinstance(expected, JSONResponse):
+        return expected
+
+    # An unknown bid or version is reported before the user, as it always was;
+    # the lookups only run on the failure path
+    if principal is None or not principal.is_responsible:
+        response = await validate_bid.invalid_bid_id(bidId=bidId, session=session)
+        if response:
+            return JSONResponse(
+                                status_code=http_status.HTTP_400_BAD_REQUEST,
+                                content={"reason": "No such bid"})
 
-    response = validate_bid.invalid_bid_version(ver=version,
-                                                bidId=bidId,
-                                                session=session)
-    if response:
-        return response
+        response = await validate_bid.invalid_bid_version(ver=version,
+                                                          bidId=bidId,
+                                                          session=session)
+        if response:
+            return response
 
-    response = validate_user.invalid_user_name(username=username,
-                                               session=session)
-    if response:
+    if principal is None:
         return JSONResponse(
                             status_code=http_status.HTTP_401_UNAUTHORIZED,
                             content={"reason": "No such user"})
 
-    response = validate_user.invalid_user_rights(username=username,
-                                                 session=session)
-    if response:
-        return response
-
-    res = session.execute(select(Bid)
-                          .filter(Bid.id.match(f"{bidId}%"))
-                          .where(Bid.version == version))
-    copy_from = res.scalars().first()
-
-    last_version = get_bid.get_last_version_bid(bidId=bidId, session=session).version
-
-    backed_up = Bid(
-                    id=f"{copy_from.id}" + "*" * (last_version - copy_from.version + 1),
-                    name=copy_from.name,
-                    description=copy_from.description,
-                    status=copy_from.status,
-                    tenderId=copy_from.tenderId,
-                    authorType=copy_from.authorType,
-                    authorId=copy_from.authorId,
-                    version=last_version + 1,
-                    createdAt=generate(datetime.datetime.now(datetime.UTC)
-                                                        .replace(tzinfo=pytz.utc))
-                )
+    if not principal.is_responsible:
+        return JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
 
     try:
-        session.add(backed_up)
-        session.commit()
-        session.refresh(backed_up)
-
-        return bid_funcs.format_bid(backed_up)
+        backed_up = await bid_funcs.rollback_bid(session=session,
+                                                 bidId=bidId,
+                                                 version=version,
+                                                 expected=expected)
+        if isinstance(backed_up, JSONResponse):
+            conflict = await concurrency.find_conflict(session, Bid, bidId, expected)
+            if conflict:
+                return conflict
+
+            response = await validate_bid.invalid_bid_id(bidId=bidId, session=session)
+            if response:
+                return JSONResponse(
+                                    status_code=http_status.HTTP_400_BAD_REQUEST,
+                                    content={"reason": "No such bid"})
+
+            response = await validate_bid.invalid_bid_version(ver=version,
+                                                              bidId=bidId,
+                                                              session=session)
+            return response or backed_up
+
+        return concurrency.tagged(backed_up, bid_funcs.format_bid(backed_up))
 
     except IntegrityError as ie:
-        session.rollback()
+        await session.rollback()
         log.fatal(msg=f"Integrity error while rollbacking a bid. Reason:{ie}")
 
         return JSONResponse(
@@ -981,12 +1247,134 @@ def bid_rollback(bidId: str,
         )
 
 
-@app.exception_handler(RequestValidationError)
+@router.get("/api/bids/{bidId}/versions")
+async def get_bid_versions(bidId: str,
+                           limit: int = Query(5, ge=1, le=pagination.MAX_PAGE_SIZE),
+                           offset: int = Query(0, ge=0),
+                           principal: Principal | None = Depends(get_user.current_principal),
+                           session: AsyncSession = Depends(get_db)):
+
+    if principal is None:
+        return JSONResponse(
+                            status_code=http_status.HTTP_401_UNAUTHORIZED,
+                            content={"reason": "No such user"})
+
+    if not principal.is_responsible:
+        return JSONResponse(
+            status_code=http_status.HTTP_403_FORBIDDEN,
+            content={"reason": "Invalid user rights"})
+
+    response = await validate_bid.invalid_bid_id(bidId=bidId, session=session)
+    if response:
+        return JSONResponse(
+                            status_code=http_status.HTTP_404_NOT_FOUND,
+                            content={"reason": "No such bid"})
+
+    versions = await get_bid.get_bid_versions(session=session,
+                                              bidId=bidId,
+                                              limit=limit,
+                                              offset=offset)
+
+    return ORJSONResponse([bid_funcs.format_bid(version) for version in versions])
+
+
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     return JSONResponse(
         status_code=http_status.HTTP_400_BAD_REQUEST,
         content={"reason": exc.errors()},
     )
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings: Settings = app.state.settings
+
+    engine = database.init_engine(settings)
+    for each in database.all_engines():
+        metrics.instrument_engine(each)
+        slow_queries.instrument_engine(each)
+    consistency.instrument_engine(engine)
+    await migrate(engine)
+
+    opened = await database.warm_pool(settings.pool_warm)
+    if settings.warmup:
+        async with database.session_local() as session:
+            sample = await warmup.warmup_sample(session)
+        # Reads go to replicas if there are any
+        elapsed = await warmup.run_warmup(app.router,
+                                          warmup.warmup_requests(sample),
+                                          concurrency=opened * max(len(database.replicas), 1))
+        # Pages cached by warmup requests are valid, but the next warmup would skip the database
+        await response_cache.tenders.invalidate()
+        log.info(msg=f"Warmed {opened} connections in {elapsed * 1000:.0f} ms")
+
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    # Runs once in-flight requests are drained
+    await database.dispose_engine()
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Builds the app. The engine is created, migrations are applied,
+    the pool is warmed and hot statements are prepared on startup,
+    before the server accepts connections.
+
+    Args:
+        settings:
+            App settings, `Settings.from_env()` if not given.
+
+    Returns:
+        ASGI app.
+    """
+
+    settings = settings or Settings.from_env()
+
+    app = FastAPI(debug=settings.debug, lifespan=lifespan)
+    app.state.settings = settings
+    app.state.ready = False
+    app.include_router(router)
+    app.add_middleware(metrics.MetricsMiddleware)
+    if settings.replica_urls:
+        app.add_middleware(consistency.ConsistencyMiddleware)
+    app.add_exception_handler(RequestValidationError, validation_exception_handler)
+
+    return app
+
+
+def serve(settings: Settings, factory: str = "main:create_app") -> None:
+    """
+    Runs the app built by **factory** with **settings**.workers processes.\n
+    Workers are started by uvicorn's supervisor and build the app themselves,
+    so each one has its own engine; on SIGTERM each worker stops accepting
+    connections, waits up to **settings**.graceful_timeout seconds for in-flight
+    requests and disposes its pool.
+
+    Args:
+        settings:
+            Server settings. Workers read app settings from the environment.
+        factory:
+            `module:attribute` of a function returning the ASGI app.
+    """
+
+    uvicorn.run(factory,
+                factory=True,
+                host=settings.host,
+                port=settings.port,
+                workers=settings.workers,
+                loop=settings.loop,
+                http=settings.http,
+                timeout_graceful_shutdown=settings.graceful_timeout,
+                access_log=settings.access_log)
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host=APP_HOST, port=APP_PORT)
\ No newline at end of file
+    try:
+        server_settings = Settings.from_env()
+
+    except ValueError as e:
+        log.fatal(msg=str(e))
+        sys.exit(1)
+
+    serve(server_settings)
@@ -1,57 +1,367 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import asyncio
+import contextvars
+import itertools
 import logging
-import sys
-from os import getenv
+import os
+import re
+import time
+
+from settings import Settings
 
 log = logging.getLogger(__name__)
 
-POSTGRES_URL: str = getenv("POSTGRES_CONN")
-POSTGRES_USERNAME: str = getenv("POSTGRES_USERNAME")
-POSTGRES_PASSWORD: str = getenv("POSTGRES_PASSWORD")
-POSTGRES_HOST: str = getenv("POSTGRES_HOST")
-POSTGRES_PORT: str = getenv("POSTGRES_PORT")
-POSTGRES_DATABASE: str = getenv("POSTGRES_DATABASE")
-POSTGRES_JDBC_URL: str = getenv("POSTGRES_JDBC_URL")
-
-if POSTGRES_URL:
-    if POSTGRES_URL.startswith("postgres://"):
-        postgres_url = POSTGRES_URL.replace("postgres://", "postgresql://", 1)
-    else:
-        postgres_url = POSTGRES_URL
-
-elif POSTGRES_JDBC_URL:
-    postgres_url = POSTGRES_JDBC_URL
-
-elif all([POSTGRES_USERNAME,
-          POSTGRES_PASSWORD,
-          POSTGRES_HOST,
-          POSTGRES_DATABASE]):
-
-    if POSTGRES_PORT:
-        postgres_url = f"postgresql://{POSTGRES_USERNAME}\
-                                    :{POSTGRES_PASSWORD}\
-                                    @{POSTGRES_HOST}\
-                                    :{POSTGRES_PORT}\
-                                    /{POSTGRES_DATABASE}"
-    else:
-        postgres_url = f"postgresql://{POSTGRES_USERNAME}\
-                                    :{POSTGRES_PASSWORD}\
-                                    @{POSTGRES_HOST}\
-                                    :5432\
-                                    /{POSTGRES_DATABASE}"
-
-else:
-    log.fatal(msg="Could not connect to database (Parametrs not provided)")
-    sys.exit(1)
-
-engine = create_engine(postgres_url)
-session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-def get_db():
-    db = session_local()
+ASYNCPG_SCHEMES = ("postgresql+psycopg2://", "postgresql://", "jdbc:postgresql://")
+
+# Requests with these methods read from replicas
+READ_METHODS = ("GET", "HEAD")
+# Primary WAL position after a write, returned by writes and sent back by reads
+CONSISTENCY_HEADER = "X-Consistency-Token"
+_LSN = re.compile(r"^([0-9A-Fa-f]{1,8})/([0-9A-Fa-f]{1,8})$")
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    `AsyncAdaptedQueuePool` that records how long checkouts
+    wait for a connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_overflow = kwargs.get("max_overflow", 10)
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+
+def create_engine(settings: Settings) -> AsyncEngine:
+    """
+    Builds an asyncpg engine with a `TimedQueuePool` from **settings**.\n
+    Connections are opened lazily, see `warm_pool`.
+    """
+
+    url = settings.postgres_url
+    for scheme in ASYNCPG_SCHEMES:
+        if url.startswith(scheme):
+            url = url.replace(scheme, "postgresql+asyncpg://", 1)
+            break
+
+    connect_args = {}
+    if settings.statement_timeout:
+        connect_args["server_settings"] = {"statement_timeout": str(settings.statement_timeout)}
+
+    return create_async_engine(url,
+                               poolclass=TimedQueuePool,
+                               pool_size=settings.pool_size,
+                               max_overflow=settings.pool_max_overflow,
+                               pool_timeout=settings.pool_timeout,
+                               pool_recycle=settings.pool_recycle,
+                               pool_pre_ping=settings.pool_pre_ping,
+                               connect_args=connect_args)
+
+
+def parse_lsn(value: str) -> Optional[int]:
+    """
+    Converts a `pg_lsn` text, e.g. `16/B374D848`, to an integer,
+    or returns `None` if **value** is not one.
+    """
+
+    match = _LSN.match(value)
+    if match is None:
+        return None
+
+    return (int(match.group(1), 16) << 32) + int(match.group(2), 16)
+
+
+class Replica:
+    """
+    Streaming replica with its own engine and sessions.\n
+    Remembers the furthest WAL position it was seen to have replayed,
+    so a token is checked against the replica at most until it catches up.
+    A replica that failed to connect is skipped for **retry_interval** seconds.
+    """
+
+    # Replay position of a server that is not in recovery: a stand-in primary
+    NOT_IN_RECOVERY = 1 << 64
+
+    def __init__(self, engine: AsyncEngine, retry_interval: float = 5) -> None:
+        self.engine = engine
+        self.sessions = async_sessionmaker(bind=engine,
+                                           autoflush=False,
+                                           expire_on_commit=False)
+        self.replayed = 0
+        self.retry_interval = retry_interval
+        self.down_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self, error: Exception) -> None:
+        self.down_until = time.monotonic() + self.retry_interval
+        log.warning(msg=f"Replica {self.engine.url.host} is unavailable, "
+                        f"retrying in {self.retry_interval:g} s. Reason:{error}")
+
+    async def caught_up(self, lsn: int) -> bool:
+        if self.replayed >= lsn:
+            return True
+
+        async with self.engine.connect() as conn:
+            replayed = await conn.scalar(text("SELECT pg_last_wal_replay_lsn()::text"))
+
+        self.replayed = max(self.replayed,
+                            self.NOT_IN_RECOVERY if replayed is None else parse_lsn(replayed))
+        return self.replayed >= lsn
+
+
+# Set by `init_engine` on app startup
+engine: Optional[AsyncEngine] = None
+replicas: List[Replica] = []
+session_local = async_sessionmaker(autoflush=False,
+                                   expire_on_commit=False)
+
+_next_replica = itertools.count()
+# Sessionmaker chosen by `get_db` for the current read request
+_request_sessions: contextvars.ContextVar[Optional[async_sessionmaker]] = contextvars.ContextVar(
+    "request_sessions", default=None)
+
+
+def init_engine(settings: Settings) -> AsyncEngine:
+    """
+    Creates the app engine and binds `session_local` to it,
+    and an engine per replica of **settings**.replica_urls.
+    """
+
+    global engine
+    engine = create_engine(settings)
+    session_local.configure(bind=engine)
+
+    replicas[:] = [Replica(create_engine(settings._replace(postgres_url=url)),
+                           retry_interval=settings.replica_retry_interval)
+                   for url in settings.replica_urls]
+
+    return engine
+
+
+def all_engines() -> List[AsyncEngine]:
+    """
+    Returns the app engine followed by replica engines.
+    """
+
+    return [engine, *(replica.engine for replica in replicas)]
+
+
+async def dispose_engine() -> None:
+    """
+    Closes pooled connections of the app and replica engines.
+    """
+
+    if engine is not None:
+        await asyncio.gather(*(each.dispose() for each in all_engines()))
+
+
+async def warm_pool(connections: int) -> int:
+    """
+    Opens up to **connections** pooled connections of every engine
+    concurrently and returns them to their pools, so first requests
+    don't pay for connection setup.\n
+    Connections above the pool size would be closed on return,
+    so at most `pool.size()` are opened per engine.
+
+    Returns:
+        Number of connections opened per engine.
+    """
+
+    count = min(connections, engine.sync_engine.pool.size())
+    conns = [each.connect() for each in all_engines() for _ in range(count)]
     try:
-        yield db
+        await asyncio.gather(*(conn.start() for conn in conns))
+
     finally:
-        db.close()
+        await asyncio.gather(*(conn.close() for conn in conns
+                               if conn.sync_connection is not None))
+
+    return count
+
+
+async def read_replica(token: Optional[str]) -> Optional[Replica]:
+    """
+    Picks where a read request goes: the next available replica, round-robin,
+    that has replayed the primary WAL up to **token**, or the primary
+    if no replica has, **token** is malformed or none is configured.\n
+    Requests without a token go to the next available replica as is.
+
+    Args:
+        token:
+            `CONSISTENCY_HEADER` value of the request, if any.
+
+    Returns:
+        `Replica`, or `None` for the primary.
+    """
+
+    if not replicas:
+        return None
+
+    lsn = 0 if token is None else parse_lsn(token)
+    if lsn is None:
+        return None
+
+    first = next(_next_replica)
+    for offset in range(len(replicas)):
+        replica = replicas[(first + offset) % len(replicas)]
+        if not replica.available:
+            continue
+
+        try:
+            if await replica.caught_up(lsn):
+                return replica
+
+        except (OSError, SQLAlchemyError) as e:
+            replica.mark_down(e)
+
+    return None
+
+
+def request_sessions() -> async_sessionmaker:
+    """
+    Returns the sessionmaker `get_db` picked for the current request,
+    for sessions a read request opens besides the request session.
+    """
+
+    return _request_sessions.get() or session_local
+
+
+def on_primary() -> bool:
+    """
+    Returns whether the current request reads from the primary.
+    """
+
+    return request_sessions() is session_local
+
+
+async def current_lsn() -> str:
+    """
+    Returns the current WAL insert position of the primary, as `pg_lsn` text.\n
+    The write position (`pg_current_wal_lsn`) may still be behind a commit
+    record with `synchronous_commit = off`, the insert position never is.
+    """
+
+    async with engine.connect() as conn:
+        return await conn.scalar(text("SELECT pg_current_wal_insert_lsn()::text"))
+
+
+def _reset_pool_after_fork() -> None:
+    # A forked worker must not use the sockets of connections pooled by its parent.
+    # `close=False` drops them without sending a terminate message on the parent's behalf
+    if engine is not None:
+        for each in all_engines():
+            each.sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+
+async def get_db(request: Request):
+    """
+    Yields the request session: on a replica for `READ_METHODS`,
+    see `read_replica`, on the primary otherwise.\n
+    The replica is probed with a pooled connection first, so a replica
+    that is down sends the request to the primary instead of failing it.
+    The probe connection goes back to the pool right away: a request holding
+    it while `gather_isolated` waits for more could exhaust the pool.
+    The choice is kept for the rest of the request, see `request_sessions`.
+    """
+
+    sessions = session_local
+    if request.method in READ_METHODS:
+        replica = await read_replica(request.headers.get(CONSISTENCY_HEADER))
+        if replica is not None:
+            try:
+                async with replica.engine.connect():
+                    pass
+                sessions = replica.sessions
+
+            except (OSError, SQLAlchemyError) as e:
+                replica.mark_down(e)
+
+        _request_sessions.set(sessions)
+
+    async with sessions() as db:
+        yield db
+
+
+async def gather_isolated(*calls: Callable[[AsyncSession], Awaitable[Any]]) -> List[Any]:
+    """
+    Runs independent read-only **calls** concurrently,
+    each one in its own short-lived session.\n
+    A single `AsyncSession` can't run statements concurrently,
+    so this is how independent validation queries of a request
+    are overlapped.
+
+    Args:
+        calls:
+            Coroutine functions taking a session.
+
+    Returns:
+        Results of **calls**, in order.
+    """
+
+    sessions = request_sessions()
+
+    async def run(call: Callable[[AsyncSession], Awaitable[Any]]) -> Any:
+        async with sessions() as session:
+            return await call(session)
+
+    return await asyncio.gather(*(run(call) for call in calls))
+
+
+def pool_status() -> Dict[str, Any]:
+    """
+    Returns connection pool state of `engine`.
+
+    Returns:
+        JSON-like object with pool size, checked-out, idle
+        and overflow connections, and checkout wait statistics.
+    """
+
+    pool = engine.sync_engine.pool
+
+    return {"size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool.max_overflow,
+            "checkouts": pool.checkouts,
+            "wait_avg_ms": (pool.wait_total / pool.checkouts * 1000
+                            if pool.checkouts else 0.0),
+            "wait_max_ms": pool.wait_max * 1000}
+
+
+async def probe_db() -> float:
+    """
+    Runs a `SELECT 1` round trip on a pooled connection.
+
+    Returns:
+        Round-trip latency in milliseconds, including checkout.
+    """
+
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+    return (time.perf_counter() - started) * 1000
@@ -0,0 +1,317 @@
+from typing import List, NamedTuple
+import asyncio
+import logging
+import re
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .models import Base
+
+log = logging.getLogger(__name__)
+
+MIGRATIONS_LOCK_KEY = 2024_09_13
+MIGRATIONS_LOCK_POLL = 1.0
+
+_CONCURRENT_INDEX = re.compile(r"^CREATE INDEX CONCURRENTLY IF NOT EXISTS (\S+)")
+
+
+class Migration(NamedTuple):
+    """
+    Schema change applied once to a database created before it.
+
+    Attributes:
+        name:
+            Unique migration name, stored in `schema_migration`.
+        statements:
+            SQL statements, executed in order.
+        transactional:
+            If `False`, statements run in autocommit mode, one by one.
+            Needed for `CREATE INDEX CONCURRENTLY`, which cannot run
+            inside a transaction. Such statements must be idempotent,
+            as a failed migration is retried from the first statement.
+            An index that a failed concurrent build left invalid is dropped
+            before `CREATE INDEX CONCURRENTLY IF NOT EXISTS` builds it again.
+        on_fresh:
+            If `True`, statements also run on a database created from
+            the models. Needed for objects the models don't describe,
+            such as functions and triggers. Such statements must be idempotent.
+    """
+    name: str
+    statements: List[str]
+    transactional: bool = True
+    on_fresh: bool = False
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        name="0001_base_id",
+        statements=[
+            "ALTER TABLE tender ADD COLUMN IF NOT EXISTS base_id UUID",
+            "UPDATE tender SET base_id = left(id, 36)::uuid "
+            "WHERE base_id IS NULL",
+            "ALTER TABLE tender ALTER COLUMN base_id SET NOT NULL",
+            "CREATE INDEX IF NOT EXISTS ix_tender_base_id_version "
+            "ON tender (base_id, version DESC)",
+
+            "ALTER TABLE bid ADD COLUMN IF NOT EXISTS base_id UUID",
+            "UPDATE bid SET base_id = left(id, 36)::uuid "
+            "WHERE base_id IS NULL",
+            "ALTER TABLE bid ALTER COLUMN base_id SET NOT NULL",
+            "CREATE INDEX IF NOT EXISTS ix_bid_base_id_version "
+            "ON bid (base_id, version DESC)",
+
+            'UPDATE bid SET "tenderId" = left("tenderId", 36) '
+            'WHERE length("tenderId") > 36',
+            'CREATE INDEX IF NOT EXISTS "ix_bid_tenderId" ON bid ("tenderId")',
+        ]),
+    Migration(
+        name="0002_version_history",
+        statements=[
+            "CREATE TEMP TABLE tender_history ON COMMIT DROP "
+            "AS SELECT * FROM tender",
+            "DELETE FROM tender t WHERE EXISTS ("
+            "SELECT 1 FROM tender n WHERE n.base_id = t.base_id "
+            "AND (n.version > t.version OR (n.version = t.version "
+            "AND length(n.id) > length(t.id))))",
+            "UPDATE tender SET id = base_id::text WHERE id <> base_id::text",
+            'INSERT INTO tender_version (tender_id, version, name, description, '
+            '"serviceType", status, "organizationId", "createdAt") '
+            'SELECT DISTINCT ON (base_id, version) base_id::text, version, '
+            'name, description, "serviceType", status, "organizationId", '
+            '"createdAt" FROM tender_history '
+            'ORDER BY base_id, version, length(id)',
+            "DROP INDEX IF EXISTS ix_tender_base_id_version",
+            "ALTER TABLE tender DROP COLUMN base_id",
+
+            "CREATE TEMP TABLE bid_history ON COMMIT DROP "
+            "AS SELECT * FROM bid",
+            "DELETE FROM bid b WHERE EXISTS ("
+            "SELECT 1 FROM bid n WHERE n.base_id = b.base_id "
+            "AND (n.version > b.version OR (n.version = b.version "
+            "AND length(n.id) > length(b.id))))",
+            "UPDATE bid SET id = base_id::text WHERE id <> base_id::text",
+            'INSERT INTO bid_version (bid_id, version, name, description, '
+            'status, "tenderId", "authorType", "authorId", "createdAt") '
+            'SELECT DISTINCT ON (base_id, version) base_id::text, version, '
+            'name, description, status, "tenderId", "authorType", '
+            '"authorId", "createdAt" FROM bid_history '
+            'ORDER BY base_id, version, length(id)',
+            "DROP INDEX IF EXISTS ix_bid_base_id_version",
+            "ALTER TABLE bid DROP COLUMN base_id",
+
+            'DELETE FROM "bidReview" r WHERE EXISTS ('
+            'SELECT 1 FROM "bidReview" n WHERE left(n.id, 36) = left(r.id, 36) '
+            'AND length(n.id) > length(r.id))',
+            'UPDATE "bidReview" SET id = left(id, 36) WHERE length(id) > 36',
+        ]),
+    Migration(
+        name="0003_keyset_indexes",
+        statements=[
+            "CREATE INDEX IF NOT EXISTS ix_tender_name_id ON tender (name, id)",
+            "CREATE INDEX IF NOT EXISTS ix_tender_version_name "
+            "ON tender_version (name, tender_id, version)",
+            "CREATE INDEX IF NOT EXISTS ix_tender_version_org_name "
+            'ON tender_version ("organizationId", name, tender_id, version)',
+            "CREATE INDEX IF NOT EXISTS ix_bid_author_name "
+            'ON bid ("authorId", name, id)',
+            "CREATE INDEX IF NOT EXISTS ix_bid_version_author_name "
+            'ON bid_version ("authorId", name, bid_id, version)',
+            'DROP INDEX IF EXISTS "ix_bid_version_tenderId"',
+            "CREATE INDEX IF NOT EXISTS ix_bid_version_tender_name "
+            'ON bid_version ("tenderId", name, bid_id, version)',
+        ]),
+    Migration(
+        name="0004_secondary_indexes",
+        transactional=False,
+        statements=[
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tender_org_name "
+            'ON tender ("organizationId", name, id)',
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tender_service_name "
+            'ON tender ("serviceType", name, id)',
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tender_version_service_name "
+            'ON tender_version ("serviceType", name, tender_id, version)',
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+            "ix_organization_responsible_user_id "
+            "ON organization_responsible (user_id)",
+        ]),
+    Migration(
+        name="0005_review_bid_reference",
+        statements=[
+            'ALTER TABLE "bidReview" ADD COLUMN IF NOT EXISTS bid_id VARCHAR(100)',
+            'ALTER TABLE "bidReview" ADD COLUMN IF NOT EXISTS bid_version INTEGER',
+            'ALTER TABLE "bidReview" ADD COLUMN IF NOT EXISTS tender_id VARCHAR(100)',
+            'UPDATE "bidReview" r SET bid_id = b.id, bid_version = b.version, '
+            'tender_id = b."tenderId" FROM bid b WHERE b.id = r.id',
+            'DELETE FROM "bidReview" WHERE bid_id IS NULL',
+            'ALTER TABLE "bidReview" ALTER COLUMN bid_id SET NOT NULL, '
+            "ALTER COLUMN bid_version SET NOT NULL, "
+            "ALTER COLUMN tender_id SET NOT NULL",
+            'ALTER TABLE "bidReview" ADD CONSTRAINT "bidReview_bid_id_fkey" '
+            "FOREIGN KEY (bid_id) REFERENCES bid (id) ON DELETE CASCADE",
+            'ALTER TABLE "bidReview" ADD CONSTRAINT uq_bid_review_bid_version '
+            "UNIQUE (bid_id, bid_version)",
+            "CREATE INDEX IF NOT EXISTS ix_bid_review_tender "
+            'ON "bidReview" (tender_id, id)',
+        ]),
+    # Counters are kept by triggers, so every write path (including the ones
+    # outside of this application) keeps them exact
+    Migration(
+        name="0006_counter_triggers",
+        on_fresh=True,
+        statements=[
+            "CREATE OR REPLACE FUNCTION organization_responsible_count_update() "
+            "RETURNS trigger AS $$ BEGIN "
+            "IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+            "UPDATE organization_responsible_count "
+            "SET responsible_count = responsible_count - 1 "
+            "WHERE organization_id = OLD.organization_id; "
+            "END IF; "
+            "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+            "IF NEW.organization_id IS NOT NULL THEN "
+            "INSERT INTO organization_responsible_count (organization_id, responsible_count) "
+            "VALUES (NEW.organization_id, 1) "
+            "ON CONFLICT (organization_id) DO UPDATE "
+            "SET responsible_count = organization_responsible_count.responsible_count + 1; "
+            "END IF; "
+            "END IF; "
+            "RETURN NULL; END $$ LANGUAGE plpgsql",
+            "DROP TRIGGER IF EXISTS organization_responsible_count_update "
+            "ON organization_responsible",
+            "CREATE TRIGGER organization_responsible_count_update "
+            "AFTER INSERT OR UPDATE OF organization_id OR DELETE ON organization_responsible "
+            "FOR EACH ROW EXECUTE FUNCTION organization_responsible_count_update()",
+            "INSERT INTO organization_responsible_count (organization_id, responsible_count) "
+            "SELECT organization_id, count(*) FROM organization_responsible "
+            "WHERE organization_id IS NOT NULL GROUP BY organization_id "
+            "ON CONFLICT (organization_id) DO NOTHING",
+
+            "CREATE OR REPLACE FUNCTION bid_decision_tally_update() "
+            "RETURNS trigger AS $$ BEGIN "
+            "IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+            "UPDATE bid_decision_tally "
+            "SET approved = approved - (OLD.decision = 'Approved')::int, "
+            "rejected = rejected - (OLD.decision = 'Rejected')::int "
+            "WHERE bid_id = OLD.bid_id; "
+            "END IF; "
+            "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+            "INSERT INTO bid_decision_tally (bid_id, approved, rejected) "
+            "VALUES (NEW.bid_id, (NEW.decision = 'Approved')::int, "
+            "(NEW.decision = 'Rejected')::int) "
+            "ON CONFLICT (bid_id) DO UPDATE "
+            "SET approved = bid_decision_tally.approved + EXCLUDED.approved, "
+            "rejected = bid_decision_tally.rejected + EXCLUDED.rejected; "
+            "END IF; "
+            "RETURN NULL; END $$ LANGUAGE plpgsql",
+            "DROP TRIGGER IF EXISTS bid_decision_tally_update ON bid_decision_vote",
+            "CREATE TRIGGER bid_decision_tally_update "
+            "AFTER INSERT OR UPDATE OF decision OR DELETE ON bid_decision_vote "
+            "FOR EACH ROW EXECUTE FUNCTION bid_decision_tally_update()",
+        ]),
+    Migration(
+        name="0007_revision",
+        statements=[
+            "ALTER TABLE tender ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 1",
+            "ALTER TABLE bid ADD COLUMN IF NOT EXISTS revision INTEGER NOT NULL DEFAULT 1",
+        ]),
+]
+
+
+async def migrate(engine: AsyncEngine) -> None:
+    """
+    Brings database schema up to date with `model.models`.\n
+    Missing tables are created from the models. If the database
+    had no `tender` table yet, every migration except `Migration.on_fresh`
+    ones is only recorded as applied, otherwise pending migrations are executed in order,
+    one transaction per migration (autocommit for non-transactional ones).\n
+    Concurrent callers are serialized with a Postgres advisory lock.
+    The lock is polled with `pg_try_advisory_lock` between transactions,
+    so a waiting caller holds no snapshot that a `CREATE INDEX CONCURRENTLY`
+    of the lock owner would wait for.
+
+    Args:
+        engine:
+            Database engine.
+    """
+    async with engine.connect() as conn:
+        while True:
+            locked = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"),
+                                       {"key": MIGRATIONS_LOCK_KEY})
+            await conn.commit()
+            if locked:
+                break
+
+            await asyncio.sleep(MIGRATIONS_LOCK_POLL)
+
+        try:
+            await conn.run_sync(_migrate)
+
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"),
+                               {"key": MIGRATIONS_LOCK_KEY})
+            await conn.commit()
+
+
+def _drop_invalid_index(conn: Connection, statement: str) -> None:
+    # A failed `CREATE INDEX CONCURRENTLY` leaves an invalid index behind,
+    # which `IF NOT EXISTS` would skip and leave unusable
+    match = _CONCURRENT_INDEX.match(statement)
+    if match is None:
+        return
+
+    name = match.group(1)
+    invalid = conn.scalar(text("SELECT NOT indisvalid FROM pg_index "
+                               "WHERE indexrelid = to_regclass(:name)"),
+                          {"name": name})
+    if invalid:
+        log.warning(msg=f"Dropping invalid index {name} left by a failed build")
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def _apply(conn: Connection,
+           migration: Migration,
+           fresh: bool) -> None:
+    if not fresh or migration.on_fresh:
+        log.info(msg=f"Applying migration {migration.name}")
+        for statement in migration.statements:
+            if not migration.transactional:
+                _drop_invalid_index(conn=conn, statement=statement)
+            conn.execute(text(statement))
+
+    conn.execute(text("INSERT INTO schema_migration (name) "
+                      "VALUES (:name)"),
+                 {"name": migration.name})
+
+
+def _migrate(conn: Connection) -> None:
+    with conn.begin():
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migration ("
+            "name VARCHAR(100) PRIMARY KEY, "
+            "applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"))
+
+        fresh = not inspect(conn).has_table("tender")
+        Base.metadata.create_all(conn)
+
+        applied = set(conn.execute(
+            text("SELECT name FROM schema_migration")).scalars())
+
+    for migration in MIGRATIONS:
+        if migration.name in applied:
+            continue
+
+        if migration.transactional:
+            with conn.begin():
+                _apply(conn=conn, migration=migration, fresh=fresh)
+            continue
+
+        conn.execution_options(isolation_level="AUTOCOMMIT")
+        try:
+            _apply(conn=conn, migration=migration, fresh=fresh)
+
+        finally:
+            # Every statement is already committed by the driver,
+            # this only ends the autobegun SQLAlchemy transaction
+            conn.rollback()
+            conn.execution_options(isolation_level=conn.default_isolation_level)
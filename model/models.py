@@ -1,5 +1,6 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, DateTime, ForeignKey, Enum, UUID)
+    Column, Integer, String, Text, DateTime, ForeignKey, Enum, UUID, Index,
+    UniqueConstraint)
 
 from sqlalchemy.orm import declarative_base
 from datetime import datetime
@@ -38,45 +39,154 @@ class OrganizationResponsible(Base):
 
     id = Column(UUID(100), primary_key=True, default=uuid.uuid4())
     organization_id = Column(UUID, ForeignKey('organization.id', ondelete='CASCADE'))
-    user_id = Column(UUID, ForeignKey('employee.id', ondelete='CASCADE'))
+    user_id = Column(UUID, ForeignKey('employee.id', ondelete='CASCADE'), index=True)
+
+
+TENDER_SERVICE_TYPE = Enum("Construction", "Delivery", "Manufacture", name="tenderServiceType")
+TENDER_STATUS = Enum("Created", "Published", "Closed", name="tenderStatus")
+BID_STATUS = Enum("Created", "Published", "Canceled", "Approved", "Rejected", name="bidStatus")
+BID_AUTHOR_TYPE = Enum("Organization", "User", name="bidAuthorType")
 
 
 class Tender(Base):
+    """Current (head) version of a tender. Full history is in `TenderVersion`."""
 
     __tablename__ = "tender"
     id = Column(String(100), primary_key=True)
     name = Column(String(100), nullable=False)
     description = Column(String(500), nullable=False)
-    serviceType = Column(Enum("Construction", "Delivery", "Manufacture", name="tenderServiceType"),
-                         nullable=False)
-    status = Column(Enum("Created", "Published", "Closed", name="tenderStatus"),
-                    nullable=False)
+    serviceType = Column(TENDER_SERVICE_TYPE, nullable=False)
+    status = Column(TENDER_STATUS, nullable=False)
     organizationId = Column(UUID(100), ForeignKey('organization.id', ondelete='CASCADE'),
                             nullable=False)
     version = Column(Integer, nullable=False, default=1)
+    # Bumped by every write, status changes included, see `funcs.etag.entity_etag`
+    revision = Column(Integer, nullable=False, default=1, server_default="1")
+    createdAt = Column(String, nullable=False)
+
+
+class TenderVersion(Base):
+    """Snapshot of every tender version, keyed by `(tender_id, version)`."""
+
+    __tablename__ = "tender_version"
+    id = Column("tender_id", String(100), ForeignKey('tender.id', ondelete='CASCADE'),
+                primary_key=True)
+    version = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    description = Column(String(500), nullable=False)
+    serviceType = Column(TENDER_SERVICE_TYPE, nullable=False)
+    status = Column(TENDER_STATUS, nullable=False)
+    organizationId = Column(UUID(100), nullable=False)
     createdAt = Column(String, nullable=False)
 
 
 class Bid(Base):
+    """Current (head) version of a bid. Full history is in `BidVersion`."""
 
     __tablename__ = "bid"
 
     id = Column(String(100), primary_key=True)
     name = Column(String(100), nullable=False)
     description = Column(String(100), nullable=False)
-    status = Column(Enum("Created", "Published", "Canceled", "Approved", "Rejected", name="bidStatus"),
-                    nullable=False)
-    tenderId = Column(String(100), nullable=False)
-    authorType = Column(Enum("Organization", "User", name="bidAuthorType"))
+    status = Column(BID_STATUS, nullable=False)
+    tenderId = Column(String(100), nullable=False, index=True)
+    authorType = Column(BID_AUTHOR_TYPE)
     authorId = Column(UUID(100), nullable=False)
     version = Column(Integer, default=1, nullable=False)
+    # Bumped by every write, status changes included, see `funcs.etag.entity_etag`
+    revision = Column(Integer, nullable=False, default=1, server_default="1")
+    createdAt = Column(String, nullable=False)
+
+
+class BidVersion(Base):
+    """Snapshot of every bid version, keyed by `(bid_id, version)`."""
+
+    __tablename__ = "bid_version"
+
+    id = Column("bid_id", String(100), ForeignKey('bid.id', ondelete='CASCADE'),
+                primary_key=True)
+    version = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    description = Column(String(100), nullable=False)
+    status = Column(BID_STATUS, nullable=False)
+    tenderId = Column(String(100), nullable=False)
+    authorType = Column(BID_AUTHOR_TYPE)
+    authorId = Column(UUID(100), nullable=False)
     createdAt = Column(String, nullable=False)
 
 
+# Keyset pagination indexes, matching `HEAD_ORDER` / `VERSION_ORDER`
+# of `funcs.tender` and `funcs.bid`
+Index("ix_tender_name_id", Tender.name, Tender.id)
+Index("ix_tender_version_name", TenderVersion.name, TenderVersion.id, TenderVersion.version)
+Index("ix_tender_version_org_name", TenderVersion.organizationId,
+      TenderVersion.name, TenderVersion.id, TenderVersion.version)
+Index("ix_bid_author_name", Bid.authorId, Bid.name, Bid.id)
+Index("ix_bid_version_author_name", BidVersion.authorId,
+      BidVersion.name, BidVersion.id, BidVersion.version)
+Index("ix_bid_version_tender_name", BidVersion.tenderId,
+      BidVersion.name, BidVersion.id, BidVersion.version)
+
+# Filtered listings: `organizationId` / `serviceType` + ORDER BY name
+Index("ix_tender_org_name", Tender.organizationId, Tender.name, Tender.id)
+Index("ix_tender_service_name", Tender.serviceType, Tender.name, Tender.id)
+Index("ix_tender_version_service_name", TenderVersion.serviceType,
+      TenderVersion.name, TenderVersion.id, TenderVersion.version)
+
+
 class BidReview(Base):
+    """Review of a bid version, one per `(bid_id, bid_version)`."""
 
     __tablename__ = "bidReview"
 
     id = Column(String(100), primary_key=True, index=True)
+    bidId = Column("bid_id", String(100), ForeignKey('bid.id', ondelete='CASCADE'),
+                   nullable=False)
+    bidVersion = Column("bid_version", Integer, nullable=False)
+    tenderId = Column("tender_id", String(100), nullable=False)
     description = Column(String(1000), nullable=False)
     createdAt = Column(String, nullable=False)
+
+    __table_args__ = (UniqueConstraint("bid_id", "bid_version",
+                                       name="uq_bid_review_bid_version"),)
+
+
+# Reviews of a tender in keyset order, joined to `bid` by its primary key
+Index("ix_bid_review_tender", BidReview.tenderId, BidReview.id)
+
+
+BID_DECISION = Enum("Approved", "Rejected", name="bidDecision")
+
+
+class OrganizationResponsibleCount(Base):
+    """
+    Number of responsible employees of an organization, maintained
+    by a trigger on `organization_responsible`.
+    """
+
+    __tablename__ = "organization_responsible_count"
+
+    organization_id = Column(UUID, ForeignKey('organization.id', ondelete='CASCADE'),
+                             primary_key=True)
+    responsible_count = Column(Integer, nullable=False, default=0)
+
+
+class BidDecisionVote(Base):
+    """Decision vote of a responsible employee, one per `(bid_id, voter_id)`."""
+
+    __tablename__ = "bid_decision_vote"
+
+    bid_id = Column(String(100), ForeignKey('bid.id', ondelete='CASCADE'), primary_key=True)
+    voter_id = Column(UUID, ForeignKey('employee.id', ondelete='CASCADE'), primary_key=True)
+    decision = Column(BID_DECISION, nullable=False)
+    createdAt = Column(String, nullable=False)
+
+
+class BidDecisionTally(Base):
+    """Vote counts of a bid, maintained by a trigger on `bid_decision_vote`."""
+
+    __tablename__ = "bid_decision_tally"
+
+    bid_id = Column(String(100), ForeignKey('bid.id', ondelete='CASCADE'), primary_key=True)
+    approved = Column(Integer, nullable=False, default=0)
+    rejected = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,124 @@
+from typing import NamedTuple, Tuple
+from os import getenv
+
+
+def _flag(name: str, default: str) -> bool:
+    return getenv(name, default).lower() in {"1", "true", "yes"}
+
+
+def postgres_url_from_env() -> str:
+    """
+    Builds the database URL from `POSTGRES_CONN`, `POSTGRES_JDBC_URL`
+    or the separate `POSTGRES_*` parts, in this order.
+
+    Raises:
+        ValueError: if none of them is provided.
+    """
+
+    url = getenv("POSTGRES_CONN")
+    if url:
+        if url.startswith("postgres://"):
+            return url.replace("postgres://", "postgresql://", 1)
+        return url
+
+    url = getenv("POSTGRES_JDBC_URL")
+    if url:
+        return url
+
+    username = getenv("POSTGRES_USERNAME")
+    password = getenv("POSTGRES_PASSWORD")
+    host = getenv("POSTGRES_HOST")
+    database = getenv("POSTGRES_DATABASE")
+    if all([username, password, host, database]):
+        return (f"postgresql://{username}:{password}"
+                f"@{host}:{getenv('POSTGRES_PORT') or 5432}/{database}")
+
+    raise ValueError("Could not connect to database (Parametrs not provided)")
+
+
+class Settings(NamedTuple):
+    """
+    Configuration of the app and its server, see `Settings.from_env`
+    for the environment variables.
+
+    Attributes:
+        postgres_url:
+            Database URL, any of `postgresql://`, `postgresql+psycopg2://`
+            or `jdbc:postgresql://` schemes.
+        pool_size, pool_max_overflow, pool_timeout, pool_recycle, pool_pre_ping:
+            Connection pool parameters, per worker.
+        statement_timeout:
+            Server-side statement timeout in milliseconds, 0 disables it.
+        replica_urls:
+            URLs of streaming replicas serving read requests,
+            with the same pool parameters.
+        replica_retry_interval:
+            Seconds a replica that failed to connect is skipped for.
+        pool_warm:
+            Connections opened on startup, at most **pool_size**.
+        warmup:
+            Run the hot read endpoints on startup, on every warmed connection.
+        host, port:
+            Address to listen on.
+        debug:
+            FastAPI debug mode.
+        workers, loop, http, graceful_timeout, access_log:
+            Uvicorn parameters.
+    """
+    postgres_url: str
+    pool_size: int = 5
+    pool_max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    statement_timeout: int = 0
+    replica_urls: Tuple[str, ...] = ()
+    replica_retry_interval: float = 5
+    pool_warm: int = 5
+    warmup: bool = True
+    host: str = "0.0.0.0"
+    port: int = 8080
+    debug: bool = False
+    workers: int = 1
+    loop: str = "auto"
+    http: str = "auto"
+    graceful_timeout: float = 30
+    access_log: bool = True
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+        Reads settings from environment variables.
+
+        Raises:
+            ValueError: if database parameters or `SERVER_ADDRESS` are not provided.
+        """
+
+        address = getenv("SERVER_ADDRESS")
+        if not address:
+            raise ValueError("Connection parameters not provided. Need SERVER_ADDRESS env variable")
+
+        host, _, port = address.partition(":")
+        pool_size = int(getenv("POSTGRES_POOL_SIZE", "5"))
+
+        return cls(postgres_url=postgres_url_from_env(),
+                   pool_size=pool_size,
+                   pool_max_overflow=int(getenv("POSTGRES_POOL_MAX_OVERFLOW", "10")),
+                   pool_timeout=float(getenv("POSTGRES_POOL_TIMEOUT", "30")),
+                   pool_recycle=int(getenv("POSTGRES_POOL_RECYCLE", "1800")),
+                   pool_pre_ping=_flag("POSTGRES_POOL_PRE_PING", "true"),
+                   statement_timeout=int(getenv("POSTGRES_STATEMENT_TIMEOUT", "0")),
+                   replica_urls=tuple(url.strip()
+                                      for url in getenv("POSTGRES_REPLICA_URLS", "").split(",")
+                                      if url.strip()),
+                   replica_retry_interval=float(getenv("POSTGRES_REPLICA_RETRY_INTERVAL", "5")),
+                   pool_warm=int(getenv("POSTGRES_POOL_WARM", str(pool_size))),
+                   warmup=_flag("APP_WARMUP", "true"),
+                   host=host,
+                   port=int(port),
+                   debug=_flag("APP_DEBUG", "false"),
+                   workers=int(getenv("SERVER_WORKERS", "1")),
+                   loop=getenv("SERVER_LOOP", "auto"),
+                   http=getenv("SERVER_HTTP", "auto"),
+                   graceful_timeout=float(getenv("SERVER_GRACEFUL_TIMEOUT", "30")),
+                   access_log=_flag("SERVER_ACCESS_LOG", "true"))
@@ -1,25 +1,25 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import status as http_status
 from fastapi.responses import JSONResponse
-from model.models import Bid
+from model.models import Bid, BidVersion, Tender
+from uuid import UUID
 from sqlalchemy import select
 from .universal import _invalid_uuid4
 
 
-def invalid_bid_version(session: Session,
-                        ver: int,
-                        bidId: str) -> None | JSONResponse:
+async def invalid_bid_version(session: AsyncSession,
+                              ver: int,
+                              bidId: str) -> None | JSONResponse:
     """
     Checks if **bid version** exists in a database.
 
     Args:
         session:
-            Current database session. Must be of type `Session`.
+            Current database session. Must be of type `AsyncSession`.
         ver:
             Bid version to check against. Must be > 1.
         bidId:
-            Bid id. Must be a valid UUID4-like string,
-            without any * at the end.
+            Bid id. Must be a valid UUID4-like string.
 
     Returns:
         - `None` if given bid version exists.
@@ -32,13 +32,15 @@ def invalid_bid_version(session: Session,
             status_code=http_status.HTTP_400_BAD_REQUEST,
             content={"reason": "Invalid bid version (Must be above 1)"})
 
-    response = invalid_bid_id(bidId=bidId,session=session)
+    response = _invalid_uuid4(id=bidId)
     if response:
-        response
+        return JSONResponse(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            content={"reason": "No such bid (Invalid UUID)"})
 
-    res = session.execute(select(Bid.version)
-                          .filter(Bid.id.like(f"{bidId}"))
-                          .where(Bid.version == ver))
+    res = await session.execute(select(BidVersion.version)
+                                .where(BidVersion.id == str(UUID(bidId)),
+                                       BidVersion.version == ver))
 
     if not res.scalar_one_or_none():
 
@@ -49,17 +51,17 @@ def invalid_bid_version(session: Session,
     return None
 
 
-def invalid_bid_id(session: Session,
-                   bidId: str) -> None | JSONResponse:
+async def invalid_bid_id(session: AsyncSession,
+                         bidId: str) -> None | JSONResponse:
 
     """
     Checks if **bidId** exists in a database and is a valid UUID4-like string.
 
     Args:
         session:
-            Current database session. Must be of Session type
+            Current database session. Must be of AsyncSession type
         bidId:
-            Bid id. Must be a valid UUID4-like string, without any * at the end
+            Bid id. Must be a valid UUID4-like string
 
     Returns:
         - `None` if given bidId exists.
@@ -74,15 +76,61 @@ def invalid_bid_id(session: Session,
             status_code=http_status.HTTP_400_BAD_REQUEST,
             content={"reason": "No such bid (Invalid UUID)"})
 
-    res = session.execute(select(Bid.id)
-                          .filter(Bid.id
-                                  .like(f"{bidId}%"))
-                                  .limit(1))
+    res = await session.execute(select(Bid.id)
+                                .where(Bid.id == str(UUID(bidId))))
 
-    if not res.scalars().all():
+    if res.scalar_one_or_none() is None:
 
         return JSONResponse(
             status_code=http_status.HTTP_400_BAD_REQUEST,
             content={"reason": "No such bid"})
 
     return None
+
+
+async def invalid_bid_decision(session: AsyncSession,
+                               bidId: str) -> None | JSONResponse:
+    """
+    Checks if bid with **bidId** can still be decided on.
+
+    Args:
+        session:
+            Current database session. Must be of type `AsyncSession`.
+        bidId:
+            Bid id.
+
+    Returns:
+        - `None` if the bid is open for decisions.
+        - `JSONResponce` (404) if given **bidId** not found
+            or **id** is not UUID4 valid.
+        - `JSONResponce` (400) if the bid is already approved or rejected.
+        - `JSONResponce` (409) if the tender of the bid is closed.
+    """
+
+    if _invalid_uuid4(id=bidId):
+        return JSONResponse(
+            status_code=http_status.HTTP_404_NOT_FOUND,
+            content={"reason": "No such bid"})
+
+    res = await session.execute(select(Bid.status, Tender.id.label("tenderId"))
+                                .outerjoin(Tender, Tender.id == Bid.tenderId)
+                                .where(Bid.id == str(UUID(bidId))))
+    bid = res.one_or_none()
+
+    if bid is None:
+        return JSONResponse(
+            status_code=http_status.HTTP_404_NOT_FOUND,
+            content={"reason": "No such bid"})
+
+    if bid.status in {"Approved", "Rejected"}:
+        return JSONResponse(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            content={"reason": f"Invalid bid status (Already {bid.status.lower()})"})
+
+    # The tender is deleted once one of its bids is approved
+    if bid.tenderId is None:
+        return JSONResponse(
+            status_code=http_status.HTTP_409_CONFLICT,
+            content={"reason": "Tender is closed"})
+
+    return None
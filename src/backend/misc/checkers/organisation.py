@@ -1,4 +1,4 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import status as http_status
 from fastapi.responses import JSONResponse
 from model.models import Organization
@@ -7,14 +7,14 @@ from sqlalchemy import select
 from .universal import _invalid_uuid4
 
 
-def invalid_org_id(session: Session,
-                   orgId: str) -> None | JSONResponse:
+async def invalid_org_id(session: AsyncSession,
+                         orgId: str) -> None | JSONResponse:
     """
     Checks if **orgId** exists in a database.
 
     Args:
         session:
-            Current database session. Must be of type `Session`
+            Current database session. Must be of type `AsyncSession`
         orgId:
             Organisation id. Must be a valid UUID4-like string,
             without any * at the end
@@ -29,8 +29,8 @@ def invalid_org_id(session: Session,
     if response:
         return response
 
-    res = session.execute(select(Organization.id)
-                          .where(Organization.id == UUID(orgId)))
+    res = await session.execute(select(Organization.id)
+                                .where(Organization.id == UUID(orgId)))
 
     if not res.scalar_one_or_none():
 
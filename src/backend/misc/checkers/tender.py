@@ -1,25 +1,25 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import status as http_status
 from fastapi.responses import JSONResponse
-from model.models import Tender
+from model.models import Tender, TenderVersion
+from uuid import UUID
 from sqlalchemy import select
 from .universal import _invalid_uuid4
 
 
-def invalid_tender_version(session: Session,
-                           ver: int,
-                           tenderId: str) -> None | JSONResponse:
+async def invalid_tender_version(session: AsyncSession,
+                                 ver: int,
+                                 tenderId: str) -> None | JSONResponse:
     """
     Checks if **tender version** exists in a database.
 
     Args:
         session:
-            Current database session. Must be of type `Session`
+            Current database session. Must be of type `AsyncSession`
         ver:
             Tender version to check against
         tenderId:
-            Tender id. Must be a valid UUID4-like string,
-            without any * at the end
+            Tender id. Must be a valid UUID4-like string.
 
     Returns:
         - `None` if given tender version exists.
@@ -32,9 +32,15 @@ def invalid_tender_version(session: Session,
             status_code=http_status.HTTP_404_NOT_FOUND,
             content={"reason": "Invalid tender version (Must be above 1)"})
 
-    res = session.execute(select(Tender.version)
-                          .filter(Tender.id.like(f"{tenderId}%"))
-                          .where(Tender.version == ver))
+    response = _invalid_uuid4(id=tenderId)
+    if response:
+        return JSONResponse(
+            status_code=http_status.HTTP_404_NOT_FOUND,
+            content={"reason": "No such tender (Invalid UUID)"})
+
+    res = await session.execute(select(TenderVersion.version)
+                                .where(TenderVersion.id == str(UUID(tenderId)),
+                                       TenderVersion.version == ver))
 
     if not res.scalar_one_or_none():
         return JSONResponse(
@@ -44,17 +50,16 @@ def invalid_tender_version(session: Session,
     return None
 
 
-def invalid_tender_id(session: Session,
-                      tenderId: str) -> None | JSONResponse:
+async def invalid_tender_id(session: AsyncSession,
+                            tenderId: str) -> None | JSONResponse:
     """
     Checks if **tenderId** exists in a database.
 
     Args:
         session:
-            Current database session. Must be of type `Session`
+            Current database session. Must be of type `AsyncSession`
         tenderId:
-            Tender id. Must be a valid UUID4-like string,
-            without any * at the end
+            Tender id. Must be a valid UUID4-like string.
 
     Returns:
         - `None` if given tenderId exists.
@@ -68,10 +73,10 @@ def invalid_tender_id(session: Session,
             status_code=http_status.HTTP_404_NOT_FOUND,
             content={"reason": "No such tender (Invalid UUID)"})
 
-    res = session.execute(select(Tender.id)
-                          .filter(Tender.id.like(f"{tenderId}%")))
+    res = await session.execute(select(Tender.id)
+                                .where(Tender.id == str(UUID(tenderId))))
 
-    if len(res.scalars().all()) == 0:
+    if res.scalar_one_or_none() is None:
         return JSONResponse(
             status_code=http_status.HTTP_404_NOT_FOUND,
             content={"reason": "No such tender"})
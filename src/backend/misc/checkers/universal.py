@@ -1,5 +1,7 @@
+from typing import Any, Dict, List
 from fastapi import status as http_status
 from fastapi.responses import JSONResponse
+from sqlalchemy import String
 from uuid import UUID
 
 
@@ -25,3 +27,29 @@ def _invalid_uuid4(id: str) -> None | JSONResponse:
             content={"reason": "UUID is invalid"})
 
     return None
+
+
+def overlong_columns(model: Any, values: Dict[str, Any]) -> List[str]:
+    """
+    Finds **values** that don't fit their `String` columns of **model**.\n
+    Request validators may allow longer strings than the table does,
+    and a single overlong value fails a whole multi-row `INSERT`.
+
+    Args:
+        model:
+            Mapped class, e.g. `Bid`.
+        values:
+            Row to insert, keyed by column name.
+
+    Returns:
+        Names of the overlong columns, empty if all values fit.
+    """
+
+    columns = model.__table__.columns
+
+    return [name for name, value in values.items()
+            if isinstance(value, str)
+            and name in columns
+            and isinstance(columns[name].type, String)
+            and columns[name].type.length is not None
+            and len(value) > columns[name].type.length]
@@ -1,67 +1,408 @@
-from sqlalchemy.orm import Session
-from ..getters import bid as bid_getters, user as user_getters
-from ..checkers import bid as bid_checkers
-from fastapi.responses import JSONResponse
-from model.models import Bid, OrganizationResponsible
-from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..getters import user as user_getters
+from fastapi import status as http_status
+from fastapi.responses import JSONResponse, Response
+from model.models import (BID_STATUS, Bid, BidDecisionTally, BidDecisionVote, BidVersion,
+                          OrganizationResponsibleCount, Tender)
+from sqlalchemy import (CTE, Boolean, Row, Select, case, cast, delete, func, literal,
+                        literal_column, select, true, update)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+from uuid import UUID
+from ..getters.tender import get_existing_tender_ids
+from ..getters.organisation import get_existing_org_ids
+from ..checkers.universal import _invalid_uuid4, overlong_columns
+from .concurrency import Expected
+from ..generators.bid import gen_bid_id
+from ..validators.bid import NewBid
 from pyrfc3339 import generate
 import datetime
 import pytz
-from ..getters import bid as get_bid
-from typing import Any, List, Dict, Optional
+from typing import Any, List, Dict, Optional, Sequence
+from . import pagination
 
+HEAD_ORDER = (Bid.name, Bid.id)
+VERSION_ORDER = (BidVersion.name, BidVersion.id, BidVersion.version)
+HEAD_ETAG = (Bid.id, Bid.version, Bid.status)
+VERSION_ETAG = (BidVersion.id, BidVersion.version, BidVersion.status)
 
-def make_bid_copy(session: Session,
-                  bidId: str) -> Bid | JSONResponse:
+SNAPSHOT_FIELDS = ("id", "version", "name", "description", "status",
+                   "tenderId", "authorType", "authorId", "createdAt")
+
+STATUSES = frozenset(BID_STATUS.enums)
+DECIDED = ("Approved", "Rejected")
+# Approvals needed to approve a bid, capped by the number of responsibles
+QUORUM = 3
+
+
+def _snapshot_columns(model: type[Bid] | type[BidVersion]) -> list:
+    return [getattr(model, field) for field in SNAPSHOT_FIELDS]
+
+
+def _now() -> str:
+    return generate(datetime.datetime.now(datetime.UTC)
+                    .replace(tzinfo=pytz.utc))
+
+
+def _head_columns() -> list:
+    return [*_snapshot_columns(Bid), Bid.revision]
+
+
+def _write_snapshot(head: CTE) -> Select:
+    """
+    Returns `WITH snapshot AS (INSERT INTO bid_version SELECT ... FROM head
+    RETURNING ...) SELECT ...` statement, writing rows of the **head** CTE
+    (a head table write returning `_head_columns()`) to the history table
+    and returning `bid_columns` of them with the head `revision`.
+    """
+
+    snapshot = (insert(BidVersion.__table__)
+                .from_select(_snapshot_columns(BidVersion),
+                             select(*(head.c[field] for field in SNAPSHOT_FIELDS)))
+                .returning(*bid_columns(BidVersion))
+                .cte("snapshot"))
+
+    return (select(*snapshot.c, head.c.revision)
+            .join_from(snapshot, head, head.c.id == snapshot.c.id))
+
+
+def create_bid_statement(bidId: str,
+                         new_bid: NewBid) -> Select:
+    """
+    Returns a single statement inserting the head row of a new bid
+    and its first snapshot, returning `bid_columns` of it and its `revision`.
+
+    Args:
+        bidId:
+            Id of the new bid.
+        new_bid:
+            Validated request body.
+
+    Returns:
+        `Select` statement.
+    """
+
+    head = (insert(Bid.__table__)
+            .values(id=bidId,
+                    name=new_bid.name,
+                    description=new_bid.description,
+                    status=new_bid.status,
+                    tenderId=str(UUID(new_bid.tenderId)),
+                    authorType="Organization",
+                    authorId=new_bid.organizationId,
+                    version=1,
+                    createdAt=_now())
+            .returning(*_head_columns())
+            .cte("head"))
+
+    return _write_snapshot(head)
+
+
+async def _write_version(session: AsyncSession,
+                         values: Dict[Any, Any],
+                         *criteria: Any) -> Row | None:
+    """
+    Moves the bid head row matching **criteria** to a new version
+    with **values** applied and writes its snapshot, with one
+    `UPDATE ... RETURNING` / `INSERT ... RETURNING` statement, then commits.
+    """
+
+    head = (update(Bid.__table__)
+            .where(*criteria)
+            .values({**values,
+                     Bid.version: Bid.version + 1,
+                     Bid.revision: Bid.revision + 1,
+                     Bid.createdAt: _now()})
+            .returning(*_head_columns())
+            .cte("head"))
+
+    row = (await session.execute(_write_snapshot(head))).first()
+    if row is None:
+        return None
+
+    await session.commit()
+    return row
+
+
+async def make_bid_copy(session: AsyncSession,
+                        bidId: str,
+                        fields: Optional[Dict[str, Any]] = None,
+                        expected: Expected = Expected()) -> Row | JSONResponse:
     """
-    Creates a copy of bid with **bidId** as a new entity.\n
-    A copy has:
-    - New id, formed by adding a "*" at the end
-    - New version, incremented by 1
-    - New createdAt value, as a current datetime in RFC3339 format
+    Creates a new version of bid with **bidId**.\n
+    The head row in `bid` is moved to the new version:
+    - **fields** are applied to it
+    - Version and revision are incremented by 1
+    - New createdAt value, as a current datetime in RFC3339 format\n
+    and its snapshot is written to `bid_version`,
+    in a single statement and transaction.
 
     Args:
         session:
             Current database session.
         bidId:
-            Bid id. Must be a valid UUID4-like string,
-            without any * at the end.\n
+            Bid id. Must be a valid UUID4-like string.
+        fields:
+            Optional mapping of changed bid attributes.
+        expected:
+            State the head row must be in, checked by the write itself.
 
     Returns:
-        - `Bid` object, copy of a given bid if bid exists.
-        - `JSONResponse` (400) if given **bidId** not found
-            or **id** is not UUID4 valid..
+        - Row of `bid_columns` of the new version and its `revision`
+            if bid exists.
+        - `JSONResponse` (400) if given **bidId** not found,
+            **id** is not UUID4 valid or the head row does not match **expected**.
     """
 
-    response = bid_checkers.invalid_bid_id(session=session, bidId=bidId)
+    response = _invalid_uuid4(id=bidId)
     if response:
         return response
 
-    fresh_bid = bid_getters.get_last_version_bid(session=session, bidId=bidId)
+    bid = await _write_version(session,
+                               {getattr(Bid, key): value
+                                for key, value in (fields or {}).items()},
+                               Bid.id == str(UUID(bidId)),
+                               *expected.criteria(Bid))
+    if bid is None:
+        return JSONResponse(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            content={"reason": "No such bid"})
+
+    return bid
+
+
+async def rollback_bid(session: AsyncSession,
+                       bidId: str,
+                       version: int,
+                       expected: Expected = Expected()) -> Row | JSONResponse:
+    """
+    Creates a new version of bid with **bidId**,
+    equal to its **version** snapshot.\n
+    The snapshot is read by the same `UPDATE ... FROM bid_version`
+    statement that moves the head.
+
+    Args:
+        session:
+            Current database session.
+        bidId:
+            Bid id. Must be a valid UUID4-like string.
+        version:
+            Version to roll back to.
+        expected:
+            State the head row must be in, checked by the write itself.
+
+    Returns:
+        - Row of `bid_columns` of the new version and its `revision`
+            if bid and version exist.
+        - `JSONResponse` (400) if given bid or version not found
+            or the head row does not match **expected**.
+    """
+
+    response = _invalid_uuid4(id=bidId)
+    if response:
+        return response
+
+    source = aliased(BidVersion, name="source")
+    bid = await _write_version(session,
+                               {Bid.name: source.name,
+                                Bid.description: source.description,
+                                Bid.status: source.status},
+                               Bid.id == str(UUID(bidId)),
+                               *expected.criteria(Bid),
+                               source.id == Bid.id,
+                               source.version == version)
+    if bid is None:
+        return JSONResponse(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            content={"reason": "No such bid version"})
+
+    return bid
+
+
+async def set_bid_status(session: AsyncSession,
+                         bidId: str,
+                         status: str,
+                         *criteria: Any,
+                         expected: Expected = Expected(),
+                         close_tender: bool = False) -> Row | None:
+    """
+    Sets **status** of the current version of bid with **bidId**,
+    in both `bid` and `bid_version`, with a single statement,
+    then commits. The version stays, the head `revision` is bumped.
+
+    Args:
+        session:
+            Current database session.
+        bidId:
+            Bid id. Must be a valid UUID4-like string.
+        status:
+            New status.
+        criteria:
+            Extra conditions on the `bid` head row.
+        expected:
+            State the head row must be in, checked by the write itself.
+        close_tender:
+            If `True`, the tender of the bid is deleted by the same statement.
+
+    Returns:
+        - Row of `bid_columns` of the current version and its `revision`
+            if bid exists and matches **criteria**.
+        - `None` otherwise.
+    """
+
+    if _invalid_uuid4(id=bidId):
+        return None
+
+    head = (update(Bid.__table__)
+            .where(Bid.id == str(UUID(bidId)), *criteria,
+                   *expected.criteria(Bid))
+            .values({Bid.status: status,
+                     Bid.revision: Bid.revision + 1})
+            .returning(Bid.id, Bid.version, Bid.revision, Bid.tenderId)
+            .cte("head"))
+
+    query = (update(BidVersion.__table__)
+             .where(BidVersion.id == head.c.id,
+                    BidVersion.version == head.c.version)
+             .values({BidVersion.status: status})
+             .returning(*bid_columns(BidVersion), head.c.revision))
+
+    if close_tender:
+        query = query.add_cte(delete(Tender.__table__)
+                              .where(Tender.id.in_(select(head.c.tenderId)))
+                              .cte("closed_tender"))
+
+    row = (await session.execute(query)).first()
+    if row is None:
+        return None
+
+    await session.commit()
+    return row
+
+
+async def bulk_create_bids(session: AsyncSession,
+                           bids: Sequence[NewBid]) -> List[Dict[str, Any]]:
+    """
+    Creates every valid bid of **bids** in one transaction.\n
+    Tenders, users and organisations of the whole batch are resolved
+    with one query each, valid bids are written with a single multi-row
+    `INSERT ... RETURNING` into `bid` and one into `bid_version`.
+    Items are validated the same way as in `POST /api/bids/new`.
+
+    Args:
+        session:
+            Current database session.
+        bids:
+            Validated request items.
+
+    Returns:
+        List of per-item results, in order of **bids**:
+        - `{"status": 200, "bid": {...}}` for a created bid.
+        - `{"status": code, "reason": reason}` for a rejected item.
+
+    Raises:
+        `DBAPIError` if the batch insert fails. Nothing is written then.
+    """
+
+    tender_ids = await get_existing_tender_ids(session=session,
+                                               tenderIds={b.tenderId for b in bids
+                                                          if _invalid_uuid4(id=b.tenderId) is None})
+    principals = await user_getters.get_principals(session=session,
+                                                   usernames={b.creatorUsername for b in bids})
+    org_ids = await get_existing_org_ids(session=session,
+                                         orgIds={b.organizationId for b in bids
+                                                 if _invalid_uuid4(id=b.organizationId) is None})
+
+    ids = gen_bid_id()
+    createdAt = _now()
+
+    results: List[Dict[str, Any]] = []
+    rows: List[Dict[str, Any]] = []
+    positions: List[int] = []
+
+    for bid in bids:
+        principal = principals.get(bid.creatorUsername)
+
+        if _invalid_uuid4(id=bid.tenderId):
+            results.append({"status": http_status.HTTP_404_NOT_FOUND,
+                            "reason": "No such tender (Invalid UUID)"})
+        elif str(UUID(bid.tenderId)) not in tender_ids:
+            results.append({"status": http_status.HTTP_404_NOT_FOUND,
+                            "reason": "No such tender"})
+        elif principal is None:
+            results.append({"status": http_status.HTTP_401_UNAUTHORIZED,
+                            "reason": "No such user"})
+        elif bid.status not in STATUSES:
+            results.append({"status": http_status.HTTP_400_BAD_REQUEST,
+                            "reason": "Invalid status"})
+        elif not principal.is_responsible:
+            results.append({"status": http_status.HTTP_403_FORBIDDEN,
+                            "reason": "Invalid user rights"})
+        elif _invalid_uuid4(id=bid.organizationId):
+            results.append({"status": http_status.HTTP_400_BAD_REQUEST,
+                            "reason": "UUID is invalid"})
+        elif str(UUID(bid.organizationId)) not in org_ids:
+            results.append({"status": http_status.HTTP_400_BAD_REQUEST,
+                            "reason": "No such organisation"})
+        else:
+            row = {"id": next(ids),
+                   "name": bid.name,
+                   "description": bid.description,
+                   "status": bid.status,
+                   "tenderId": str(UUID(bid.tenderId)),
+                   "authorType": "Organization",
+                   "authorId": bid.organizationId,
+                   "version": 1,
+                   "createdAt": createdAt}
+
+            overlong = overlong_columns(Bid, row)
+            if overlong:
+                results.append({"status": http_status.HTTP_400_BAD_REQUEST,
+                                "reason": f"Value too long: {', '.join(overlong)}"})
+                continue
+
+            positions.append(len(results))
+            results.append({"status": http_status.HTTP_200_OK})
+            rows.append(row)
+
+    if not rows:
+        return results
+
+    created = await session.scalars(insert(Bid)
+                                    .returning(Bid, sort_by_parameter_order=True),
+                                    rows)
+    created = created.all()
+    await session.execute(insert(BidVersion), rows)
+    await session.commit()
 
-    new_bid = Bid(
-        id=f"{fresh_bid.id}*",
-        name=fresh_bid.name,
-        description=fresh_bid.description,
-        status=fresh_bid.status,
-        tenderId=fresh_bid.tenderId,
-        authorType=fresh_bid.authorType,
-        authorId=fresh_bid.authorId,
-        version=fresh_bid.version + 1,
-        createdAt=generate(datetime.datetime.now(datetime.UTC)
-                                            .replace(tzinfo=pytz.utc))
-    )
+    for position, bid in zip(positions, created):
+        results[position]["bid"] = format_bid(bid)
 
-    session.add(new_bid)
-    session.commit()
-    session.refresh(new_bid)
+    return results
 
-    return new_bid
+
+def bid_columns(model: type[Bid] | type[BidVersion] = Bid) -> tuple:
+    """
+    Returns columns of **model** read by `format_bid`, labelled with
+    attribute names, to select plain rows instead of ORM objects.
+
+    Args:
+        model:
+            `Bid` or `BidVersion`.
+
+    Returns:
+        Tuple of labelled columns.
+    """
+
+    return tuple(column.label(column.key)
+                 for column in (model.id, model.name, model.status,
+                                model.authorType, model.authorId,
+                                model.version, model.createdAt))
 
 
 def format_bid(bid: Bid) -> dict[str, Any]:
     """
-    Formats a `Bid` object to a following JSON format:
+    Formats a `Bid` or `BidVersion` object to a following JSON format:
             **{ "id": authorId,\n
             "name": name,\n
             "status": status,\n
@@ -71,7 +412,7 @@ def format_bid(bid: Bid) -> dict[str, Any]:
             "createdAt": createdAt }**
     Args:
         bid:
-            `Bid` object to format
+            `Bid` or `BidVersion` object, or a row of `bid_columns`, to format
 
     Returns:
         JSON-like object.
@@ -81,51 +422,190 @@ def format_bid(bid: Bid) -> dict[str, Any]:
             "name": bid.name,
             "status": bid.status,
             "authorType": bid.authorType,
-            "authorId": bid.authorId,
+            # asyncpg returns its own UUID type, which orjson can't serialize
+            "authorId": str(bid.authorId),
             "verstion": bid.version,
             "createdAt": bid.createdAt}
 
 
-def only_fresh(limit: int,
-               offset: int,
-               session: Session,
-               where_statement=Optional[bool]) -> List[Dict[str, Any]]:
-    """Returns a list of last version JSON-like formatted Bids,
-    that follow **where_statement**.
+async def only_fresh(limit: int,
+                     offset: int,
+                     session: AsyncSession,
+                     where_statement=Optional[bool],
+                     cursor: Optional[str] = None,
+                     if_none_match: Optional[str] = None) -> Response | JSONResponse:
+    """Returns a page of last version JSON-like formatted Bids,
+    that follow **where_statement**.\n
+    Head rows in `bid` are the last versions,
+    so a page is fetched with a single query.
 
     Args:
         where_statement (Optional): Where-statement of type `bool`
         session: Database session.
         limit: Limit.
         offset: Offset.
+        cursor: Optional keyset cursor, see `pagination.paginate`.
+        if_none_match: Optional `If-None-Match` header value.
     Returns:
-        List of JSON-like bids.
+        Page response, see `pagination.make_page`,
+        or `304` response if the page did not change.
     """
-    query = select(Bid.id)
+    query = pagination.paginate(query=select(*bid_columns(Bid)).where(where_statement),
+                                keys=HEAD_ORDER,
+                                limit=limit,
+                                offset=offset,
+                                cursor=cursor)
+    if isinstance(query, JSONResponse):
+        return query
+
+    response = await pagination.page_not_modified(session=session,
+                                                  query=query,
+                                                  etag_columns=HEAD_ETAG,
+                                                  if_none_match=if_none_match)
+    if response:
+        return response
+
+    bids = (await session.execute(query)).all()
+
+    return pagination.make_page(rows=bids,
+                                items=[format_bid(bid) for bid in bids],
+                                keys=HEAD_ORDER,
+                                limit=limit,
+                                cursor=cursor,
+                                etag_columns=HEAD_ETAG)
+
+
+async def cast_vote(session: AsyncSession,
+                    bidId: str,
+                    principal: user_getters.Principal,
+                    decision: str) -> Row | None:
+    """
+    Records a **decision** vote of **principal** on bid with **bidId**
+    and applies the decision once it is reached, with a single statement.
+
+    The vote is an upsert into `bid_decision_vote`, unique by
+    `(bid_id, voter_id)`, so a repeated vote replaces the previous one.
+    The `bid_decision_tally` counters are kept by a trigger, and the quorum
+    is read from the trigger-kept `organization_responsible_count`,
+    so no votes or responsibles are counted here:
+    - One `Rejected` vote rejects the bid.
+    - `min(3, responsible count)` `Approved` votes approve the bid
+        and close its tender.
+
+    The bid and its tender are locked first, so votes on a bid are applied
+    one after another. The tally trigger runs at the end of the statement,
+    so the counters are read with a no-op upsert, which returns the latest
+    committed row, and the vote of this statement is added to them.
+
+    Args:
+        session:
+            Current database session.
+        bidId:
+            Bid id. Must be a valid UUID4-like string.
+        principal:
+            Voter, must be responsible for the organization of the tender.
+        decision:
+            `Approved` or `Rejected`.
+
+    Returns:
+        - Row of `bid_columns` of the bid after the vote.
+        - `None` if the bid or its tender is not found, the bid is already
+            decided or **principal** is not responsible for its tender.
+    """
+
+    if _invalid_uuid4(id=bidId):
+        return None
+
+    target = (select(*bid_columns(Bid), Tender.organizationId)
+              .join(Tender, Tender.id == Bid.tenderId)
+              .where(Bid.id == str(UUID(bidId)))
+              .with_for_update(key_share=True)
+              .cte("target"))
+
+    lock = insert(BidDecisionTally.__table__)
+    tally = (lock.from_select([BidDecisionTally.bid_id,
+                               BidDecisionTally.approved,
+                               BidDecisionTally.rejected],
+                              select(target.c.id, literal(0), literal(0))
+                              .where(target.c.status.notin_(DECIDED),
+                                     target.c.organizationId == principal.organization_id))
+             .on_conflict_do_update(index_elements=[BidDecisionTally.bid_id],
+                                    set_={"approved": BidDecisionTally.approved})
+             .returning(BidDecisionTally.bid_id,
+                        BidDecisionTally.approved,
+                        BidDecisionTally.rejected)
+             .cte("tally"))
 
-    query = (query
-             .where(where_statement)
-             .limit(limit)
-             .offset(offset)
-             .order_by(Bid.name))
+    vote = insert(BidDecisionVote.__table__)
+    vote = (vote.from_select([BidDecisionVote.bid_id,
+                              BidDecisionVote.voter_id,
+                              BidDecisionVote.decision,
+                              BidDecisionVote.createdAt],
+                             select(tally.c.bid_id,
+                                    literal(principal.employee_id, BidDecisionVote.voter_id.type),
+                                    literal(decision, BidDecisionVote.decision.type),
+                                    literal(_now())))
+            .on_conflict_do_update(index_elements=[BidDecisionVote.bid_id,
+                                                   BidDecisionVote.voter_id],
+                                   set_={"decision": vote.excluded.decision,
+                                         "createdAt": vote.excluded.createdAt},
+                                   where=BidDecisionVote.decision != vote.excluded.decision)
+            # A repeated vote returns nothing, a changed vote replaces
+            # the other decision. `xmax` is 0 only for an inserted row
+            .returning(BidDecisionVote.decision,
+                       literal_column("xmax = 0", Boolean).label("inserted"))
+            .cte("vote"))
 
-    res = session.execute(query)
-    bid_ids = res.scalars().all()
+    replaced = vote.c.inserted.is_(False)
+    counts = (select(tally.c.bid_id,
+                     (tally.c.approved + case((vote.c.decision == "Approved", 1),
+                                              (replaced, -1), else_=0)).label("approved"),
+                     (tally.c.rejected + case((vote.c.decision == "Rejected", 1),
+                                              (replaced, -1), else_=0)).label("rejected"),
+                     # The voter is a responsible, so a missing count row means one
+                     func.least(QUORUM, func.coalesce(OrganizationResponsibleCount
+                                                      .responsible_count, 1))
+                     .label("quorum"))
+              .select_from(tally)
+              .outerjoin(vote, true())
+              .outerjoin(OrganizationResponsibleCount,
+                         OrganizationResponsibleCount.organization_id
+                         == principal.organization_id)
+              .cte("counts"))
 
-    stripped_bid_ids = [id[:36] for id in bid_ids]
-    unique_bid_ids = set(stripped_bid_ids)
+    reached = cast(case((counts.c.rejected > 0, "Rejected"),
+                        (counts.c.approved >= counts.c.quorum, "Approved")), BID_STATUS)
+    decided = select(counts.c.bid_id, reached.label("status")).cte("decided")
 
-    return [format_bid(
-            get_bid.get_last_version_bid(bidId=id,
-                                         session=session))
-            for id in unique_bid_ids]
+    head = (update(Bid.__table__)
+            .where(Bid.id == decided.c.bid_id,
+                   decided.c.status.isnot(None))
+            .values({Bid.status: decided.c.status,
+                     Bid.revision: Bid.revision + 1})
+            .returning(Bid.id, Bid.version, Bid.status, Bid.tenderId)
+            .cte("head"))
 
+    query = (select(target.c.id, target.c.name,
+                    func.coalesce(head.c.status, target.c.status).label("status"),
+                    target.c.authorType, target.c.authorId,
+                    target.c.version, target.c.createdAt)
+             .select_from(target)
+             .join(tally, tally.c.bid_id == target.c.id)
+             .outerjoin(head, head.c.id == target.c.id)
+             .add_cte(update(BidVersion.__table__)
+                      .where(BidVersion.id == head.c.id,
+                             BidVersion.version == head.c.version)
+                      .values({BidVersion.status: head.c.status})
+                      .cte("snapshot"),
+                      delete(Tender.__table__)
+                      .where(Tender.id.in_(select(head.c.tenderId)
+                                           .where(head.c.status == "Approved")))
+                      .cte("closed_tender")))
 
-def count_quorum(username: str,
-                 session: Session) -> int:
-    user_id = user_getters.get_user_id(username=username, session=session)
+    bid = (await session.execute(query)).one_or_none()
+    if bid is None:
+        await session.rollback()
+        return None
 
-    res = session.execute(select(func.count(OrganizationResponsible.id))
-                          .where(OrganizationResponsible.user_id == user_id)
-                          .limit(3))
-    return res.scalar()
+    await session.commit()
+    return bid
@@ -0,0 +1,198 @@
+from typing import Dict, Optional, Tuple
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from os import getenv
+import logging
+import time
+
+try:
+    from redis import asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+log = logging.getLogger(__name__)
+
+RESPONSE_CACHE_URL: Optional[str] = getenv("RESPONSE_CACHE_URL")
+RESPONSE_CACHE_TTL: float = float(getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_MAX_BYTES: int = int(getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 2 ** 20)))
+# Worker processes of `main.serve`, an in-process cache can't be invalidated across them
+SERVER_WORKERS: int = int(getenv("SERVER_WORKERS", "1"))
+
+
+class ResponseCache(ABC):
+    """
+    Cache of encoded response bodies.\n
+    Every `get` returns the cache generation along with the value.
+    `invalidate` starts a new generation, and `set` drops values
+    computed under an older one, so a write racing with a read
+    never leaves a stale entry behind.
+
+    Attributes:
+        hits: Number of lookups served from the cache.
+        misses: Number of lookups not found in the cache.
+        evictions: Number of entries dropped to fit the size bound.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abstractmethod
+    async def get(self, key: str) -> Tuple[Optional[bytes], int]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, generation: int) -> None:
+        ...
+
+    @abstractmethod
+    async def invalidate(self) -> None:
+        ...
+
+    def stats(self) -> Dict[str, int | str]:
+        return {"backend": type(self).__name__,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions}
+
+
+class LRUCache(ResponseCache):
+    """
+    In-process LRU cache with TTL, bounded by the total size of values.\n
+    Each worker process has its own copy, so invalidation reaches only
+    the worker that made the write; other workers serve entries
+    until their TTL expires.
+    """
+
+    def __init__(self,
+                 ttl: float,
+                 max_bytes: int) -> None:
+        super().__init__()
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self._size = 0
+        self._entries: OrderedDict[str, Tuple[float, bytes]] = OrderedDict()
+
+    def _drop(self, key: str) -> None:
+        _expires, value = self._entries.pop(key)
+        self._size -= len(value)
+
+    async def get(self, key: str) -> Tuple[Optional[bytes], int]:
+        entry = self._entries.get(key)
+
+        if entry is not None and entry[0] < time.monotonic():
+            self._drop(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None, self.generation
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1], self.generation
+
+    async def set(self, key: str, value: bytes, generation: int) -> None:
+        if generation != self.generation or len(value) > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._drop(key)
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._size += len(value)
+
+        while self._size > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def invalidate(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+        self._size = 0
+
+    def stats(self) -> Dict[str, int | str]:
+        return {**super().stats(),
+                "entries": len(self._entries),
+                "bytes": self._size}
+
+
+class NullCache(ResponseCache):
+    """
+    Cache that stores nothing, used when several workers
+    would otherwise have unsynchronized in-process caches.
+    """
+
+    async def get(self, key: str) -> Tuple[Optional[bytes], int]:
+        self.misses += 1
+        return None, 0
+
+    async def set(self, key: str, value: bytes, generation: int) -> None:
+        pass
+
+    async def invalidate(self) -> None:
+        pass
+
+
+class RedisCache(ResponseCache):
+    """
+    Redis-backed cache shared by every worker.\n
+    Keys are prefixed with a generation counter stored in Redis,
+    invalidation increments it and old entries expire by TTL.
+    Memory bound and evictions are left to the Redis `maxmemory` policy,
+    `evictions` stays 0.
+    """
+
+    GENERATION_KEY = "response_cache:generation"
+
+    def __init__(self,
+                 url: str,
+                 ttl: float) -> None:
+        if aioredis is None:
+            raise RuntimeError("RESPONSE_CACHE_URL is set, but redis package is not installed")
+
+        super().__init__()
+        self.ttl = ttl
+        self._redis = aioredis.from_url(url)
+
+    async def get(self, key: str) -> Tuple[Optional[bytes], int]:
+        generation = int(await self._redis.get(self.GENERATION_KEY) or 0)
+        value = await self._redis.get(f"response_cache:{generation}:{key}")
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value, generation
+
+    async def set(self, key: str, value: bytes, generation: int) -> None:
+        await self._redis.set(f"response_cache:{generation}:{key}", value,
+                              px=int(self.ttl * 1000))
+
+    async def invalidate(self) -> None:
+        await self._redis.incr(self.GENERATION_KEY)
+
+
+def make_cache() -> ResponseCache:
+    """
+    Returns a `RedisCache` if `RESPONSE_CACHE_URL` env variable is set,
+    otherwise an `LRUCache`, or a `NullCache` with more than one worker:
+    a write invalidates only the cache of the worker that made it,
+    and the others would serve stale pages until the TTL expires.
+    """
+
+    if RESPONSE_CACHE_URL:
+        log.info(msg="Using Redis response cache")
+        return RedisCache(url=RESPONSE_CACHE_URL, ttl=RESPONSE_CACHE_TTL)
+
+    if SERVER_WORKERS > 1:
+        log.warning(msg="Response cache is disabled: SERVER_WORKERS > 1 needs RESPONSE_CACHE_URL")
+        return NullCache()
+
+    return LRUCache(ttl=RESPONSE_CACHE_TTL, max_bytes=RESPONSE_CACHE_MAX_BYTES)
+
+
+tenders = make_cache()
@@ -0,0 +1,154 @@
+from typing import Any, Dict, List, NamedTuple, Optional
+from uuid import UUID
+
+from fastapi import status as http_status
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy import false, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from model.models import Bid, Tender
+from ..checkers.universal import _invalid_uuid4
+from . import etag
+
+FIELDS = ("id", "version", "revision")
+
+
+class Expected(NamedTuple):
+    """
+    State of a tender or bid head row a write is conditional on.\n
+    Fields left `None` are not checked, so `Expected()` matches any state.
+
+    Attributes:
+        id:
+            Id from an `If-Match` ETag.
+        version:
+            Expected current version.
+        revision:
+            Expected current revision.
+        satisfiable:
+            `False` if no row can match, e.g. the ETag predates revisions,
+            so the write must miss.
+    """
+    id: Optional[str] = None
+    version: Optional[int] = None
+    revision: Optional[int] = None
+    satisfiable: bool = True
+
+    def criteria(self, model: type[Tender] | type[Bid]) -> List[Any]:
+        """
+        Returns `WHERE` conditions on the **model** head row,
+        to be put into the write itself.
+        """
+
+        if not self.satisfiable:
+            return [false()]
+
+        return [getattr(model, field) == getattr(self, field)
+                for field in FIELDS
+                if getattr(self, field) is not None]
+
+    def matches(self, state: Any) -> bool:
+        """
+        Checks if **state**, a row of `(id, version, revision)`,
+        satisfies the expectation.
+        """
+
+        return self.satisfiable and all(getattr(self, field) is None
+                                        or getattr(state, field) == getattr(self, field)
+                                        for field in FIELDS)
+
+
+def expected_state(if_match: Optional[str],
+                   expected_version: Optional[int]) -> Expected | JSONResponse:
+    """
+    Builds the write precondition of a request, either from
+    an `If-Match` header (an ETag of `GET .../status`)
+    or from an `expected_version` query parameter.
+
+    Args:
+        if_match:
+            `If-Match` request header. `*` matches any existing entity.
+        expected_version:
+            Expected current version.
+
+    Returns:
+        - `Expected` state, empty if there is no precondition.
+            An ETag made before revisions gives an unsatisfiable one,
+            so the write answers `409` with the current state.
+        - `JSONResponse` (400) if **if_match** is malformed
+            or disagrees with **expected_version**.
+    """
+
+    if if_match is None or if_match.strip() == "*":
+        return Expected(version=expected_version)
+
+    parsed = etag.parse_entity_etag(if_match.strip())
+    if parsed is None:
+        return JSONResponse(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            content={"reason": "Invalid If-Match header"})
+
+    id, version, revision = parsed
+    if expected_version is not None and expected_version != version:
+        return JSONResponse(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            content={"reason": "If-Match and expected_version disagree"})
+
+    return Expected(id=id, version=version, revision=revision,
+                    satisfiable=revision is not None)
+
+
+async def find_conflict(session: AsyncSession,
+                        model: type[Tender] | type[Bid],
+                        id: str,
+                        expected: Expected) -> JSONResponse | None:
+    """
+    Explains a conditional write that touched no rows.\n
+    Meant to be called only after such a miss, so successful writes
+    cost no extra query.
+
+    Args:
+        session:
+            Current database session.
+        model:
+            `Tender` or `Bid`.
+        id:
+            Id of the written entity.
+        expected:
+            Precondition of the write.
+
+    Returns:
+        - `JSONResponse` (409) with the current version and `ETag`
+            if the entity exists but its state does not match **expected**.
+        - `None` otherwise, i.e. the miss has another reason.
+    """
+
+    if expected == Expected() or _invalid_uuid4(id=id):
+        return None
+
+    res = await session.execute(select(model.id, model.version,
+                                       model.revision, model.status)
+                                .where(model.id == str(UUID(id))))
+    state = res.first()
+    if state is None or expected.matches(state):
+        return None
+
+    return JSONResponse(
+        status_code=http_status.HTTP_409_CONFLICT,
+        content={"reason": "Version conflict",
+                 "version": state.version,
+                 "status": state.status},
+        headers={"ETag": etag.entity_etag(state.id, state.version, state.revision)})
+
+
+def tagged(row: Any,
+           content: Dict[str, Any]) -> ORJSONResponse:
+    """
+    Returns **content**, a formatted written **row**, with an `ETag`
+    header of the new state, to be sent back as `If-Match` of the next write.
+    """
+
+    return ORJSONResponse(content,
+                          headers={"ETag": etag.entity_etag(row.id,
+                                                            row.version,
+                                                            row.revision)})
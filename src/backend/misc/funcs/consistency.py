@@ -0,0 +1,74 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import contextvars
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from model import create as database
+
+log = logging.getLogger(__name__)
+
+# [committed] of the current request
+_request_writes: contextvars.ContextVar[Optional[List[bool]]] = contextvars.ContextVar(
+    "request_writes", default=None)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Hooks commit tracking into the primary **engine** events,
+    so `ConsistencyMiddleware` knows which requests wrote.
+
+    Args:
+        engine:
+            Primary database engine.
+    """
+
+    @event.listens_for(engine.sync_engine, "commit")
+    def _commit(conn) -> None:
+        request = _request_writes.get()
+        if request is not None:
+            request[0] = True
+
+
+class ConsistencyMiddleware:
+    """
+    ASGI middleware returning a read-your-writes token: responses of requests
+    that committed on the primary carry `CONSISTENCY_HEADER` with the primary
+    WAL position after the commit. Reads sending it back are served by a replica
+    that has replayed that far, or by the primary, see `model.create.read_replica`.
+    """
+
+    def __init__(self, app: Callable[..., Awaitable[None]]) -> None:
+        self.app = app
+
+    async def __call__(self,
+                       scope: Dict[str, Any],
+                       receive: Callable[[], Awaitable[Dict[str, Any]]],
+                       send: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = [False]
+        token = _request_writes.set(request)
+
+        async def send_token(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start" and request[0]:
+                try:
+                    lsn = await database.current_lsn()
+                    message["headers"] = [*message.get("headers", []),
+                                          (database.CONSISTENCY_HEADER.lower().encode(),
+                                           lsn.encode())]
+
+                except (OSError, SQLAlchemyError) as e:
+                    log.error(msg=f"Could not read WAL position. Reason:{e}")
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_token)
+
+        finally:
+            _request_writes.reset(token)
@@ -0,0 +1,101 @@
+from typing import Any, Iterable, Optional, Sequence, Tuple
+import hashlib
+
+import orjson
+from fastapi import status as http_status
+from fastapi.responses import Response
+
+
+def entity_etag(id: Any,
+                version: int,
+                revision: int) -> str:
+    """
+    Returns a strong ETag of a single tender or bid.\n
+    Every write bumps the revision, so `(id, version, revision)` identifies
+    the entity state even after a status goes A -> B -> A.
+
+    Args:
+        id: Tender or bid id.
+        version: Current version.
+        revision: Current revision.
+
+    Returns:
+        Quoted ETag string.
+    """
+
+    return f'"{id}.{version}.{revision}"'
+
+
+def parse_entity_etag(etag: str) -> Tuple[str, int, Optional[int]] | None:
+    """
+    Parses an ETag made by `entity_etag`.
+
+    Args:
+        etag:
+            Quoted ETag string.
+
+    Returns:
+        - `(id, version, revision)` tuple. Revision is `None` for ETags
+            made before revisions, which carried a status instead.
+        - `None` if **etag** is malformed or weak.
+    """
+
+    if len(etag) < 2 or etag[0] != '"' or etag[-1] != '"':
+        return None
+
+    parts = etag[1:-1].split(".")
+    if len(parts) != 3 or not parts[1].isdigit():
+        return None
+
+    return parts[0], int(parts[1]), int(parts[2]) if parts[2].isdigit() else None
+
+
+def list_etag(values: Iterable[Sequence[Any]]) -> str:
+    """
+    Returns a strong ETag of a list page, a digest of the
+    `(id, version, status)`-like tuples of its rows, in order.
+
+    Args:
+        values:
+            Row state tuples of the page.
+
+    Returns:
+        Quoted ETag string.
+    """
+
+    digest = hashlib.blake2b(orjson.dumps([tuple(value) for value in values]),
+                             digest_size=16)
+
+    return f'"{digest.hexdigest()}"'
+
+
+def matches(if_none_match: Optional[str],
+            etag: str) -> bool:
+    """
+    Checks if **etag** satisfies an `If-None-Match` header value.
+
+    Args:
+        if_none_match:
+            Header value: `*` or a comma-separated list of ETags.
+        etag:
+            Current ETag.
+
+    Returns:
+        `True` if the client copy is up to date.
+    """
+
+    if not if_none_match:
+        return False
+
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+
+    return "*" in tags or etag in tags
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Returns an empty `304 Not Modified` response carrying **etag**.
+    """
+
+    return Response(status_code=http_status.HTTP_304_NOT_MODIFIED,
+                    headers={"ETag": etag})
@@ -0,0 +1,259 @@
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence
+from os import getenv
+import base64
+import binascii
+import json
+
+import orjson
+from fastapi import status as http_status
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
+from sqlalchemy import Select, literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+from model.create import request_sessions
+from . import etag
+
+MAX_PAGE_SIZE = int(getenv("MAX_PAGE_SIZE", "100"))
+STREAM_BATCH_SIZE = int(getenv("STREAM_BATCH_SIZE", "500"))
+# Key column types that JSON keeps as is, others are encoded as strings
+JSON_TYPES = (str, int, float, bool)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encodes keyset values of the last row of a page into an opaque cursor.
+
+    Args:
+        values:
+            JSON-serializable key values.
+
+    Returns:
+        URL-safe cursor string.
+    """
+
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _key_type(key: InstrumentedAttribute) -> type:
+    try:
+        python_type = key.type.python_type
+
+    except NotImplementedError:
+        return str
+
+    return python_type if python_type in JSON_TYPES else str
+
+
+def _valid_key_value(value: Any, key: InstrumentedAttribute) -> bool:
+    expected = _key_type(key)
+    # `bool` is a subclass of `int`
+    if isinstance(value, bool):
+        return expected is bool
+
+    if expected is float:
+        return isinstance(value, (int, float))
+
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor: str,
+                  keys: Sequence[InstrumentedAttribute]) -> List[Any] | None:
+    """
+    Decodes a cursor made by `encode_cursor`.\n
+    Values are checked against the Python types of **keys**,
+    so a forged cursor never reaches the database.
+
+    Args:
+        cursor:
+            Cursor string.
+        keys:
+            Key columns the cursor was made for.
+
+    Returns:
+        - List of key values.
+        - `None` if **cursor** is malformed or its values don't match **keys**.
+    """
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+
+    except (binascii.Error, ValueError):
+        return None
+
+    if not isinstance(values, list) or len(values) != len(keys):
+        return None
+
+    if not all(_valid_key_value(value, key) for key, value in zip(keys, values)):
+        return None
+
+    return values
+
+
+def paginate(query: Select,
+             keys: Sequence[InstrumentedAttribute],
+             limit: int,
+             offset: int,
+             cursor: Optional[str]) -> Select | JSONResponse:
+    """
+    Orders **query** by **keys** and applies a page window to it.\n
+    Without **cursor** the page is selected with `LIMIT/OFFSET`.
+    With **cursor** (empty string for the first page) the page starts
+    right after the row the cursor was made from, using a row-value
+    comparison, so with a matching composite index deep pages cost
+    the same as the first one.
+
+    Args:
+        query:
+            Select statement.
+        keys:
+            Unique ordering key columns.
+        limit: Limit.
+        offset: Offset, ignored in cursor mode.
+        cursor: Cursor.
+
+    Returns:
+        - Paginated `Select` statement.
+        - `JSONResponse` (400) if **cursor** is malformed.
+    """
+
+    query = query.order_by(*keys).limit(limit)
+
+    if cursor is None:
+        return query.offset(offset)
+
+    if cursor == "":
+        return query
+
+    values = decode_cursor(cursor=cursor, keys=keys)
+    if values is None:
+        return JSONResponse(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            content={"reason": "Invalid cursor"})
+
+    return query.where(tuple_(*keys) > tuple_(*(literal(value, key.type)
+                                                for key, value in zip(keys, values))))
+
+
+async def page_not_modified(session: AsyncSession,
+                            query: Select,
+                            etag_columns: Sequence[InstrumentedAttribute],
+                            if_none_match: Optional[str]) -> Response | None:
+    """
+    Answers a conditional list request without fetching the page.\n
+    Only **etag_columns** of the rows of **query** are selected,
+    keeping its filter, order and window.
+
+    Args:
+        session:
+            Current database session.
+        query:
+            Paginated `Select` made by `paginate`.
+        etag_columns:
+            Columns the page ETag is computed from,
+            the same as passed to `make_page`.
+        if_none_match:
+            `If-None-Match` request header.
+
+    Returns:
+        - `Response` (304) if the page did not change.
+        - `None` if there is no **if_none_match** or the page changed.
+    """
+
+    if not if_none_match:
+        return None
+
+    res = await session.execute(query.with_only_columns(*etag_columns))
+    page_etag = etag.list_etag(res.all())
+
+    if etag.matches(if_none_match, page_etag):
+        return etag.not_modified(page_etag)
+
+    return None
+
+
+def make_page(rows: Sequence[Any],
+              items: List[Any],
+              keys: Sequence[InstrumentedAttribute],
+              limit: int,
+              cursor: Optional[str],
+              etag_columns: Sequence[InstrumentedAttribute] = ()) -> ORJSONResponse:
+    """
+    Builds a response for a page made by `paginate`.\n
+    The body is encoded straight to bytes with orjson, bypassing
+    `jsonable_encoder`.
+
+    Args:
+        rows:
+            Rows (or ORM objects) of the page.
+        items:
+            JSON-like formatted **rows**.
+        keys:
+            Ordering key columns, the same as passed to `paginate`.
+        limit: Limit.
+        cursor: Cursor.
+        etag_columns:
+            Columns to compute the `ETag` header from, see `page_not_modified`.
+            No header is set if empty.
+
+    Returns:
+        `ORJSONResponse` with a body of:
+        - **items** in `LIMIT/OFFSET` mode.
+        - `{"items": items, "next_cursor": cursor}` in cursor mode.
+            `next_cursor` is `None` on the last page.
+    """
+
+    headers = None
+    if etag_columns:
+        headers = {"ETag": etag.list_etag([getattr(row, column.key)
+                                           for column in etag_columns]
+                                          for row in rows)}
+
+    if cursor is None:
+        return ORJSONResponse(items, headers=headers)
+
+    next_cursor = None
+    if rows and len(rows) == limit:
+        next_cursor = encode_cursor([getattr(rows[-1], key.key)
+                                     for key in keys])
+
+    return ORJSONResponse({"items": items, "next_cursor": next_cursor},
+                          headers=headers)
+
+
+def stream_ndjson(query: Select,
+                  keys: Sequence[InstrumentedAttribute],
+                  format_row: Callable[[Any], Dict[str, Any]]) -> StreamingResponse:
+    """
+    Streams every row of **query**, ordered by **keys**, as NDJSON
+    (one JSON object per line).\n
+    Rows are read through a server-side cursor in batches of
+    `STREAM_BATCH_SIZE`, so memory stays flat regardless of the result size.
+    The stream opens its own session, on the same primary or replica
+    as the request session, which is closed before the response body is sent.
+
+    Args:
+        query:
+            Select statement of labelled columns, e.g. `tender_columns`.
+        keys:
+            Ordering key columns.
+        format_row:
+            Formatter of a single row, e.g. `format_tender`.
+
+    Returns:
+        `StreamingResponse` of `application/x-ndjson` media type.
+    """
+
+    query = query.order_by(*keys).execution_options(yield_per=STREAM_BATCH_SIZE)
+    sessions = request_sessions()
+
+    async def lines() -> AsyncIterator[bytes]:
+        async with sessions() as session:
+            result = await session.stream(query)
+
+            async for rows in result.partitions():
+                yield b"".join(orjson.dumps(format_row(row)) + b"\n" for row in rows)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
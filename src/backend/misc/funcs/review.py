@@ -1,5 +1,112 @@
-from model.models import BidReview
+from sqlalchemy import Row, Select, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from model.models import Bid, BidReview
+from pyrfc3339 import generate
+import datetime
+import pytz
 from typing import Any
+from uuid import UUID
+from ..checkers.universal import _invalid_uuid4
+from ..generators.universal import uuid7
+from .bid import bid_columns
+
+REVIEW_ORDER = (BidReview.id,)
+REVIEW_ETAG = (BidReview.id, BidReview.createdAt)
+
+
+async def upsert_review(session: AsyncSession,
+                        bidId: str,
+                        description: str) -> Row | None:
+    """
+    Creates or replaces the review of the current version of bid with **bidId**
+    with a single `INSERT ... SELECT ... ON CONFLICT DO UPDATE` statement,
+    which also returns the bid, then commits.\n
+    Reviews of earlier versions are kept.
+
+    Args:
+        session:
+            Current database session.
+        bidId:
+            Bid id. Must be a valid UUID4-like string.
+        description:
+            Review text.
+
+    Returns:
+        - Row of `bid_columns` of the reviewed bid if it exists.
+        - `None` otherwise, nothing is written then.
+    """
+
+    if _invalid_uuid4(id=bidId):
+        return None
+
+    bidId = str(UUID(bidId))
+    createdAt = generate(datetime.datetime.now(datetime.UTC)
+                         .replace(tzinfo=pytz.utc))
+
+    review = (insert(BidReview.__table__)
+              .from_select([BidReview.id, BidReview.bidId, BidReview.bidVersion,
+                            BidReview.tenderId, BidReview.description,
+                            BidReview.createdAt],
+                           select(literal(str(uuid7()), BidReview.id.type),
+                                  Bid.id,
+                                  Bid.version,
+                                  Bid.tenderId,
+                                  literal(description, BidReview.description.type),
+                                  literal(createdAt, BidReview.createdAt.type))
+                           .where(Bid.id == bidId)))
+    review = (review.on_conflict_do_update(index_elements=[BidReview.bidId,
+                                                           BidReview.bidVersion],
+                                           set_={"description": review.excluded.description,
+                                                 "createdAt": review.excluded.createdAt})
+              .returning(BidReview.bidId.label("bid_id"))
+              .cte("review"))
+
+    row = (await session.execute(select(*bid_columns(Bid))
+                                 .where(Bid.id.in_(select(review.c.bid_id))))).first()
+    if row is None:
+        return None
+
+    await session.commit()
+    return row
+
+
+def tender_reviews(tenderId: str,
+                   authorId: str) -> Select:
+    """
+    Returns a query of reviews left on any version of bids
+    by organisation **authorId** in tender **tenderId**.\n
+    Reviews are read by `ix_bid_review_tender` in `REVIEW_ORDER`
+    and joined to `bid` by its primary key.
+
+    Args:
+        tenderId:
+            Tender id, as stored in `bid.tenderId`.
+        authorId:
+            Organisation id of the bid author.
+
+    Returns:
+        `Select` of `review_columns`, to be paginated with `REVIEW_ORDER`.
+    """
+
+    return (select(*review_columns())
+            .join(Bid, Bid.id == BidReview.bidId)
+            .where(BidReview.tenderId == tenderId,
+                   Bid.authorId == authorId))
+
+
+def review_columns() -> tuple:
+    """
+    Returns `BidReview` columns read by `format_review`, labelled with
+    attribute names, to select plain rows instead of ORM objects.
+
+    Returns:
+        Tuple of labelled columns.
+    """
+
+    return tuple(column.label(column.key)
+                 for column in (BidReview.id, BidReview.description,
+                                BidReview.createdAt))
 
 
 def format_review(rev: BidReview) -> dict[str, Any]:
@@ -10,7 +117,7 @@ def format_review(rev: BidReview) -> dict[str, Any]:
             "createdAt": createdAt}**
     Args:
         rev:
-            `BidReview` object to format
+            `BidReview` object, or a row of `review_columns`, to format
 
     Returns:
         JSON-like object.
@@ -0,0 +1,212 @@
+from typing import Any, Dict, List, Optional, Sequence
+from os import getenv
+import logging
+import random
+import re
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.backend.misc.funcs import metrics
+
+log = logging.getLogger(__name__)
+
+# Statements running longer are logged and aggregated, 0 disables the hook
+SLOW_QUERY_MS: float = float(getenv("SLOW_QUERY_MS", "200"))
+# Log parameter values instead of their types
+SLOW_QUERY_LOG_PARAMS: bool = getenv("SLOW_QUERY_LOG_PARAMS", "false").lower() in {"1", "true", "yes"}
+# Share of slow statements whose plan is captured with `EXPLAIN`, 0 to 1
+SLOW_QUERY_EXPLAIN_RATE: float = float(getenv("SLOW_QUERY_EXPLAIN_RATE", "0"))
+# Distinct normalized statements kept for the admin endpoint
+SLOW_QUERY_MAX_STATEMENTS: int = int(getenv("SLOW_QUERY_MAX_STATEMENTS", "500"))
+
+MAX_PARAM_LENGTH = 200
+MAX_ROUTES = 20
+SORT_KEYS = ("total_ms", "max_ms", "calls")
+
+_WHITESPACE = re.compile(r"\s+")
+# `($1, $2::VARCHAR, ...)`: IN lists and VALUES rows, whose length varies per call
+_PARAM_GROUP = re.compile(r"\(\s*\$\d+(?:::[A-Za-z_][\w\[\]]*)?"
+                          r"(?:\s*,\s*\$\d+(?:::[A-Za-z_][\w\[\]]*)?)*\s*\)")
+_REPEATED_GROUP = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "VALUES")
+
+
+def normalize(statement: str) -> str:
+    """
+    Returns **statement** with whitespace collapsed and parameter lists
+    of any length, e.g. `IN ($1, $2, $3)` or multi-row `VALUES`,
+    replaced with `(...)`, so calls differing only in list lengths
+    are aggregated together.
+    """
+
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    statement = _PARAM_GROUP.sub("(...)", statement)
+    return _REPEATED_GROUP.sub("(...)", statement)
+
+
+def redact(parameters: Any) -> Any:
+    """
+    Makes **parameters** of a statement fit for logs.\n
+    Values are replaced with their type names unless
+    `SLOW_QUERY_LOG_PARAMS` is set, and long values are truncated.
+    """
+
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) for value in parameters]
+
+    if not SLOW_QUERY_LOG_PARAMS:
+        return f"<{type(parameters).__name__}>"
+
+    value = repr(parameters)
+    if len(value) > MAX_PARAM_LENGTH:
+        value = value[:MAX_PARAM_LENGTH] + "..."
+
+    return value
+
+
+class SlowQueryLog:
+    """
+    Slow statements aggregated by normalized SQL.\n
+    Keeps at most **size** statements, dropping the one
+    with the least total time to make room for a new one.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.statements: Dict[str, Dict[str, Any]] = {}
+
+    def record(self,
+               sql: str,
+               duration_ms: float,
+               route: Optional[str],
+               parameters: Any,
+               plan: Optional[str]) -> None:
+        entry = self.statements.get(sql)
+        if entry is None:
+            if len(self.statements) >= self.size:
+                del self.statements[min(self.statements,
+                                        key=lambda key: self.statements[key]["total_ms"])]
+
+            entry = self.statements[sql] = {"sql": sql,
+                                            "calls": 0,
+                                            "total_ms": 0.0,
+                                            "max_ms": 0.0,
+                                            "routes": {},
+                                            "last_parameters": None,
+                                            "plan": None}
+
+        entry["calls"] += 1
+        entry["total_ms"] += duration_ms
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+        entry["last_parameters"] = parameters
+
+        route = route or "-"
+        routes = entry["routes"]
+        if route in routes or len(routes) < MAX_ROUTES:
+            routes[route] = routes.get(route, 0) + 1
+
+        if plan is not None:
+            entry["plan"] = plan
+
+    def top(self, limit: int, sort: str = "total_ms") -> List[Dict[str, Any]]:
+        """
+        Returns **limit** statements with the largest **sort** key,
+        with average duration added.
+        """
+
+        entries = sorted(self.statements.values(), key=lambda entry: entry[sort], reverse=True)
+
+        return [{**entry,
+                 "avg_ms": entry["total_ms"] / entry["calls"],
+                 "routes": dict(entry["routes"])}
+                for entry in entries[:limit]]
+
+    def clear(self) -> None:
+        self.statements.clear()
+
+
+slow_queries = SlowQueryLog(SLOW_QUERY_MAX_STATEMENTS)
+
+
+def _explain(conn, statement: str, parameters: Sequence[Any]) -> Optional[str]:
+    """
+    Plans **statement** with `EXPLAIN` on the connection that just ran it,
+    inside a savepoint, so a failure doesn't abort the transaction.\n
+    Runs on the DBAPI cursor to bypass engine events.
+    """
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute("EXPLAIN (ANALYZE OFF, VERBOSE OFF) " + statement, parameters)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            raise
+
+        finally:
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+
+        return plan
+
+    except Exception as e:
+        log.debug(msg=f"Could not explain slow query. Reason:{e}")
+        return None
+
+    finally:
+        cursor.close()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Hooks slow statement logging into **engine** events.\n
+    Statements over `SLOW_QUERY_MS` are logged with normalized SQL,
+    redacted parameters, duration and the route of the request
+    that issued them, and recorded in `slow_queries`.
+    A `SLOW_QUERY_EXPLAIN_RATE` share of them also gets its plan
+    captured, which adds a round trip to the request.
+
+    Args:
+        engine:
+            Database engine.
+    """
+
+    if SLOW_QUERY_MS <= 0:
+        return
+
+    threshold = SLOW_QUERY_MS / 1000
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        context._slow_query_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed = time.perf_counter() - context._slow_query_started
+        if elapsed < threshold:
+            return
+
+        plan = None
+        if (not executemany
+                and SLOW_QUERY_EXPLAIN_RATE > 0
+                and random.random() < SLOW_QUERY_EXPLAIN_RATE
+                and statement.lstrip().upper().startswith(_EXPLAINABLE)):
+            plan = _explain(conn, statement, parameters)
+
+        sql = normalize(statement)
+        duration_ms = elapsed * 1000
+        route = metrics.current_route()
+        redacted = redact(parameters)
+
+        log.warning(msg=f"Slow query ({duration_ms:.1f} ms, route {route or '-'}): "
+                        f"{sql} parameters={redacted}"
+                        + (f"\n{plan}" if plan is not None else ""))
+
+        slow_queries.record(sql, duration_ms, route, redacted, plan)
@@ -1,62 +1,384 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import status as http_status
 from fastapi.responses import JSONResponse
-from model.models import Tender
+from model.models import TENDER_STATUS, Tender, TenderVersion
 from pyrfc3339 import generate
 import datetime
 import pytz
-from ..getters.tender import get_last_version_tender
-from ..checkers import tender as tender_checkers
-from typing import Any
+from uuid import UUID
+from sqlalchemy import CTE, Row, Select, insert, select, update
+from sqlalchemy.orm import aliased
+from ..getters.user import get_principals
+from ..getters.organisation import get_existing_org_ids
+from ..checkers.universal import _invalid_uuid4, overlong_columns
+from .concurrency import Expected
+from ..generators.tender import gen_tender_id
+from ..validators.tender import NewTender
+from typing import Any, Dict, List, Optional, Sequence
 
+HEAD_ORDER = (Tender.name, Tender.id)
+VERSION_ORDER = (TenderVersion.name, TenderVersion.id, TenderVersion.version)
+HEAD_ETAG = (Tender.id, Tender.version, Tender.status)
+VERSION_ETAG = (TenderVersion.id, TenderVersion.version, TenderVersion.status)
 
-def make_tender_copy(session: Session,
-                     tenderId: str) -> Tender | JSONResponse:
+SNAPSHOT_FIELDS = ("id", "version", "name", "description", "serviceType",
+                   "status", "organizationId", "createdAt")
+
+SERVICE_TYPES = {"Construction", "Delivery", "Manufacture"}
+STATUSES = frozenset(TENDER_STATUS.enums)
+
+
+def _snapshot_columns(model: type[Tender] | type[TenderVersion]) -> list:
+    return [getattr(model, field) for field in SNAPSHOT_FIELDS]
+
+
+def _now() -> str:
+    return generate(datetime.datetime.now(datetime.UTC)
+                    .replace(tzinfo=pytz.utc))
+
+
+def _head_columns() -> list:
+    return [*_snapshot_columns(Tender), Tender.revision]
+
+
+def _write_snapshot(head: CTE) -> Select:
+    """
+    Returns `WITH snapshot AS (INSERT INTO tender_version SELECT ... FROM head
+    RETURNING ...) SELECT ...` statement, writing rows of the **head** CTE
+    (a head table write returning `_head_columns()`) to the history table
+    and returning `tender_columns` of them with the head `revision`.
+    """
+
+    snapshot = (insert(TenderVersion.__table__)
+                .from_select(_snapshot_columns(TenderVersion),
+                             select(*(head.c[field] for field in SNAPSHOT_FIELDS)))
+                .returning(*tender_columns(TenderVersion))
+                .cte("snapshot"))
+
+    return (select(*snapshot.c, head.c.revision)
+            .join_from(snapshot, head, head.c.id == snapshot.c.id))
+
+
+def create_tender_statement(tenderId: str,
+                            new_tender: NewTender) -> Select:
+    """
+    Returns a single statement inserting the head row of a new tender
+    and its first snapshot, returning `tender_columns` of it and its `revision`.
+
+    Args:
+        tenderId:
+            Id of the new tender.
+        new_tender:
+            Validated request body.
+
+    Returns:
+        `Select` statement.
+    """
+
+    head = (insert(Tender.__table__)
+            .values(id=tenderId,
+                    name=new_tender.name,
+                    description=new_tender.description,
+                    serviceType=new_tender.serviceType,
+                    status=new_tender.status,
+                    organizationId=new_tender.organizationId,
+                    version=1,
+                    createdAt=_now())
+            .returning(*_head_columns())
+            .cte("head"))
+
+    return _write_snapshot(head)
+
+
+async def _write_version(session: AsyncSession,
+                         values: Dict[Any, Any],
+                         *criteria: Any) -> Row | None:
+    """
+    Moves the tender head row matching **criteria** to a new version
+    with **values** applied and writes its snapshot, with one
+    `UPDATE ... RETURNING` / `INSERT ... RETURNING` statement, then commits.
+    """
+
+    head = (update(Tender.__table__)
+            .where(*criteria)
+            .values({**values,
+                     Tender.version: Tender.version + 1,
+                     Tender.revision: Tender.revision + 1,
+                     Tender.createdAt: _now()})
+            .returning(*_head_columns())
+            .cte("head"))
+
+    row = (await session.execute(_write_snapshot(head))).first()
+    if row is None:
+        return None
+
+    await session.commit()
+    return row
+
+
+async def make_tender_copy(session: AsyncSession,
+                           tenderId: str,
+                           fields: Optional[Dict[str, Any]] = None,
+                           expected: Expected = Expected()) -> Row | JSONResponse:
+    """
+    Creates a new version of tender with **tenderId**.\n
+    The head row in `tender` is moved to the new version:
+    - **fields** are applied to it
+    - Version and revision are incremented by 1
+    - New createdAt value, as a current datetime in RFC3339 format\n
+    and its snapshot is written to `tender_version`,
+    in a single statement and transaction.
+
+    Args:
+        session:
+            Current database session.
+        tenderId:
+            Tender id. Must be a valid UUID4-like string.
+        fields:
+            Optional mapping of changed tender attributes.
+        expected:
+            State the head row must be in, checked by the write itself.
+
+    Returns:
+        - Row of `tender_columns` of the new version and its `revision`
+            if tender exists.
+        - `JSONResponse` (404) if given tenderId not found, UUID is invalid
+            or the head row does not match **expected**.
+    """
+
+    if _invalid_uuid4(id=tenderId):
+        return JSONResponse(
+            status_code=http_status.HTTP_404_NOT_FOUND,
+            content={"reason": "No such tender (Invalid UUID)"})
+
+    tender = await _write_version(session,
+                                  {getattr(Tender, key): value
+                                   for key, value in (fields or {}).items()},
+                                  Tender.id == str(UUID(tenderId)),
+                                  *expected.criteria(Tender))
+    if tender is None:
+        return JSONResponse(
+            status_code=http_status.HTTP_404_NOT_FOUND,
+            content={"reason": "No such tender"})
+
+    return tender
+
+
+async def rollback_tender(session: AsyncSession,
+                          tenderId: str,
+                          version: int,
+                          expected: Expected = Expected()) -> Row | JSONResponse:
     """
-    Creates a copy of tender with **tenderId** as a new entity.\n
-    A copy has:
-    - New id, formed by adding a "*" at the end
-    - New version, incremented by 1
-    - New createdAt value, as a current datetime in RFC3339 format
+    Creates a new version of tender with **tenderId**,
+    equal to its **version** snapshot.\n
+    The snapshot is read by the same `UPDATE ... FROM tender_version`
+    statement that moves the head.
 
     Args:
         session:
             Current database session.
         tenderId:
-            Tender id. Must be a valid UUID4-like string,
-            without any * at the end.\n
+            Tender id. Must be a valid UUID4-like string.
+        version:
+            Version to roll back to.
+        expected:
+            State the head row must be in, checked by the write itself.
+
+    Returns:
+        - Row of `tender_columns` of the new version and its `revision`
+            if tender and version exist.
+        - `JSONResponse` (404) if given tender or version not found
+            or the head row does not match **expected**.
+    """
+
+    if _invalid_uuid4(id=tenderId):
+        return JSONResponse(
+            status_code=http_status.HTTP_404_NOT_FOUND,
+            content={"reason": "No such tender (Invalid UUID)"})
+
+    source = aliased(TenderVersion, name="source")
+    tender = await _write_version(session,
+                                  {Tender.name: source.name,
+                                   Tender.description: source.description,
+                                   Tender.serviceType: source.serviceType,
+                                   Tender.status: source.status},
+                                  Tender.id == str(UUID(tenderId)),
+                                  *expected.criteria(Tender),
+                                  source.id == Tender.id,
+                                  source.version == version)
+    if tender is None:
+        return JSONResponse(
+            status_code=http_status.HTTP_404_NOT_FOUND,
+            content={"reason": "No such tender version"})
+
+    return tender
+
+
+async def set_tender_status(session: AsyncSession,
+                            tenderId: str,
+                            status: str,
+                            expected: Expected = Expected()) -> Row | None:
+    """
+    Sets **status** of the current version of tender with **tenderId**,
+    in both `tender` and `tender_version`, with a single statement,
+    then commits. The version stays, the head `revision` is bumped.
+
+    Args:
+        session:
+            Current database session.
+        tenderId:
+            Tender id. Must be a valid UUID4-like string.
+        status:
+            New status.
+        expected:
+            State the head row must be in, checked by the write itself.
+
+    Returns:
+        - Row of `tender_columns` of the current version and its `revision`
+            if tender exists and matches **expected**.
+        - `None` otherwise.
+    """
+
+    if _invalid_uuid4(id=tenderId):
+        return None
+
+    head = (update(Tender.__table__)
+            .where(Tender.id == str(UUID(tenderId)),
+                   *expected.criteria(Tender))
+            .values({Tender.status: status,
+                     Tender.revision: Tender.revision + 1})
+            .returning(Tender.id, Tender.version, Tender.revision)
+            .cte("head"))
+
+    row = (await session.execute(update(TenderVersion.__table__)
+                                 .where(TenderVersion.id == head.c.id,
+                                        TenderVersion.version == head.c.version)
+                                 .values({TenderVersion.status: status})
+                                 .returning(*tender_columns(TenderVersion),
+                                            head.c.revision))).first()
+    if row is None:
+        return None
+
+    await session.commit()
+    return row
+
+
+async def bulk_create_tenders(session: AsyncSession,
+                              tenders: Sequence[NewTender]) -> List[Dict[str, Any]]:
+    """
+    Creates every valid tender of **tenders** in one transaction.\n
+    Users and organisations of the whole batch are resolved with one query each,
+    valid tenders are written with a single multi-row `INSERT ... RETURNING`
+    into `tender` and one into `tender_version`. Items are validated
+    the same way as in `POST /api/tenders/new`.
+
+    Args:
+        session:
+            Current database session.
+        tenders:
+            Validated request items.
 
     Returns:
-        - `Tender` object, copy of a given tender if tender exists.
-        - `JSONResponse` (400) if given tenderId not found or UUID is invalid.
+        List of per-item results, in order of **tenders**:
+        - `{"status": 200, "tender": {...}}` for a created tender.
+        - `{"status": code, "reason": reason}` for a rejected item.
+
+    Raises:
+        `DBAPIError` if the batch insert fails. Nothing is written then.
     """
-    response = tender_checkers.invalid_tender_id(session=session,
-                                                 tenderId=tenderId)
-    if response:
-        return response
 
-    fresh_tender = get_last_version_tender(session=session, tenderId=tenderId)
+    principals = await get_principals(session=session,
+                                      usernames={t.creatorUsername for t in tenders})
+    org_ids = await get_existing_org_ids(session=session,
+                                         orgIds={t.organizationId for t in tenders
+                                                 if _invalid_uuid4(id=t.organizationId) is None})
+
+    ids = gen_tender_id()
+    createdAt = _now()
+
+    results: List[Dict[str, Any]] = []
+    rows: List[Dict[str, Any]] = []
+    positions: List[int] = []
+
+    for new_tender in tenders:
+        principal = principals.get(new_tender.creatorUsername)
+
+        if principal is None:
+            results.append({"status": http_status.HTTP_401_UNAUTHORIZED,
+                            "reason": "No such user"})
+        elif not principal.is_responsible:
+            results.append({"status": http_status.HTTP_403_FORBIDDEN,
+                            "reason": "Invalid user rights"})
+        elif _invalid_uuid4(id=new_tender.organizationId):
+            results.append({"status": http_status.HTTP_400_BAD_REQUEST,
+                            "reason": "UUID is invalid"})
+        elif str(UUID(new_tender.organizationId)) not in org_ids:
+            results.append({"status": http_status.HTTP_400_BAD_REQUEST,
+                            "reason": "No such organisation"})
+        elif new_tender.serviceType not in SERVICE_TYPES:
+            results.append({"status": http_status.HTTP_400_BAD_REQUEST,
+                            "reason": "Indalid service type"})
+        elif new_tender.status not in STATUSES:
+            results.append({"status": http_status.HTTP_400_BAD_REQUEST,
+                            "reason": "Indalid status"})
+        else:
+            row = {"id": next(ids),
+                   "name": new_tender.name,
+                   "description": new_tender.description,
+                   "serviceType": new_tender.serviceType,
+                   "status": new_tender.status,
+                   "organizationId": new_tender.organizationId,
+                   "version": 1,
+                   "createdAt": createdAt}
+
+            overlong = overlong_columns(Tender, row)
+            if overlong:
+                results.append({"status": http_status.HTTP_400_BAD_REQUEST,
+                                "reason": f"Value too long: {', '.join(overlong)}"})
+                continue
 
-    new_tender = Tender(
-        id=f"{fresh_tender.id}*",
-        name=fresh_tender.name,
-        description=fresh_tender.description,
-        serviceType=fresh_tender.serviceType,
-        status=fresh_tender.status,
-        organizationId=fresh_tender.organizationId,
-        version=fresh_tender.version + 1,
-        createdAt=generate(datetime.datetime.now(datetime.UTC)
-                                            .replace(tzinfo=pytz.utc))
-    )
+            positions.append(len(results))
+            results.append({"status": http_status.HTTP_200_OK})
+            rows.append(row)
 
-    session.add(new_tender)
-    session.commit()
+    if not rows:
+        return results
+
+    created = await session.scalars(insert(Tender)
+                                    .returning(Tender, sort_by_parameter_order=True),
+                                    rows)
+    created = created.all()
+    await session.execute(insert(TenderVersion), rows)
+    await session.commit()
+
+    for position, tender in zip(positions, created):
+        results[position]["tender"] = format_tender(tender=tender)
+
+    return results
+
+
+def tender_columns(model: type[Tender] | type[TenderVersion] = Tender) -> tuple:
+    """
+    Returns columns of **model** read by `format_tender`, labelled with
+    attribute names, to select plain rows instead of ORM objects.
+
+    Args:
+        model:
+            `Tender` or `TenderVersion`.
+
+    Returns:
+        Tuple of labelled columns.
+    """
 
-    return new_tender
+    return tuple(column.label(column.key)
+                 for column in (model.id, model.name, model.description,
+                                model.status, model.serviceType,
+                                model.version, model.createdAt))
 
 
 def format_tender(tender: Tender) -> dict[str, Any]:
     """
-    Formats a `Tender` object to a following JSON format:
+    Formats a `Tender` or `TenderVersion` object to a following JSON format:
             **{ "id": id,\n
             "name": name\n
             "description": description,\n
@@ -66,7 +388,7 @@ def format_tender(tender: Tender) -> dict[str, Any]:
             "createdAt": createdAt }**
     Args:
         tender:
-            `Tender` object to format.
+            `Tender` or `TenderVersion` object, or a row of `tender_columns`, to format.
 
     Returns:
         JSON-like object.
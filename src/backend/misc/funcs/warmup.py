@@ -0,0 +1,123 @@
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from urllib.parse import urlencode
+import asyncio
+import logging
+import time
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from model.models import Bid, Employee, OrganizationResponsible, Tender
+
+log = logging.getLogger(__name__)
+
+# Ids that exist nowhere, used when the database has no data yet
+MISSING_ID = str(uuid.UUID(int=0, version=4))
+MISSING_USER = "warmup"
+
+
+async def warmup_sample(session: AsyncSession) -> Dict[str, str]:
+    """
+    Picks a responsible employee, a tender of their organization and a bid
+    on it, so warmup requests go past the permission checks.
+
+    Returns:
+        JSON-like object with `username`, `tender_id` and `bid_id`,
+        missing ones replaced with ids that match nothing.
+    """
+
+    res = await session.execute(select(Employee.username,
+                                       Tender.id.label("tender_id"),
+                                       Bid.id.label("bid_id"))
+                                .join(OrganizationResponsible,
+                                      OrganizationResponsible.user_id == Employee.id)
+                                .join(Tender,
+                                      Tender.organizationId
+                                      == OrganizationResponsible.organization_id)
+                                .outerjoin(Bid, Bid.tenderId == Tender.id)
+                                .limit(1))
+    row = res.first()
+
+    if row is None:
+        return {"username": MISSING_USER, "tender_id": MISSING_ID, "bid_id": MISSING_ID}
+
+    return {"username": row.username,
+            "tender_id": row.tender_id,
+            "bid_id": row.bid_id or MISSING_ID}
+
+
+def warmup_requests(sample: Dict[str, str]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Returns `GET` requests of the hot read endpoints, as (path, query) pairs.
+    """
+
+    username = {"username": sample["username"]}
+
+    return [("/api/tenders", {"service_type": ""}),
+            ("/api/tenders", {"service_type": "", "only_new": "true"}),
+            ("/api/tenders/my", username),
+            ("/api/bids/my", username),
+            (f"/api/tenders/{sample['tender_id']}/status", username),
+            (f"/api/bids/{sample['bid_id']}/status", username),
+            (f"/api/bids/{sample['tender_id']}/list", username)]
+
+
+async def _get(app: Callable[..., Awaitable[None]], path: str, query: Dict[str, Any]) -> int:
+    status = 0
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app({"type": "http",
+               "asgi": {"version": "3.0"},
+               "http_version": "1.1",
+               "method": "GET",
+               "scheme": "http",
+               "path": path,
+               "raw_path": path.encode(),
+               "root_path": "",
+               "query_string": urlencode(query).encode(),
+               "headers": [],
+               "client": None,
+               "server": None},
+              receive,
+              send)
+
+    return status
+
+
+async def run_warmup(app: Callable[..., Awaitable[None]],
+                     requests: List[Tuple[str, Dict[str, Any]]],
+                     concurrency: int) -> float:
+    """
+    Sends **requests** straight to **app** (the router, bypassing middlewares),
+    in **concurrency** parallel sequences, so each one runs on its own pooled
+    connection. This fills the SQLAlchemy compiled statement cache and the
+    asyncpg prepared statement cache of every warmed connection.\n
+    Failures are logged and don't stop startup.
+
+    Returns:
+        Warmup duration in seconds.
+    """
+
+    started = time.perf_counter()
+
+    async def sequence() -> None:
+        for path, query in requests:
+            try:
+                status = await _get(app, path, query)
+                if status >= 500:
+                    log.warning(msg=f"Warmup request {path} failed with {status}")
+
+            except Exception as e:
+                log.warning(msg=f"Warmup request {path} failed. Reason:{e}")
+
+    await asyncio.gather(*(sequence() for _ in range(max(concurrency, 1))))
+
+    return time.perf_counter() - started
@@ -1,27 +1,16 @@
-from sqlalchemy.orm import Session
-from typing import Generator, Any
-from model.models import Bid
-from sqlalchemy import select
-from uuid import uuid4
+from typing import Generator
+from .universal import uuid7
 
 
-def gen_bid_id(session: Session) -> Generator[Any, Any, Any]:
+def gen_bid_id() -> Generator[str, None, None]:
     """
-    Returns a `Generator` object to yeild a UUID4-like string for a Bid.
-    Args:
-        session:
-            Current database session.
+    Returns a `Generator` object to yeild a time-ordered UUID7 string for a Bid.\n
+    No database round trip is made: uniqueness is enforced by the primary key,
+    see `universal.execute_with_new_id`.
 
     Returns:
         `Generator` object.
     """
     while True:
 
-        new_id = uuid4()
-        check_query = select(Bid).where(Bid.id == str(new_id))
-        result = session.execute(check_query)
-        existing_bid = result.fetchone()
-
-        if existing_bid is None:
-
-            yield str(new_id)
+        yield str(uuid7())
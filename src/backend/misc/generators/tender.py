@@ -1,16 +1,12 @@
-from sqlalchemy.orm import Session
-from typing import Generator, Any
-from model.models import Tender
-from uuid import uuid4
-from sqlalchemy import select
+from typing import Generator
+from .universal import uuid7
 
 
-def gen_tender_id(session: Session) -> Generator[Any, Any, Any]:
+def gen_tender_id() -> Generator[str, None, None]:
     """
-    Returns a `Generator` object to yeild a UUID4-like string for a Tender.
-    Args:
-        session:
-            Current database session.
+    Returns a `Generator` object to yeild a time-ordered UUID7 string for a Tender.\n
+    No database round trip is made: uniqueness is enforced by the primary key,
+    see `universal.execute_with_new_id`.
 
     Returns:
         `Generator` object.
@@ -18,11 +14,4 @@ def gen_tender_id(session: Session) -> Generator[Any, Any, Any]:
 
     while True:
 
-        new_id = uuid4()
-        check_query = select(Tender).where(Tender.id == str(new_id))
-        result = session.execute(check_query)
-        existing_tender = result.fetchone()
-
-        if existing_tender is None:
-
-            yield str(new_id)
+        yield str(uuid7())
@@ -0,0 +1,109 @@
+from typing import Callable
+import os
+import threading
+import time
+from uuid import UUID
+
+from sqlalchemy import Executable, Row
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+UNIQUE_VIOLATION = "23505"
+ID_ALLOCATION_ATTEMPTS = 3
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> UUID:
+    """
+    Returns a time-ordered UUID version 7 (RFC 9562).\n
+    48-bit Unix time in milliseconds is followed by a 12-bit counter,
+    randomly seeded every millisecond and incremented for ids of the same
+    millisecond, and 62 random bits. Ids made by one process are strictly
+    increasing, so primary key inserts go to the right edge of the B-tree.
+
+    Returns:
+        `UUID` object.
+    """
+    global _last_ms, _counter
+
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_ms += 1
+                _counter = 0
+
+        unix_ms, counter = _last_ms, _counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+
+    value = ((unix_ms & ((1 << 48) - 1)) << 80
+             | 0x7 << 76
+             | counter << 64
+             | 0b10 << 62
+             | rand_b)
+
+    return UUID(int=value)
+
+
+def is_unique_violation(error: IntegrityError) -> bool:
+    """
+    Checks if **error** was caused by a unique constraint violation.
+
+    Args:
+        error:
+            `IntegrityError` raised by a flush or commit.
+
+    Returns:
+        `True` on unique violation, `False` otherwise.
+    """
+    code = (getattr(error.orig, "sqlstate", None)
+            or getattr(error.orig, "pgcode", None))
+
+    return code == UNIQUE_VIOLATION
+
+
+async def execute_with_new_id(session: AsyncSession,
+                             make_statement: Callable[[str], Executable],
+                             gen_id: Callable[[], str]) -> Row:
+    """
+    Executes a statement creating an entity with a freshly allocated id,
+    returns its single row and commits.\n
+    Ids are not checked against the database beforehand: on the
+    (astronomically rare) primary key conflict a new id is allocated
+    and the statement is retried.
+
+    Args:
+        session:
+            Current database session.
+        make_statement:
+            Builds an `INSERT ... RETURNING` statement for a given id.
+        gen_id:
+            Id allocator.
+
+    Returns:
+        Returned row.
+
+    Raises:
+        `IntegrityError` if the statement fails for any other reason
+        or every attempt conflicted.
+    """
+
+    for attempt in range(ID_ALLOCATION_ATTEMPTS):
+        try:
+            row = (await session.execute(make_statement(gen_id()))).one()
+            await session.commit()
+            return row
+
+        except IntegrityError as ie:
+            await session.rollback()
+            if not is_unique_violation(ie) or attempt == ID_ALLOCATION_ATTEMPTS - 1:
+                raise
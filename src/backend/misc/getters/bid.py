@@ -1,35 +1,36 @@
-from sqlalchemy.orm import Session
-from model.models import Bid
-from sqlalchemy import select
-from fastapi.responses import JSONResponse
-
-from ..checkers import bid as bid_checkers
-
-
-def get_last_version_bid(session: Session,
-                         bidId: str) -> Bid | JSONResponse:
+from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from model.models import BidVersion
+from uuid import UUID
+from sqlalchemy import Row, select
+from ..funcs.bid import bid_columns
+
+
+async def get_bid_versions(session: AsyncSession,
+                           bidId: str,
+                           limit: int,
+                           offset: int) -> List[Row]:
     """
-    Returns `Bid` object with the latest `Bid.version`
+    Returns a page of bid versions, newest first, as rows
+    of `bid_columns(BidVersion)`.\n
+    Served by the `bid_version` primary key index.
 
     Args:
         session:
             Current database session.
         bidId:
-            Bid id. Must be a valid UUID4-like string,
-            without any * at the end.\n
+            Bid id. Must be a valid UUID4-like string.
+        limit: Limit.
+        offset: Offset.
 
     Returns:
-        - `Bid` object if bid exists.
-        - `JSONResponse` (400) if given **bidId** not found
-            or **id** is not UUID4 valid..
+        List of rows, see `format_bid`.
     """
 
-    response = bid_checkers.invalid_bid_id(session=session, bidId=bidId)
-    if response:
-        return response
-
-    res = session.execute(select(Bid)
-                          .filter(Bid.id.match(f"{bidId}%"))
-                          .order_by(Bid.version.desc()))
+    res = await session.execute(select(*bid_columns(BidVersion))
+                                .where(BidVersion.id == str(UUID(bidId)))
+                                .order_by(BidVersion.version.desc())
+                                .limit(limit)
+                                .offset(offset))
 
-    return res.scalars().first()
+    return res.all()
@@ -1,16 +1,17 @@
-from sqlalchemy.orm import Session
-from model.models import OrganizationResponsible
-from uuid import UUID
+from typing import Iterable, Set
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from uuid import UUID
+from model.models import Organization
 
-from .user import get_user_id
-from ..checkers import user as user_checkers
+from .user import get_principal
 
 
-def get_respondible_org_id(session: Session,
-                           username: str) -> UUID:
+async def get_respondible_org_id(session: AsyncSession,
+                                 username: str) -> UUID:
     """
-    Returns `organization_responsible.id` by responsible employee username
+    Returns `organization_responsible.organization_id`
+    by responsible employee username
 
     Args:
         session:
@@ -19,23 +20,35 @@ def get_respondible_org_id(session: Session,
             Username of a responsible employee
 
     Returns:
-        - `UUID` object if user exists and authorised.
-        - `JSONResponse` (401) if if given **username** not found.
-        - `JSONResponse` (403) if user is not authorised.
+        - `str` organisation id if user exists and authorised.
+        - `None` if given **username** not found or user is not authorised.
+    """
+    principal = await get_principal(session=session, username=username)
+    if principal is None:
+        return None
+
+    return principal.organization_id
+
+
+async def get_existing_org_ids(session: AsyncSession,
+                               orgIds: Iterable[str]) -> Set[str]:
     """
-    response = user_checkers.invalid_user_name(session=session,
-                                               username=username)
-    if response:
-        return response
-
-    response = user_checkers.invalid_user_rights(session=session,
-                                                 username=username)
-    if response:
-        return response
-
-    user_id = get_user_id(session=session, username=username)
-
-    res = session.execute(select(OrganizationResponsible.organization_id)
-                          .where(OrganizationResponsible.user_id
-                                 == UUID(user_id)))
-    return str(res.scalars().first())
+    Returns which of **orgIds** exist in a database, with a single query.
+
+    Args:
+        session:
+            Current database session.
+        orgIds:
+            Organisation ids. Must be valid UUID strings.
+
+    Returns:
+        Set of existing organisation ids in canonical `str(UUID)` form.
+    """
+    uuids = {UUID(orgId) for orgId in orgIds}
+    if not uuids:
+        return set()
+
+    res = await session.execute(select(Organization.id)
+                                .where(Organization.id.in_(uuids)))
+
+    return {str(org_id) for org_id in res.scalars()}
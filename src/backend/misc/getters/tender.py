@@ -1,33 +1,60 @@
-from sqlalchemy.orm import Session
-from model.models import Tender
-from sqlalchemy import select
-from ..checkers import tender as tender_checkers
+from typing import Iterable, List, Set
+from sqlalchemy.ext.asyncio import AsyncSession
+from model.models import Tender, TenderVersion
+from uuid import UUID
+from sqlalchemy import Row, select
+from ..funcs.tender import tender_columns
 
 
-def get_last_version_tender(session: Session,
-                            tenderId: str) -> Tender:
+async def get_existing_tender_ids(session: AsyncSession,
+                                  tenderIds: Iterable[str]) -> Set[str]:
     """
-    Returns `Tender` object with the latest `Tender.version`
+    Returns which of **tenderIds** exist in a database, with a single query.
 
     Args:
         session:
             Current database session.
-        tenderId:
-            Tender id. Must be a valid UUID, without any * at the end.\n
+        tenderIds:
+            Tender ids. Must be valid UUID strings.
 
     Returns:
-        - `Tender` object if tender exists.
-        - `JSONResponse` (400) if given if given **tenderId** not found
-            or **tenderId** is not UUID4 valid.
+        Set of existing tender ids in canonical `str(UUID)` form.
     """
+    ids = {str(UUID(tenderId)) for tenderId in tenderIds}
+    if not ids:
+        return set()
+
+    res = await session.execute(select(Tender.id)
+                                .where(Tender.id.in_(ids)))
+
+    return set(res.scalars())
+
 
-    response = tender_checkers.invalid_tender_id(session=session,
-                                                 tenderId=tenderId)
-    if response:
-        return response
+async def get_tender_versions(session: AsyncSession,
+                              tenderId: str,
+                              limit: int,
+                              offset: int) -> List[Row]:
+    """
+    Returns a page of tender versions, newest first, as rows
+    of `tender_columns(TenderVersion)`.\n
+    Served by the `tender_version` primary key index.
+
+    Args:
+        session:
+            Current database session.
+        tenderId:
+            Tender id. Must be a valid UUID.
+        limit: Limit.
+        offset: Offset.
+
+    Returns:
+        List of rows, see `format_tender`.
+    """
 
-    res = session.execute(select(Tender)
-                          .filter(Tender.id.match(f"{tenderId}%"))
-                          .order_by(Tender.version.desc()))
+    res = await session.execute(select(*tender_columns(TenderVersion))
+                                .where(TenderVersion.id == str(UUID(tenderId)))
+                                .order_by(TenderVersion.version.desc())
+                                .limit(limit)
+                                .offset(offset))
 
-    return res.scalars().first()
+    return res.all()
@@ -1,14 +1,41 @@
-from sqlalchemy.orm import Session
-from model.models import Employee
+from typing import Dict, Iterable, NamedTuple, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from model.models import Employee, OrganizationResponsible
+from model.create import get_db
 from uuid import UUID
 from sqlalchemy import select
-from ..checkers import user as user_checkers
+from fastapi import Depends, Query
 
 
-def get_user_id(session: Session,
-                username: str) -> UUID:
+class Principal(NamedTuple):
     """
-    Returns id of the user by username
+    Resolved identity of a request author.
+
+    Attributes:
+        employee_id:
+            `employee.id` as a string.
+        username:
+            `employee.username`.
+        organization_id:
+            `organization_responsible.organization_id` as a string,
+            or `None` if the employee is not responsible for any organisation.
+        is_responsible:
+            `True` if the employee is a responsible employee.
+    """
+    employee_id: str
+    username: str
+    organization_id: Optional[str]
+    is_responsible: bool
+
+
+async def get_principal(session: AsyncSession,
+                        username: str) -> Principal | None:
+    """
+    Resolves employee id, organisation id and rights of **username**
+    with a single joined query over `employee`
+    and `organization_responsible`.\n
+    Result is memoized in `session.info`, so every following call
+    within the same request (session) costs no database round trip.
 
     Args:
         session:
@@ -17,15 +44,115 @@ def get_user_id(session: Session,
             Username of a user.
 
     Returns:
-        - `Bid` object if bid exists.
-        - `JSONResponse` (400) if given **username** not found
+        - `Principal` if user exists.
+        - `None` if given **username** not found.
+    """
+    principals = session.info.setdefault("principals", {})
+    if username in principals:
+        return principals[username]
+
+    res = await session.execute(select(Employee.id,
+                                       Employee.username,
+                                       OrganizationResponsible.organization_id)
+                                .outerjoin(OrganizationResponsible,
+                                           OrganizationResponsible.user_id
+                                           == Employee.id)
+                                .where(Employee.username == username)
+                                .limit(1))
+    row = res.first()
+
+    if row is None:
+        principal = None
+    else:
+        principal = Principal(
+            employee_id=str(row.id),
+            username=row.username,
+            organization_id=(str(row.organization_id)
+                             if row.organization_id else None),
+            is_responsible=row.organization_id is not None)
+
+    principals[username] = principal
+    return principal
+
+
+async def get_principals(session: AsyncSession,
+                         usernames: Iterable[str]) -> Dict[str, Principal]:
+    """
+    Resolves principals of many **usernames** with a single joined query.\n
+    Results are memoized in `session.info` the same way as in `get_principal`.
+
+    Args:
+        session:
+            Current database session.
+        usernames:
+            Usernames of users.
+
+    Returns:
+        Mapping of username to `Principal`. Unknown usernames are missing.
     """
-    response = user_checkers.invalid_user_name(session=session,
-                                               username=username)
-    if response:
-        return response
+    principals = session.info.setdefault("principals", {})
+    missing = set(usernames) - principals.keys()
+
+    if missing:
+        res = await session.execute(select(Employee.id,
+                                           Employee.username,
+                                           OrganizationResponsible.organization_id)
+                                    .outerjoin(OrganizationResponsible,
+                                               OrganizationResponsible.user_id
+                                               == Employee.id)
+                                    .where(Employee.username.in_(missing)))
+
+        for row in res:
+            if principals.get(row.username) is not None:
+                continue
 
-    res = res = session.execute(select(Employee.id)
-                                .where(Employee.username == username))
+            principals[row.username] = Principal(
+                employee_id=str(row.id),
+                username=row.username,
+                organization_id=(str(row.organization_id)
+                                 if row.organization_id else None),
+                is_responsible=row.organization_id is not None)
+
+        for username in missing:
+            principals.setdefault(username, None)
+
+    return {username: principal
+            for username, principal in principals.items()
+            if principal is not None}
+
+
+async def current_principal(username: str = Query(...),
+                            session: AsyncSession = Depends(get_db)) -> Principal | None:
+    """
+    FastAPI dependency resolving `Principal` of the **username**
+    query parameter.\n
+    Shares the request session with the handler, so the principal
+    is resolved once per request.
+
+    Returns:
+        - `Principal` if user exists.
+        - `None` if given **username** not found.
+    """
+    return await get_principal(session=session, username=username)
+
+
+async def get_user_id(session: AsyncSession,
+                      username: str) -> UUID:
+    """
+    Returns id of the user by username
+
+    Args:
+        session:
+            Current database session.
+        username:
+            Username of a user.
+
+    Returns:
+        - `str` user id if user exists.
+        - `None` if given **username** not found
+    """
+    principal = await get_principal(session=session, username=username)
+    if principal is None:
+        return None
 
-    return str(res.scalars().first())
+    return principal.employee_id